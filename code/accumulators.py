@@ -0,0 +1,322 @@
+'''
+Accumulators: Running Statistics of Repetitions
+===============================================
+
+Keep statistics of per-repetition quantities as repetitions arrive, without
+storing the repetitions, so memory does not grow with their number.
+
+Classes:
+
+    RunningStats
+        Welford mean and variance, minimum and maximum, updated one value or
+        one batch at a time, for a scalar or an array of quantities
+    RatioStats
+        Mean of several ratios of sums (e.g. CC fractions of pairings summed
+        over repetitions) and its delta-method variance
+    HistogramSketch
+        Fixed-bin histogram that answers quantile queries for values in a
+        known range
+    TournamentStats
+        Per-player score statistics and summed state counts of the
+        repetitions of one tournament
+
+'''
+import numpy as np
+from statistics import NormalDist
+
+
+class RunningStats:
+    """
+    A class to represent the running statistics of a quantity.
+
+    ...
+
+    Batches are merged with the parallel form of Welford's update, which is
+    numerically stable and gives the same result in any batch split.
+
+    Attributes
+    ----------
+    shape : tuple
+        shape of one value (() for a scalar, (players,) for one value per
+        player, ...)
+    count : int
+        number of values seen
+    mean : numpy.ndarray
+        mean of the values
+    m2 : numpy.ndarray
+        sum of squared deviations from the mean
+    minimum : numpy.ndarray
+        smallest value
+    maximum : numpy.ndarray
+        largest value
+
+    Methods
+    -------
+    update(values):
+        Adds a value or a batch of values
+    variance():
+        Returns the sample variance
+    half_width(confidence=0.95):
+        Returns the half-width of the normal confidence interval of the mean
+    """
+
+    def __init__(self, shape=()):
+        """
+        Parameters
+        ----------
+        shape : tuple
+            shape of one value (default is (), a scalar)
+        """
+        self.shape = tuple(shape)
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        self.m2 = np.zeros(self.shape)
+        self.minimum = np.full(self.shape, np.inf)
+        self.maximum = np.full(self.shape, -np.inf)
+
+    def update(self, values):
+        """
+        Adds a value or a batch of values (the batch axis first, e.g. a
+        (reps, players) array for shape (players,))
+        """
+        values = np.asarray(values, dtype=float).reshape((-1,) + self.shape)
+        if not len(values):
+            return
+        count, mean = len(values), values.mean(axis=0)
+        m2 = ((values - mean)**2).sum(axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta**2 * self.count * count / total
+        self.minimum = np.minimum(self.minimum, values.min(axis=0))
+        self.maximum = np.maximum(self.maximum, values.max(axis=0))
+        self.count = total
+
+    def variance(self):
+        """ Returns the sample variance (nan for fewer than two values) """
+
+        if self.count < 2:
+            return np.full(self.shape, np.nan)[()]
+        return (self.m2 / (self.count - 1))[()]
+
+    def half_width(self, confidence=0.95):
+        """
+        Returns the half-width of the normal confidence interval of the mean
+        (inf for fewer than two values)
+        """
+        if self.count < 2:
+            return np.full(self.shape, np.inf)[()]
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * np.sqrt(self.variance() / self.count)
+
+class RatioStats:
+    """
+    A class to represent the running statistics of a mean of ratios of sums.
+
+    ...
+
+    The estimate is the mean over k of sum(numerators[:, k]) /
+    sum(denominators[:, k]), summed over repetitions (e.g. the mean over
+    pairings of CC turns / turns, as Avg_CC_Distribution). Its variance is
+    the delta-method (linearised) variance: the sample variance of each
+    repetition's influence mean_k (x_k - ratio_k * n_k) / mean(n_k), divided
+    by the number of repetitions. The influence of a repetition depends on
+    the final ratios, so the (2 * size, 2 * size) co-moment matrix of the
+    numerators and denominators is kept instead of the repetitions.
+
+    Attributes
+    ----------
+    size : int
+        number of ratios
+    count : int
+        number of repetitions seen
+    mean : numpy.ndarray
+        (2 * size,) mean numerators followed by mean denominators
+    comoment : numpy.ndarray
+        (2 * size, 2 * size) sum of the outer products of the deviations
+        from the mean
+
+    Methods
+    -------
+    update(numerators, denominators):
+        Adds a batch of repetitions
+    value():
+        Returns the mean of the ratios of sums
+    variance():
+        Returns the delta-method variance of value
+    half_width(confidence=0.95):
+        Returns the half-width of the normal confidence interval of value
+    """
+
+    def __init__(self, size):
+        """
+        Parameters
+        ----------
+        size : int
+            number of ratios
+        """
+        self.size = size
+        self.count = 0
+        self.mean = np.zeros(2 * size)
+        self.comoment = np.zeros((2 * size, 2 * size))
+
+    def update(self, numerators, denominators):
+        """ Adds a batch of (reps, size) numerators and denominators """
+
+        values = np.hstack([np.asarray(numerators, dtype=float).reshape(-1, self.size),
+                            np.asarray(denominators, dtype=float).reshape(-1, self.size)])
+        if not len(values):
+            return
+        count, mean = len(values), values.mean(axis=0)
+        deviation = values - mean
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.comoment += deviation.T @ deviation + np.outer(delta, delta) * self.count * count / total
+        self.count = total
+
+    def _ratios(self):
+        numerators, denominators = self.mean[:self.size], self.mean[self.size:]
+        return numerators / denominators, denominators
+
+    def value(self):
+        """ Returns the mean of the ratios of sums (nan before any update) """
+
+        if not self.count:
+            return np.nan
+        return float(self._ratios()[0].mean())
+
+    def variance(self):
+        """ Returns the delta-method variance of value (nan for fewer than two repetitions) """
+
+        if self.count < 2:
+            return np.nan
+        ratios, denominators = self._ratios()
+        weights = np.concatenate([1 / denominators, -ratios / denominators]) / self.size
+        return float(weights @ self.comoment @ weights / (self.count - 1) / self.count)
+
+    def half_width(self, confidence=0.95):
+        """
+        Returns the half-width of the normal confidence interval of value
+        (inf for fewer than two repetitions)
+        """
+        if self.count < 2:
+            return np.inf
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * np.sqrt(self.variance())
+
+class HistogramSketch:
+    """
+    A class to represent a fixed-bin histogram of values in a known range.
+
+    ...
+
+    Quantiles are read off the cumulative counts, so they are exact to within
+    one bin width, (high - low) / bins, whatever the number of values.
+
+    Attributes
+    ----------
+    low : float
+        lower end of the range
+    high : float
+        upper end of the range
+    counts : numpy.ndarray
+        shape + (bins,) number of values in each bin
+
+    Methods
+    -------
+    update(values):
+        Adds a value or a batch of values
+    quantile(q):
+        Returns the q-quantile of the values seen
+    """
+
+    def __init__(self, low, high, bins=1000, shape=()):
+        """
+        Parameters
+        ----------
+        low, high : float
+            range of the values (values outside it go to the end bins)
+        bins : int
+            number of bins (default is 1000)
+        shape : tuple
+            shape of one value (default is (), a scalar)
+        """
+        self.low = low
+        self.high = high
+        self.shape = tuple(shape)
+        self.counts = np.zeros(self.shape + (bins,), dtype=np.int64)
+
+    def update(self, values):
+        """ Adds a value or a batch of values (the batch axis first) """
+
+        values = np.asarray(values, dtype=float).reshape((-1,) + self.shape)
+        bins = self.counts.shape[-1]
+        width = (self.high - self.low) or 1
+        index = np.clip(((values - self.low) / width * bins).astype(int), 0, bins - 1)
+        flat = self.counts.reshape(-1, bins)
+        cells = np.broadcast_to(np.arange(len(flat)), (len(values), len(flat)))
+        np.add.at(flat, (cells.ravel(), index.reshape(len(values), -1).ravel()), 1)
+
+    def quantile(self, q):
+        """ Returns the q-quantile (bin midpoint) of the values seen """
+
+        bins = self.counts.shape[-1]
+        cumulative = np.cumsum(self.counts, axis=-1)
+        rank = np.ceil(q * cumulative[..., -1:]).clip(1)
+        index = (cumulative < rank).sum(axis=-1)
+        return (self.low + (index + 0.5) * (self.high - self.low) / bins)[()]
+
+class TournamentStats:
+    """
+    A class to represent the running statistics of a repeated tournament.
+
+    ...
+
+    Attributes
+    ----------
+    scores : RunningStats
+        (players,) statistics of each player's normalised score per
+        repetition
+    sketch : HistogramSketch
+        (players,) quantile sketch of the same scores
+    states : numpy.ndarray
+        (players, players, 4) CC, CD, DC, DD counts summed over repetitions
+
+    Methods
+    -------
+    update(normal_scores, states):
+        Adds a batch of repetitions
+    """
+
+    def __init__(self, num_players, score_range, bins=1000):
+        """
+        Parameters
+        ----------
+        num_players : int
+            number of players of the tournament
+        score_range : tuple
+            (lowest, highest) possible score per turn, i.e. the smallest
+            and largest payoff of the game
+        bins : int
+            number of bins of the quantile sketch (default is 1000)
+        """
+        self.scores = RunningStats((num_players,))
+        self.sketch = HistogramSketch(*score_range, bins=bins, shape=(num_players,))
+        self.states = np.zeros((num_players, num_players, 4))
+
+    def update(self, normal_scores, states):
+        """
+        Adds a batch of repetitions
+
+        Parameters
+        ----------
+        normal_scores : numpy.ndarray
+            (players, reps) normalised scores, as in ResultSet.normalised_scores
+        states : numpy.ndarray
+            (players, players, 4) state counts summed over the batch
+        """
+        per_rep = np.asarray(normal_scores, dtype=float).T
+        self.scores.update(per_rep)
+        self.sketch.update(per_rep)
+        self.states += states
@@ -0,0 +1,116 @@
+'''
+Batch_sim: Vectorized Memory-One Match Simulation
+=================================================
+
+Simulate every pairing of a population of memory-one players for many
+repetitions at once. Actions, random draws and the sampled geometric match
+lengths are NumPy arrays over (repetition, pairing), so a turn of every match
+of every repetition is a handful of array operations.
+
+Classes:
+
+    BatchMatrix
+        MatchMatrix filled by the vectorized simulator.
+
+Functions:
+
+    sample_lengths(int, float, tuple, object) -> numpy.ndarray
+        Returns match lengths drawn with the tournaments' stopping rule
+    simulate_matches(numpy.ndarray, numpy.ndarray, int, float, int,
+                     object) -> tuple
+        Returns sampled state counts and match lengths of every pairing of
+        the given players for each repetition
+
+'''
+import numpy as np
+from match_matrix import MatchMatrix
+from markov import memory_one_params, SWAP
+
+
+def sample_lengths(turns, prob_end, shape, rng):
+    '''
+    Returns match lengths drawn with the tournaments' stopping rule: a match
+    ends after each turn with probability prob_end and lasts at most turns
+
+        Parameters:
+            turns (int): maximum number of turns (None for no cap)
+            prob_end (float): probability that a match ends after any turn
+                (None or 0 for matches of exactly turns)
+            shape (tuple): shape of the returned array
+            rng (numpy.random.Generator): source of the draws
+
+        Returns:
+            (numpy.ndarray): integer match lengths
+    '''
+
+    if prob_end:
+        lengths = rng.geometric(prob_end, size=shape)
+        if turns is not None:
+            lengths = np.minimum(lengths, turns)
+        return lengths
+    return np.full(shape, turns)
+
+def simulate_matches(vectors, initials, turns=30, prob_end=0.1, reps=1, seed=1):
+    '''
+    Returns sampled outcomes of every pairing (i <= j) of the given players
+
+        Parameters:
+            vectors (numpy.ndarray): (n, 4) response probabilities
+            initials (numpy.ndarray): (n,) 1.0 if the player opens with C
+            turns (int): maximum number of turns of a match
+            prob_end (float): probability that a match ends after any turn
+            reps (int): number of repetitions of every match
+            seed (int or numpy.random.Generator): seed of the random draws
+
+        Returns:
+            states (numpy.ndarray): (reps, n, n, 4) CC, CD, DC, DD counts from
+                the row player's point of view
+            match_lengths (numpy.ndarray): (reps, n, n) number of turns
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    n = len(vectors)
+    first, second = np.triu_indices(n)
+    shape = (reps, len(first))
+
+    lengths = sample_lengths(turns, prob_end, shape, rng)
+
+    own = np.broadcast_to(initials[first] == 1, shape)
+    other = np.broadcast_to(initials[second] == 1, shape)
+    counts = np.zeros(shape + (4,), dtype=np.int64)
+    for turn in range(lengths.max()):
+        # Index of the state seen by the first player: CC=0, CD=1, DC=2, DD=3
+        state = 2 * ~own + ~other
+        active = turn < lengths
+        for s in range(4):
+            counts[..., s] += active & (state == s)
+        draws = rng.random(shape + (2,))
+        own = draws[..., 0] < vectors[first, state]
+        other = draws[..., 1] < vectors[second, np.take(SWAP, state)]
+
+    states = np.zeros((reps, n, n, 4), dtype=np.int64)
+    states[:, first, second] = counts
+    states[:, second, first] = counts[..., SWAP]
+    match_lengths = np.zeros((reps, n, n), dtype=np.int64)
+    match_lengths[:, first, second] = lengths
+    match_lengths[:, second, first] = lengths
+    return states, match_lengths
+
+class BatchMatrix(MatchMatrix):
+    """
+    A MatchMatrix whose repetitions are sampled by simulate_matches.
+
+    The draws differ from axelrod's, so results are reproducible from seed
+    but not identical to an axelrod Tournament with the same seed.
+    """
+
+    def play(self):
+        """ Simulates every pairing for all repetitions at once """
+
+        params = [memory_one_params(p) for p in self.players]
+        vectors = np.array([v for v, _ in params]).reshape(-1, 4)
+        initials = np.array([i for _, i in params])
+        self.states, self.match_lengths = simulate_matches(
+            vectors, initials, self.turns, self.prob_end, self.reps, self.seed)
+        self.per_turn_states = self.states / self.match_lengths[..., None]
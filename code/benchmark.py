@@ -0,0 +1,226 @@
+'''
+Benchmark: Throughput of Tournaments, Systems and Experiments
+=============================================================
+
+Time the main entry points of the package on fixed inputs (the strategies of
+settings.CD_strategy_dict and the first partitions of their 12-strategy
+subset in the canonical order), write the results as JSON and compare them
+with a stored baseline, so that performance regressions show up as numbers.
+
+Each case reports the best of several runs as units per second (tournaments,
+systems or calls) together with the process peak RSS after the case. The
+peak RSS is the high-water mark of the whole process, so it only grows from
+one case to the next.
+
+Usage (from the code directory; pd_exp2 needs the repository root on the
+path):
+
+    PYTHONPATH=.. python benchmark.py --out bench.json
+    PYTHONPATH=.. python benchmark.py --quick --baseline ../Data/Benchmarks/baseline_quick.json
+
+Data/Benchmarks/baseline_quick.json holds the --quick results of the
+reference machine described in its 'meta' entry (Linux, Python 3.11, numpy
+2, axelrod 4.14). Timings only compare on the same machine: regenerate the
+baseline there with --quick --out before using it to catch regressions.
+
+Functions:
+
+    run_benchmarks(bool, int) -> dict
+        Runs every benchmark case and returns the results
+    compare(dict, dict, float) -> list
+        Returns the cases that are slower than the baseline
+    save_results(dict, str)
+        Writes results as a JSON file
+    load_results(str) -> dict
+        Reads results written by save_results
+
+'''
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import settings
+import pd_exp
+from helper_funcs import Partitions
+from match_matrix import MatchMatrix, cc_metrics
+from result_sink import ResultSink
+
+T = [0.25, 0.5, 0.75, 1.0]
+
+
+def _peak_rss_mb():
+    ''' Returns the peak resident set size of the process in MB (None if unknown) '''
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _players(size):
+    ''' Returns the first size players of settings.CD_strategy_dict '''
+
+    return list(settings.CD_strategy_dict.values())[:size]
+
+def _systems(count):
+    ''' Returns the first count partitions of 12 strategies into teams of 4 '''
+
+    names = list(settings.CD_strategy_dict)[:12]
+    return [[list(team) for team in sys] for sys in Partitions(names, 4).iter_range(0, count)]
+
+def _tournament(size, reps):
+    players = _players(size)
+    return 1, lambda: pd_exp.PdTournament(players, t=T, reps=reps, processes=None)
+
+def _tournament_matrix(size, reps):
+    players = _players(size)
+    matrix = MatchMatrix(settings.CD_strategy_dict, reps=reps)
+    return 100, lambda: [pd_exp.PdTournament(players, t=T, matrix=matrix) for _ in range(100)]
+
+def _tournament2(size, reps):
+    from code.pd_exp2 import PdTournament
+    players = _players(size)
+    return 1, lambda: PdTournament(players, reps=reps, processes=None)
+
+def _system(teams, reps):
+    team_list = _systems(1)[0][:teams]
+    matrix = MatchMatrix(settings.CD_strategy_dict, reps=reps)
+    def run():
+        for _ in range(20):
+            pd_exp.PdSystem(team_list, t=T, matrix=matrix).compute_data()
+    return 20, run
+
+def _experiment(systems, reps):
+    tuple_of_systems = _systems(systems)
+    matrix = MatchMatrix(settings.CD_strategy_dict, reps=reps)
+    def run():
+        exp = pd_exp.PdExp(tuple_of_systems, t=T, precompute=True, cache=False)
+        exp.matrix = matrix
+        with tempfile.TemporaryDirectory() as tmp:
+            with ResultSink(Path(tmp) / 'bench.csv', batch_size=systems) as sink:
+                exp.run_experiments(chunk_size=systems, sink=sink)
+    return systems, run
+
+def _metrics(size, reps):
+    players = _players(size)
+    results = pd_exp.Tournament(players=players, prob_end=pd_exp.PROB_END,
+                                turns=pd_exp.TURNS, repetitions=reps,
+                                seed=pd_exp.SEED).play(processes=None, progress_bar=False)
+    metrics = np.random.default_rng(0).random((100, 3, 5 + len(T)))
+    def run():
+        for _ in range(100):
+            states = pd_exp.state_array(results)
+            cc_metrics(states, 1000, T)
+            pd_exp.system_metrics(metrics, T)
+    return 100, run
+
+# name: (case, [(size, reps), ...], quick subset of the parameters)
+CASES = {'PdTournament': (_tournament, [(4, 1), (8, 1), (4, 10), (8, 10)], [(4, 1)]),
+         'PdTournament matrix': (_tournament_matrix, [(4, 1), (8, 1), (14, 1), (4, 10)],
+                                 [(4, 1)]),
+         'pd_exp2 PdTournament': (_tournament2, [(4, 1), (8, 1), (4, 10)], [(4, 1)]),
+         'PdSystem.compute_data': (_system, [(3, 1), (3, 10)], [(3, 1)]),
+         'PdExp.run_experiments': (_experiment, [(100, 1), (1000, 1)], [(100, 1)]),
+         'metric helpers': (_metrics, [(4, 1), (8, 5)], [(4, 1)])}
+
+def run_benchmarks(quick=False, repeat=3):
+    '''
+    Runs every benchmark case and returns the results
+
+        Parameters:
+            quick (bool): only run the smallest parameters of each case
+            repeat (int): number of timed runs of each case (the best is kept)
+
+        Returns:
+            (dict): 'meta' (versions, platform, time) and 'results', one
+                dict per case and parameters with name, size, reps, units,
+                seconds, per_sec and peak_rss_mb
+    '''
+
+    import axelrod
+    results = []
+    for name, (case, params, quick_params) in CASES.items():
+        for size, reps in (quick_params if quick else params):
+            units, run = case(size, reps)
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            results.append({'name': name, 'size': size, 'reps': reps, 'units': units,
+                            'seconds': best, 'per_sec': units / best,
+                            'peak_rss_mb': _peak_rss_mb()})
+            print(f'{name} size={size} reps={reps}: {units / best:.1f}/s', file=sys.stderr)
+    meta = {'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'axelrod': axelrod.__version__,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'quick': quick, 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+def compare(results, baseline, tolerance=0.2):
+    '''
+    Returns the cases that are slower than the baseline
+
+        Parameters:
+            results (dict): as returned by run_benchmarks
+            baseline (dict): earlier results (cases missing from either are
+                skipped)
+            tolerance (float): allowed drop of per_sec relative to the
+                baseline (default is 0.2, i.e. 20% slower)
+
+        Returns:
+            (list): one dict per regression with name, size, reps, per_sec,
+                baseline per_sec and their ratio
+    '''
+
+    key = lambda r: (r['name'], r['size'], r['reps'])
+    reference = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in results['results']:
+        base = reference.get(key(r))
+        if base is not None and r['per_sec'] < base['per_sec'] * (1 - tolerance):
+            regressions.append({'name': r['name'], 'size': r['size'], 'reps': r['reps'],
+                                'per_sec': r['per_sec'], 'baseline': base['per_sec'],
+                                'ratio': r['per_sec'] / base['per_sec']})
+    return regressions
+
+def save_results(results, path):
+    ''' Writes results as a JSON file '''
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+def load_results(path):
+    ''' Reads results written by save_results '''
+
+    with open(path) as f:
+        return json.load(f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--quick', action='store_true',
+                        help='only run the smallest parameters of each case')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--out', help='JSON file to write the results to')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown before a case counts as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.quick, args.repeat)
+    if args.out:
+        save_results(results, args.out)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['name']} size={r['size']} reps={r['reps']}: "
+                  f"{r['per_sec']:.1f}/s vs {r['baseline']:.1f}/s", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
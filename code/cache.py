@@ -0,0 +1,160 @@
+'''
+Cache: Memoized Team Tournaments
+================================
+
+Across the systems of an experiment the same team is drawn many times (only
+C(12,4)=495 distinct teams exist among the 5775 partitions of Experiment 2).
+A team's tournament results are keyed by its content - the players' strategy
+parameters, the game and the match settings - and kept in an in-memory LRU
+layer and, optionally, an SQLite file that persists across runs.
+
+Classes:
+
+    TournamentCache
+        Two-level (memory, disk) store of tournament results
+
+Functions:
+
+    tournament_key(list, object, int, float, int, int, list) -> str
+        Returns the content address of a team tournament
+
+'''
+from axelrod import game as axl_game
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+
+
+def tournament_key(roster, game=None, turns=30, prob_end=0.1, reps=1, seed=1,
+                   thresholds=()):
+    '''
+    Returns the content address of a team tournament
+
+    Players are identified by repr, which for axelrod players includes the
+    strategy parameters (e.g. "Generic Memory One Player: (1, 0, 1, 0), C"),
+    in roster order: with a seed, the order decides the match lengths each
+    pairing draws, so the same team listed in another order is another
+    tournament.
+
+        Parameters:
+            roster (list): players of the tournament
+            game (object): axelrod.game (None for the classic PD setting)
+            turns (int), prob_end (float), reps (int), seed (int): match and
+                tournament settings
+            thresholds (list): CC-fraction thresholds
+
+        Returns:
+            (str): sha256 hex digest
+    '''
+
+    if game is None:
+        game = axl_game.Game()
+    content = {'players': [repr(p) for p in roster],
+               'RPST': [float(x) for x in game.RPST()],
+               'turns': turns, 'prob_end': prob_end, 'reps': reps,
+               'seed': seed, 'thresholds': [float(t) for t in thresholds]}
+    encoded = json.dumps(content, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+class TournamentCache:
+    """
+    A class to represent a two-level cache of tournament results.
+
+    ...
+
+    Values are JSON-serializable objects. Lookups go to the in-memory LRU
+    layer first, then to the SQLite file; disk hits are promoted to memory.
+
+    Attributes
+    ----------
+    maxsize : int
+        maximum number of entries of the in-memory layer
+    path : str
+        SQLite file of the on-disk layer (None for memory only)
+    hits : int
+        number of successful lookups
+    misses : int
+        number of failed lookups
+
+    Methods
+    -------
+    get(key):
+        Returns the cached value or None
+    put(key, value):
+        Stores value in both layers
+    close():
+        Closes the SQLite connection
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        """
+        Parameters
+        ----------
+        maxsize : int
+            maximum number of entries of the in-memory layer (default is 4096)
+        path : str
+            SQLite file of the on-disk layer (default is None, which keeps
+            the cache in memory only)
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=60)
+            self._db.execute('CREATE TABLE IF NOT EXISTS tournaments '
+                             '(key TEXT PRIMARY KEY, value TEXT)')
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __getstate__(self):
+        # Worker processes get an empty memory layer and their own connection
+        return {'maxsize': self.maxsize, 'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """ Returns the cached value for key, or None if it is not cached """
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self._db is not None:
+            row = self._db.execute('SELECT value FROM tournaments WHERE key = ?',
+                                   (key,)).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """ Stores value under key in memory and, if enabled, on disk """
+
+        self._remember(key, value)
+        if self._db is not None:
+            self._db.execute('INSERT OR REPLACE INTO tournaments VALUES (?, ?)',
+                             (key, json.dumps(value)))
+            self._db.commit()
+
+    def close(self):
+        """ Closes the SQLite connection of the on-disk layer """
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,133 @@
+'''
+Cycles: Closed-Form Deterministic Memory-One Matches
+====================================================
+
+Two deterministic memory-one players move through the four game states
+(CC, CD, DC, DD) as a fixed function of the current state, so after at most
+four turns their match repeats a cycle of at most four states. Once the
+transient and the cycle are known, the state counts (and hence the scores)
+of a match of any length follow arithmetically, and a match of 10**6 turns
+costs as much as one of 30.
+
+Classes:
+
+    CycleMatrix
+        MatchMatrix of deterministic players filled from their cycles
+        instead of playing every turn.
+
+Functions:
+
+    is_deterministic(numpy.ndarray) -> bool
+        Returns True if every response probability is 0 or 1
+    find_cycle(numpy.ndarray, numpy.ndarray, int) -> (list, list)
+        Returns the transient and the cycle of states of a match
+    cycle_counts(list, list, numpy.ndarray) -> numpy.ndarray
+        Returns the state counts of matches of the given lengths
+
+'''
+import numpy as np
+from match_matrix import MatchMatrix
+from markov import memory_one_params, SWAP
+from batch_sim import sample_lengths
+
+
+def is_deterministic(vector):
+    ''' Returns True if every response probability is 0 or 1 '''
+
+    return bool(np.all((vector == 0) | (vector == 1)))
+
+def find_cycle(own, other, first):
+    '''
+    Returns the transient and the cycle of states of a match between two
+    deterministic memory-one players
+
+        Parameters:
+            own (numpy.ndarray): first player's P(C|CC), P(C|CD), P(C|DC),
+                P(C|DD), each 0 or 1
+            other (numpy.ndarray): the same for the second player
+            first (int): state of the first turn (CC=0, CD=1, DC=2, DD=3),
+                from the first player's point of view
+
+        Returns:
+            transient (list): states played once before the cycle starts
+            cycle (list): states that then repeat in order
+    '''
+
+    seen = dict()
+    sequence = []
+    state = first
+    while state not in seen:
+        seen[state] = len(sequence)
+        sequence.append(state)
+        state = 2 * (1 - int(own[state])) + (1 - int(other[SWAP[state]]))
+    start = seen[state]
+    return sequence[:start], sequence[start:]
+
+def _prefix_counts(states):
+    ''' Returns the (len(states) + 1, 4) state counts after the first k states '''
+
+    counts = np.zeros((len(states) + 1, 4), dtype=np.int64)
+    for k, state in enumerate(states):
+        counts[k + 1] = counts[k]
+        counts[k + 1, state] += 1
+    return counts
+
+def cycle_counts(transient, cycle, lengths):
+    '''
+    Returns the state counts of matches of the given lengths that follow
+    transient and then repeat cycle
+
+        Parameters:
+            transient (list): states played once before the cycle starts
+            cycle (list): states that then repeat in order
+            lengths (numpy.ndarray): integer match lengths (any shape)
+
+        Returns:
+            (numpy.ndarray): lengths.shape + (4,) CC, CD, DC, DD counts
+    '''
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    head, loop = _prefix_counts(transient), _prefix_counts(cycle)
+
+    in_head = np.minimum(lengths, len(transient))
+    full, part = np.divmod(lengths - in_head, len(cycle))
+    return head[in_head] + full[..., None] * loop[-1] + loop[part]
+
+class CycleMatrix(MatchMatrix):
+    """
+    A MatchMatrix of deterministic memory-one players filled from the cycles
+    of their matches.
+
+    Match lengths are drawn with the tournaments' stopping rule from seed
+    (as in batch_sim), so repetitions only differ in their lengths. The cost
+    does not depend on turns, which may be large (or None with prob_end).
+    """
+
+    def play(self):
+        """ Fills the arrays from each pairing's transient and cycle """
+
+        params = [memory_one_params(p) for p in self.players]
+        vectors = np.array([v for v, _ in params]).reshape(-1, 4)
+        initials = np.array([i for _, i in params])
+        for player, vector in zip(self.players, vectors):
+            if not is_deterministic(vector):
+                raise ValueError(f'{player} is not deterministic')
+
+        n = len(vectors)
+        first, second = np.triu_indices(n)
+        rng = np.random.default_rng(self.seed)
+        lengths = sample_lengths(self.turns, self.prob_end, (self.reps, len(first)), rng)
+
+        counts = np.zeros(lengths.shape + (4,), dtype=np.int64)
+        for pair, (i, j) in enumerate(zip(first, second)):
+            start = 2 * (1 - int(initials[i])) + (1 - int(initials[j]))
+            transient, cycle = find_cycle(vectors[i], vectors[j], start)
+            counts[:, pair] = cycle_counts(transient, cycle, lengths[:, pair])
+
+        self.states = np.zeros((self.reps, n, n, 4), dtype=np.int64)
+        self.states[:, first, second] = counts
+        self.states[:, second, first] = counts[..., SWAP]
+        self.match_lengths = np.zeros((self.reps, n, n), dtype=np.int64)
+        self.match_lengths[:, first, second] = lengths
+        self.match_lengths[:, second, first] = lengths
+        self.per_turn_states = self.states / self.match_lengths[..., None]
@@ -0,0 +1,219 @@
+'''
+Encoding: Integer Codes of Teams and Systems
+============================================
+
+Encode teams and systems as integers instead of decimal-string System IDs.
+
+A team is a 64-bit mask with bit k - 1 set for the strategy of decimal code
+k (settings.name_dec_dict), i.e. bit i for settings.player_names[i] (or for
+names[i] of another list of strategies, as an unbounded Python int). A
+system is a fixed-width row of team masks, one per team in the order of its
+team list, and an array of systems is a (systems, teams) uint64 array.
+Since the teams of a system are disjoint, system_key packs a system into a
+single canonical integer that does not depend on the order of its teams.
+
+A mask is a set: it forgets the order of a team's list and cannot hold a
+strategy twice. It is therefore only an internal key, used as the compact
+form of rows when every team lists distinct strategies in ascending code
+order (see masks_exact), so that System IDs ("1,2,3_4,5,6"), team names and
+player names are produced from it unchanged when rows are exported (see
+pd_exp.expand_frame). Other systems, e.g. "2,2,8_6,8,4", keep the decimal
+codes of their System ID, in the order of their team lists.
+
+Functions:
+
+    team_mask(list, list) -> int
+        Returns the mask of a team of strategy names
+    team_members(int, list) -> list
+        Returns the strategy names of a team mask
+    team_codes(list, list) -> tuple
+        Returns the decimal codes of a team, in the order of its list
+    system_codes(str) -> list
+        Returns the decimal codes of every team of a System ID
+    masks_exact(list) -> bool
+        True if team masks give back the teams of the given codes
+    system_masks(list, list) -> numpy.ndarray
+        Returns the (systems, teams) team masks of systems
+    system_key(numpy.ndarray) -> numpy.ndarray
+        Packs the team masks of systems into one canonical integer each
+    parse_system_id(str) -> list
+        Returns the team masks of a System ID
+    format_system_id(list) -> str
+        Returns the System ID of team masks (codes ascending)
+    system_ids(numpy.ndarray) -> list
+        Returns the System IDs of many systems
+
+'''
+from functools import lru_cache
+import numpy as np
+import settings
+
+
+@lru_cache(maxsize=8)
+def _bits(names):
+    ''' Returns the bit of every strategy name, in the order of names '''
+
+    return {name: 1 << num for num, name in enumerate(names)}
+
+def team_mask(team, names=None):
+    '''
+    Returns the mask of a team of strategy names
+
+        Parameters:
+            team (list): strategy names, each at most once
+            names (list): all strategy names, by decimal code - 1 (default
+                is None, settings.player_names); with more than 64 names the
+                mask no longer fits a uint64 array
+
+        Returns:
+            (int): bit i set for names[i]
+    '''
+
+    bits = _bits(tuple(names or settings.player_names))
+    mask = 0
+    for name in team:
+        bit = bits[name]
+        if mask & bit:
+            raise ValueError(f'{name!r} appears twice in {team!r}; a team mask '
+                             'only holds distinct strategies')
+        mask |= bit
+    return mask
+
+def team_members(mask, names=None):
+    ''' Returns the strategy names of a team mask, in the order of names '''
+
+    mask = int(mask)
+    return [name for num, name in enumerate(names or settings.player_names) if mask >> num & 1]
+
+def team_codes(team, names=None):
+    '''
+    Returns the decimal codes of a team, in the order of its list
+
+        Parameters:
+            team (list): strategy names (a name may appear more than once)
+            names (list): all strategy names, by decimal code - 1 (default
+                is None, settings.player_names)
+
+        Returns:
+            (tuple): one code (position in names + 1) per member
+    '''
+
+    bits = _bits(tuple(names or settings.player_names))
+    return tuple(bits[name].bit_length() for name in team)
+
+def system_codes(system_id):
+    ''' Returns one tuple of decimal codes per team of a System ID, in order '''
+
+    try:
+        return [tuple(int(code) for code in team.split(',')) for team in system_id.split('_')]
+    except ValueError:
+        raise ValueError(f'{system_id!r} is not a System ID of decimal codes') from None
+
+def masks_exact(teams):
+    '''
+    True if uint64 team masks give back the teams of the given codes, i.e.
+    every team lists distinct codes, at most 64, in ascending order
+
+        Parameters:
+            teams (list): tuples of decimal codes (see team_codes)
+
+        Returns:
+            (bool)
+    '''
+
+    return all(all(a < b for a, b in zip(codes, codes[1:])) and codes[-1] <= 64
+               for codes in teams if codes)
+
+def system_masks(systems, names=None):
+    '''
+    Returns the team masks of systems
+
+        Parameters:
+            systems (list): team lists with the same number of teams, each
+                team of distinct strategies
+            names (list): all strategy names, by decimal code - 1, at most
+                64 (default is None, settings.player_names)
+
+        Returns:
+            (numpy.ndarray): (systems, teams) uint64 masks
+    '''
+
+    masks = dict()
+    def mask(team):
+        key = tuple(team)
+        if key not in masks:
+            masks[key] = team_mask(team, names)
+        return masks[key]
+    return np.array([[mask(team) for team in sys] for sys in systems],
+                    dtype=np.uint64).reshape(len(systems), -1)
+
+def system_key(masks):
+    '''
+    Packs the team masks of systems into one integer each, with the teams
+    sorted so that systems with the same teams in another order share a key
+
+        Parameters:
+            masks (numpy.ndarray): (systems, teams) team masks
+
+        Returns:
+            (numpy.ndarray): (systems,) uint64 keys, the sorted masks
+                shifted by len(settings.player_names) bits each
+    '''
+
+    masks = np.sort(np.asarray(masks, dtype=np.uint64), axis=-1)
+    width = len(settings.player_names)
+    if width * masks.shape[-1] > 64:
+        raise ValueError(f'{masks.shape[-1]} teams of {width} strategies do not fit in 64 bits')
+    keys = np.zeros(masks.shape[:-1], dtype=np.uint64)
+    for num in range(masks.shape[-1]):
+        keys |= masks[..., num] << np.uint64(width * num)
+    return keys
+
+def parse_system_id(system_id):
+    '''
+    Returns the team masks of a System ID such as "1,2,3_4,5,6"
+
+        Parameters:
+            system_id (str): decimal strategy codes, ',' within a team and
+                '_' between teams, each code at most once per team
+
+        Returns:
+            (list): one int per team with bit code - 1 set for each member
+    '''
+
+    masks = []
+    for codes in system_codes(system_id):
+        if len(set(codes)) < len(codes):
+            raise ValueError(f'a team of {system_id!r} repeats a strategy; a team mask '
+                             'only holds distinct strategies')
+        masks.append(sum(1 << (code - 1) for code in codes))
+    return masks
+
+def format_system_id(masks):
+    '''
+    Returns the System ID of team masks, with the codes of each team in
+    ascending order (pd_exp.system_id keeps the order of team lists)
+    '''
+
+    return '_'.join(','.join(str(k + 1) for k in range(int(mask).bit_length()) 
+                             if int(mask) >> k & 1)
+                    for mask in masks)
+
+def system_ids(masks):
+    '''
+    Returns the System IDs of many systems, formatting each distinct team
+    mask once
+
+        Parameters:
+            masks (numpy.ndarray): (systems, teams) team masks
+
+        Returns:
+            (list): one System ID per system
+    '''
+
+    masks = np.asarray(masks, dtype=np.uint64)
+    if not masks.size:
+        return [''] * len(masks)
+    unique, inverse = np.unique(masks, return_inverse=True)
+    team_ids = np.array([format_system_id([m]) for m in unique], dtype=object)
+    return ['_'.join(ids) for ids in team_ids[inverse.reshape(masks.shape)]]
@@ -1,77 +1,192 @@
-import random
-from itertools import combinations, permutations
-
-# def partitions(set_array, subset_size):
-#     """
-#     Generates partition sets of the input list with the given subset_size.
-    
-#         Parameters:
-#             set_array (list): list of elements, or set, to be partitioned
-#             subset_size (int): size (k) of uniform partitions
-        
-#         Returns:
-#             (iterator) : yields a partition set of k-sized subsets
-#     """
-#     print("sdfgfg")
-#     if len(set_array) == 0:
-#         yield []
-#     else:
-#         random_strategy = random.choice(set_array)
-#         set_A = set(set_array)
-#         singleton = {random_strategy}  
-#         print(list(combinations(set_A-singleton, subset_size-1)))
-#         for S in list(combinations(set_A-singleton, subset_size-1)):
-#             X = set(S) | singleton  # X is a 'partition set'  
-#             print("This is X:", X)
-#             for P in partitions(list(set_A - X), subset_size):
-#                 yield P+[tuple(X)]
+from itertools import combinations, combinations_with_replacement, islice
+from math import comb, factorial
+
+
+def count_partitions(n, subset_size):
+    """
+    Returns the number of partitions of n elements into subset_size-sized
+    subsets: n! / ((k!)^(n/k) (n/k)!)  (5775 for n=12 and k=4)
+    """
+    if subset_size < 1 or n % subset_size:
+        raise ValueError(f'{n} elements cannot be split into subsets of {subset_size}')
+    num_subsets = n // subset_size
+    return factorial(n) // (factorial(subset_size)**num_subsets * factorial(num_subsets))
+
+def count_rosters(n, roster_size):
+    """
+    Returns the number of rosters of roster_size players drawn from n
+    strategies with repeats allowed: C(n + k - 1, k)  (4960 for n=30, k=3)
+    """
+    return comb(n + roster_size - 1, roster_size)
+
+def _rank_combination(combo, n):
+    """ Returns the lexicographic rank of a sorted combination of range(n) """
+    rank = 0
+    prev = -1
+    k = len(combo)
+    for i, c in enumerate(combo):
+        for skipped in range(prev + 1, c):
+            rank += comb(n - skipped - 1, k - i - 1)
+        prev = c
+    return rank
+
+def _unrank_combination(rank, n, k):
+    """ Returns the sorted combination of range(n) with the given lexicographic rank """
+    combo = []
+    c = 0
+    for i in range(k):
+        while True:
+            block = comb(n - c - 1, k - i - 1)
+            if rank < block:
+                break
+            rank -= block
+            c += 1
+        combo.append(c)
+        c += 1
+    return combo
+
+class Partitions:
+    """
+    A class to represent the partitions of a list into subset_size-sized
+    subsets, in a fixed (canonical) order.
+
+    ...
+
+    A partition is a list of tuples. Each subset keeps the order of set_array
+    and the subsets are ordered by their first element, so the first subset
+    always holds set_array[0]. Partitions are ordered by the lexicographic
+    rank of their first subset, then recursively by the remaining subsets,
+    which makes every partition addressable by an integer rank.
+
+    Attributes
+    ----------
+    set_array : list
+        list of elements, or set, to be partitioned
+    subset_size : int
+        size (k) of uniform partitions
+    count : int
+        number of partitions
+
+    Methods
+    -------
+    rank(partition):
+        Returns the position of partition in the canonical order
+    unrank(i):
+        Returns the partition at position i of the canonical order
+    iter_range(start, stop):
+        Yields the partitions at positions start to stop-1
+    """
+
+    def __init__(self, set_array, subset_size):
+        """
+        Parameters
+        ----------
+        set_array : list
+            list of elements, or set, to be partitioned (elements are told
+            apart by position, so rank needs them to be distinct)
+        subset_size : int
+            size (k) of uniform partitions
+        """
+        self.set_array = list(set_array)
+        self.subset_size = subset_size
+        self.count = count_partitions(len(self.set_array), subset_size)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self._generate(list(range(len(self.set_array))))
+
+    def _generate(self, positions, offset=0):
+        """ Yields the partitions of positions, skipping the first offset """
+        if not positions:
+            yield []
+            return
+        first, rest = positions[0], positions[1:]
+        block = count_partitions(len(rest) - self.subset_size + 1, self.subset_size)
+        skip, offset = divmod(offset, block)
+        for S in islice(combinations(rest, self.subset_size - 1), skip, None):
+            chosen = set(S)
+            remaining = [p for p in rest if p not in chosen]
+            team = tuple(self.set_array[p] for p in (first,) + S)
+            for P in self._generate(remaining, offset):
+                yield [team] + P
+            offset = 0
+
+    def rank(self, partition):
+        """ Returns the position of partition in the canonical order """
+
+        position = {e: p for p, e in enumerate(self.set_array)}
+        if len(position) != len(self.set_array):
+            raise ValueError('rank needs distinct elements in set_array')
+        teams = sorted(sorted(position[e] for e in team) for team in partition)
+        if sorted(p for team in teams for p in team) != list(range(len(self.set_array))) \
+                or any(len(team) != self.subset_size for team in teams):
+            raise ValueError(f'{partition} is not a partition of set_array')
+
+        rank = 0
+        remaining = list(range(len(self.set_array)))
+        for team in teams:
+            rest = remaining[1:]
+            relative = [rest.index(p) for p in team[1:]]
+            remaining = [p for p in rest if p not in team]
+            block = count_partitions(len(remaining), self.subset_size)
+            rank += _rank_combination(relative, len(rest)) * block
+        return rank
+
+    def unrank(self, i):
+        """ Returns the partition at position i of the canonical order """
+
+        if not 0 <= i < self.count:
+            raise IndexError(f'partition index {i} out of range')
+        partition = []
+        remaining = list(range(len(self.set_array)))
+        while remaining:
+            rest = remaining[1:]
+            block = count_partitions(len(rest) - self.subset_size + 1, self.subset_size)
+            combo_rank, i = divmod(i, block)
+            chosen = [rest[c] for c in _unrank_combination(combo_rank, len(rest),
+                                                            self.subset_size - 1)]
+            partition.append(tuple(self.set_array[p] for p in [remaining[0]] + chosen))
+            remaining = [p for p in rest if p not in chosen]
+        return partition
+
+    def iter_range(self, start, stop=None):
+        """
+        Yields the partitions at positions start to stop-1 (to the end if
+        stop is None), so that a run can be split into index ranges
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return
+        positions = list(range(len(self.set_array)))
+        yield from islice(self._generate(positions, start), stop - start)
 
 def partitions(set_array, subset_size):
     """
     Generates partition sets of the input list with the given subset_size.
-    
+
         Parameters:
             set_array (list): list of elements, or set, to be partitioned
             subset_size (int): size (k) of uniform partitions
-        
+
+        Returns:
+            (iterator) : yields a partition set of k-sized subsets, in the
+                canonical order of Partitions
+    """
+    return iter(Partitions(set_array, subset_size))
+
+def rosters(set_array, roster_size):
+    """
+    Generates the multiset rosters of roster_size players drawn from
+    set_array, each distinct multiset once.
+
+        Parameters:
+            set_array (list): distinct elements (e.g. strategy names)
+            roster_size (int): number of players of a roster
+
         Returns:
-            (iterator) : yields a partition set of k-sized subsets
+            (iterator) : yields count_rosters(len(set_array), roster_size)
+                tuples that keep the order of set_array, e.g. (a, a, b)
     """
-    if len(set_array) == 0:
-        yield []
-    else:
-        random_strategy = random.choice(set_array)
-        set_A = set_array
-        singleton = random_strategy 
-        set_A.remove(singleton)
-        print(list(combinations(set_A, subset_size-1)))
-        for S in list(combinations(set_A, subset_size-1)):
-            X = list(S) + [singleton]  # X is a 'partition set' 
-            print("Set_A: ", set_A) 
-            print("This is X:", X)
-            for s in S:
-                if s in set_A:
-                    set_A.remove(s)
-            # set_A = [x for x in set_A if x not in X]
-            for P in partitions(set_A, subset_size):
-                yield P+[tuple(X)]
-
-# very inefficient but work just fine
-# def partitions(set_array, subset_size):
-#     permuts = permutations(set_array)
-#     all_parts = []
-#     all_sets = []
-#     for p in permuts:
-#         split_points = [i for i in range(0, len(set_array), subset_size)]
-#         part_list = [p[ind:ind+subset_size] for ind in split_points]
-#         part_set = [frozenset(p) for p in part_list]
-#         # print(part_set)
-#         if set(part_set) not in all_sets:
-#             all_parts.append(part_list)
-#             all_sets.append(set(part_set))
-#     return (all_parts)
-from time import sleep
-a = [1, 1, 1, 2, 2, 2]
-for p in partitions(a, 2):
-    print()
-    sleep(3)
+    return combinations_with_replacement(set_array, roster_size)
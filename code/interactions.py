@@ -0,0 +1,314 @@
+'''
+Interactions: Bit-Packed Match Records
+======================================
+
+Store the actions of every match in a compact binary file. Each action is one
+bit (1 for C, 0 for D), and every match record starts with a fixed header
+holding the player and opponent indexes, the repetition and the number of
+turns, so a reader can walk the records through a memory map without loading
+the file.
+
+File layout (little endian):
+
+    magic (8 bytes) | number of matches (uint64) | records...
+    record: player (int32) | opponent (int32) | repetition (int32) |
+            turns (uint32) | player actions (ceil(turns/8) bytes) |
+            opponent actions (ceil(turns/8) bytes)
+
+Classes:
+
+    InteractionWriter
+        Appends match records to a packed interactions file
+    InteractionReader
+        Memory-mapped, streaming access to a packed interactions file
+    PackedTournament
+        axelrod Tournament that packs each match's actions as it is played
+
+Functions:
+
+    convert_interactions(str, str, int) -> int
+        Packs an axelrod interactions csv file, reading it in chunks
+    to_actions(numpy.ndarray) -> list
+        Returns packed-file actions as a list of axelrod action pairs
+
+'''
+from axelrod import Action, Tournament
+from axelrod import interaction_utils as iu
+import warnings
+import numpy as np
+import pandas as pd
+
+MAGIC = b'PDINTER1'
+HEADER = np.dtype([('player', '<i4'), ('opponent', '<i4'), ('repetition', '<i4'),
+                   ('turns', '<u4')])
+C, D = Action.C, Action.D
+
+
+def _to_bits(actions):
+    ''' Returns a string (or list) of C/D actions as packed bits, C as 1 '''
+
+    return np.packbits(np.array([str(a) == 'C' for a in actions], dtype=bool)).tobytes()
+
+def to_actions(pairs):
+    '''
+    Returns packed-file actions as a list of axelrod action pairs
+
+        Parameters:
+            pairs (numpy.ndarray): (turns, 2) booleans, True for C, as
+                yielded by InteractionReader
+
+        Returns:
+            (list): [(Action, Action), ...] as in an axelrod interaction
+    '''
+
+    return [(C if a else D, C if b else D) for a, b in pairs]
+
+class InteractionWriter:
+    """
+    A class to represent a packed interactions file being written.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        output file
+    count : int
+        number of match records written
+
+    Methods
+    -------
+    write(player, opponent, repetition, player_actions, opponent_actions):
+        Appends one match record
+    close():
+        Writes the number of matches and closes the file
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            output file (replaced if it exists)
+        """
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + np.uint64(0).tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, player, opponent, repetition, player_actions, opponent_actions):
+        """ Appends one match record (actions as 'CD...' strings or Actions) """
+
+        if len(player_actions) != len(opponent_actions):
+            raise ValueError('both players must have one action per turn')
+        header = np.array([(player, opponent, repetition, len(player_actions))], dtype=HEADER)
+        self._file.write(header.tobytes())
+        self._file.write(_to_bits(player_actions))
+        self._file.write(_to_bits(opponent_actions))
+        self.count += 1
+
+    def close(self):
+        """ Writes the number of matches and closes the file """
+
+        if self._file.closed:
+            return
+        self._file.seek(len(MAGIC))
+        self._file.write(np.uint64(self.count).tobytes())
+        self._file.close()
+
+class InteractionReader:
+    """
+    A class to represent memory-mapped access to a packed interactions file.
+
+    ...
+
+    Iterating yields (player, opponent, repetition, pairs) for each match,
+    where pairs is a (turns, 2) boolean array (True for C) that is unpacked
+    from the memory map one match at a time.
+
+    Attributes
+    ----------
+    path : str
+        packed interactions file
+    count : int
+        number of match records
+
+    Methods
+    -------
+    headers():
+        Returns the header of every record as a structured array
+    match(k):
+        Returns record k
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            packed interactions file, as written by InteractionWriter
+        """
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{path} is not a packed interactions file')
+        self.count = int(self._data[len(MAGIC):len(MAGIC) + 8].view('<u8')[0])
+        self._offsets = None
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, offset):
+        """ Returns the record at offset and the offset of the next one """
+
+        header = self._data[offset:offset + HEADER.itemsize].view(HEADER)[0]
+        turns = int(header['turns'])
+        width = (turns + 7) // 8
+        start = offset + HEADER.itemsize
+        own = np.unpackbits(self._data[start:start + width], count=turns)
+        other = np.unpackbits(self._data[start + width:start + 2 * width], count=turns)
+        record = (int(header['player']), int(header['opponent']),
+                  int(header['repetition']), np.stack([own, other], axis=1).astype(bool))
+        return record, start + 2 * width
+
+    def __iter__(self):
+        offset = len(MAGIC) + 8
+        for _ in range(self.count):
+            record, offset = self._record(offset)
+            yield record
+
+    def headers(self):
+        """
+        Returns the header of every record as a structured array (player,
+        opponent, repetition, turns) and keeps the record offsets for match
+        """
+        offsets = np.empty(self.count, dtype=np.int64)
+        headers = np.empty(self.count, dtype=HEADER)
+        offset = len(MAGIC) + 8
+        for k in range(self.count):
+            offsets[k] = offset
+            headers[k] = self._data[offset:offset + HEADER.itemsize].view(HEADER)[0]
+            offset += HEADER.itemsize + 2 * ((int(headers[k]['turns']) + 7) // 8)
+        self._offsets = offsets
+        return headers
+
+    def match(self, k):
+        """ Returns record k as (player, opponent, repetition, pairs) """
+
+        if self._offsets is None:
+            self.headers()
+        return self._record(self._offsets[k])[0]
+
+def convert_interactions(csv_path, path, chunksize=100000):
+    '''
+    Packs an axelrod interactions csv file (as written by
+    Tournament.play(filename=...)), reading it in chunks
+
+    Each match appears in the csv as two rows, one from each player's point
+    of view; the first row gives the record's player.
+
+        Parameters:
+            csv_path (str): axelrod interactions file
+            path (str): packed interactions file to write
+            chunksize (int): number of csv rows read at a time
+
+        Returns:
+            (int): number of match records written
+    '''
+
+    columns = ['Interaction index', 'Player index', 'Opponent index', 'Repetition',
+               'Actions']
+    pending = None
+    with InteractionWriter(path) as writer:
+        for chunk in pd.read_csv(csv_path, usecols=columns, dtype={'Actions': str},
+                                 chunksize=chunksize):
+            for row in chunk[columns].itertuples(index=False):
+                if pending is not None and pending[0] == row[0]:
+                    writer.write(pending[1], pending[2], pending[3], pending[4], row[4])
+                    pending = None
+                else:
+                    pending = row
+        return writer.count
+
+class PackedTournament(Tournament):
+    """
+    A class to represent an axelrod Tournament whose matches are packed into
+    an InteractionWriter as they are played.
+
+    ...
+
+    No csv file and no ResultSet are built: the actions of each match go
+    straight to the packed file and only the state counts and match lengths
+    of every pairing and repetition are kept (the arrays of a
+    match_matrix.MatchMatrix), so memory and disk do not grow with the
+    interactions beyond the packed file itself. With processes, the matches
+    are played in worker processes and packed as they arrive, as axelrod
+    writes its csv.
+
+    Attributes
+    ----------
+    states : numpy.ndarray
+        (repetitions, players, players, 4) CC, CD, DC, DD counts from the
+        row player's point of view
+    match_lengths : numpy.ndarray
+        (repetitions, players, players) number of turns
+
+    Methods
+    -------
+    play_packed(path, processes=None, progress_bar=True):
+        Plays the tournament into the packed interactions file path
+    """
+
+    def play_packed(self, path, processes=None, progress_bar=True):
+        """
+        Plays the tournament into the packed interactions file path and
+        returns the number of match records written
+        """
+        n = len(self.players)
+        self.states = np.zeros((self.repetitions, n, n, 4), dtype=np.int64)
+        self.match_lengths = np.zeros((self.repetitions, n, n), dtype=np.int64)
+        with InteractionWriter(path) as writer:
+            self._writer = writer
+            try:
+                with warnings.catch_warnings():
+                    # Results are read from the packed file, not a ResultSet
+                    warnings.simplefilter('ignore')
+                    self.play(build_results=False, processes=processes,
+                              progress_bar=progress_bar)
+            finally:
+                self._writer = None
+            return writer.count
+
+    def __getstate__(self):
+        # Worker processes only play matches; the writer stays here
+        state = self.__dict__.copy()
+        state['_writer'] = None
+        return state
+
+    def setup_output(self, filename=None):
+        self.filename = None
+        self._temp_file_descriptor = None
+
+    def _get_file_objects(self, build_results=True):
+        return None, None
+
+    def _write_interactions_to_file(self, results, writer):
+        """ Packs the matches of a chunk and records their state counts """
+
+        states = [(C, C), (C, D), (D, C), (D, D)]
+        for (i, j), matches in results.items():
+            for rep, (interaction, _) in enumerate(matches):
+                self._writer.write(i, j, rep, [a for a, _ in interaction],
+                                   [b for _, b in interaction])
+                dist = iu.compute_state_distribution(interaction)
+                counts = [dist[state] for state in states]
+                self.states[rep, i, j] = counts
+                self.states[rep, j, i] = counts[0], counts[2], counts[1], counts[3]
+                self.match_lengths[rep, i, j] = self.match_lengths[rep, j, i] = len(interaction)
+                self.num_interactions += 1
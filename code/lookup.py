@@ -0,0 +1,252 @@
+'''
+Lookup: Vectorized Memory-n Lookup-Table Strategies
+===================================================
+
+Represent deterministic and stochastic memory-n strategies (n up to about 3)
+as NumPy tables and simulate every pairing of a population of them at once.
+
+A player of memory m has a table of 4**m probabilities of cooperating, one
+per history of its last m rounds, and m opening probabilities used on the
+first m turns. A round is indexed from the player's own point of view (CC=0,
+CD=1, DC=2, DD=3, as in match_matrix.STATES) and history index h holds the
+most recent round in its lowest base-4 digit, so for m = 1 the table is the
+usual memory-one vector (P(C|CC), P(C|CD), P(C|DC), P(C|DD)).
+
+Players of a population are stacked into (players, 4**n) tables of the
+largest memory n (a memory-m table repeats itself 4**(n - m) times), and a
+turn of every match of every repetition is a few array operations. A
+deterministic population plays each pairing once, up to the longest match,
+and every repetition reads the counts of its own match length.
+
+LookupPlayer objects can be the roster of a PdTournament (which then builds
+a LookupMatrix) and a dict of them can be the strategy_dict of a PdSystem or
+a LookupMatrix shared by many systems.
+
+Classes:
+
+    LookupPlayer
+        A memory-n lookup-table strategy
+    LookupMatrix
+        MatchMatrix filled by the vectorized lookup-table simulator
+
+Functions:
+
+    lift_table(numpy.ndarray, int) -> numpy.ndarray
+        Returns a lookup table as the table of a longer memory
+    random_population(int, int, bool, int) -> dict
+        Returns generated lookup-table players by name
+    simulate_lookup(numpy.ndarray, numpy.ndarray, numpy.ndarray, int, float,
+                    int, object) -> tuple
+        Returns sampled state counts and match lengths of every pairing of
+        the given lookup tables for each repetition
+
+'''
+import numpy as np
+from match_matrix import MatchMatrix
+from batch_sim import sample_lengths
+from markov import memory_one_params, SWAP
+
+
+def lift_table(table, memory):
+    '''
+    Returns a lookup table as the table of a longer memory
+
+        Parameters:
+            table (numpy.ndarray): (4**m,) probabilities of cooperating
+            memory (int): memory n >= m of the returned table
+
+        Returns:
+            (numpy.ndarray): (4**n,) table whose entry h is table[h % 4**m]
+                (only the last m rounds matter)
+    '''
+
+    return np.tile(table, 4**memory // len(table))
+
+class LookupPlayer:
+    """
+    A class to represent a memory-n lookup-table strategy.
+
+    ...
+
+    Players are compared by identity, like axelrod players in a MatchMatrix;
+    repr describes the strategy itself, so TournamentCache keys depend on the
+    tables and not on the object.
+
+    Attributes
+    ----------
+    name : str
+        strategy name
+    table : numpy.ndarray
+        (4**memory,) probability of cooperating after each history of the
+        last memory rounds
+    initial : numpy.ndarray
+        (memory,) probability of cooperating on each of the first memory
+        turns
+    memory : int
+        number of past rounds the player looks at
+
+    Methods
+    -------
+    from_memory_one(player, name=None):
+        Returns the lookup-table player of an axelrod memory-one player
+    """
+
+    def __init__(self, table, initial, name=None):
+        """
+        Parameters
+        ----------
+        table : list
+            4**memory probabilities of cooperating, by history index
+        initial : list
+            memory probabilities of cooperating on the first turns (a single
+            value for memory one)
+        name : str
+            strategy name (default is None, "Lookup Player")
+        """
+        self.table = np.asarray(table, dtype=float).reshape(-1)
+        self.initial = np.asarray(initial, dtype=float).reshape(-1)
+        self.memory = len(self.initial)
+        if len(self.table) != 4**self.memory:
+            raise ValueError(f'a memory-{self.memory} table needs {4**self.memory} '
+                             f'entries, not {len(self.table)}')
+        self.name = name or 'Lookup Player'
+
+    def __repr__(self):
+        table = ''.join(f'{p:g},' for p in self.table)
+        initial = ''.join(f'{p:g},' for p in self.initial)
+        return f'{self.name}: ({table[:-1]}), ({initial[:-1]})'
+
+    @property
+    def deterministic(self):
+        """ True if every probability of the player is 0 or 1 """
+        return bool(np.isin(self.table, (0, 1)).all() and np.isin(self.initial, (0, 1)).all())
+
+    @classmethod
+    def from_memory_one(cls, player, name=None):
+        """ Returns the lookup-table player of an axelrod memory-one player """
+
+        vector, initial = memory_one_params(player)
+        return cls(vector, [initial], name or player.name)
+
+def random_population(count, memory=2, stochastic=False, seed=None, prefix='Lookup'):
+    '''
+    Returns generated lookup-table players by name
+
+        Parameters:
+            count (int): number of players
+            memory (int): memory of every player
+            stochastic (bool): draw probabilities uniformly from [0, 1]
+                instead of 0 or 1 (default is False, deterministic players)
+            seed (int): seed of the draws
+            prefix (str): names are prefix followed by a zero-padded number
+
+        Returns:
+            (dict): maps names to LookupPlayer objects, in order
+    '''
+
+    rng = np.random.default_rng(seed)
+    shape = (count, 4**memory + memory)
+    draws = rng.random(shape) if stochastic else rng.integers(2, size=shape).astype(float)
+    width = len(str(count))
+    return {f'{prefix} {num:0{width}d}': LookupPlayer(row[memory:], row[:memory],
+                                                      f'{prefix} {num:0{width}d}')
+            for num, row in enumerate(draws, 1)}
+
+def simulate_lookup(tables, initials, memories, turns=30, prob_end=0.1, reps=1, seed=1):
+    '''
+    Returns sampled outcomes of every pairing (i <= j) of the given players
+
+        Parameters:
+            tables (numpy.ndarray): (n, 4**memory) probabilities of
+                cooperating by history index (see lift_table)
+            initials (numpy.ndarray): (n, memory) opening probabilities
+                (entries past a player's own memory are ignored)
+            memories (numpy.ndarray): (n,) memory of each player
+            turns (int): maximum number of turns of a match
+            prob_end (float): probability that a match ends after any turn
+            reps (int): number of repetitions of every match
+            seed (int or numpy.random.Generator): seed of the random draws
+
+        Returns:
+            states (numpy.ndarray): (reps, n, n, 4) CC, CD, DC, DD counts from
+                the row player's point of view
+            match_lengths (numpy.ndarray): (reps, n, n) number of turns
+    '''
+
+    rng = np.random.default_rng(seed)
+    tables = np.asarray(tables, dtype=float)
+    initials = np.asarray(initials, dtype=float).reshape(len(tables), -1)
+    memories = np.asarray(memories)
+    size = tables.shape[1]
+
+    n = len(tables)
+    first, second = np.triu_indices(n)
+    lengths = sample_lengths(turns, prob_end, (reps, len(first)), rng)
+    longest = int(lengths.max()) if lengths.size else 0
+
+    # A deterministic match is the same in every repetition, so it is played
+    # once and each repetition reads the counts of its own length
+    deterministic = np.isin(tables, (0, 1)).all() and np.isin(initials, (0, 1)).all()
+    shape = (1 if deterministic else reps, len(first))
+    if deterministic:
+        cumulative = np.zeros((longest + 1, len(first), 4), dtype=np.int32)
+    else:
+        counts = np.zeros(shape + (4,), dtype=np.int64)
+    h1 = np.zeros(shape, dtype=np.int64)
+    h2 = np.zeros(shape, dtype=np.int64)
+    for turn in range(longest):
+        p1, p2 = tables[first, h1], tables[second, h2]
+        if turn < initials.shape[1]:
+            p1 = np.where(turn < memories[first], initials[first, turn], p1)
+            p2 = np.where(turn < memories[second], initials[second, turn], p2)
+        if deterministic:
+            own, other = p1 > 0.5, p2 > 0.5
+        else:
+            draws = rng.random(shape + (2,))
+            own, other = draws[..., 0] < p1, draws[..., 1] < p2
+        # Index of the state seen by the first player: CC=0, CD=1, DC=2, DD=3
+        state = 2 * ~own + ~other
+        seen = state[..., None] == np.arange(4)
+        if deterministic:
+            cumulative[turn + 1] = cumulative[turn] + seen[0]
+        else:
+            counts += seen & (turn < lengths)[..., None]
+        h1 = h1 * 4 % size + state
+        h2 = h2 * 4 % size + np.take(SWAP, state)
+    if deterministic:
+        counts = cumulative[lengths, np.arange(len(first))].astype(np.int64)
+
+    states = np.zeros((reps, n, n, 4), dtype=np.int64)
+    states[:, first, second] = counts
+    states[:, second, first] = counts[..., SWAP]
+    match_lengths = np.zeros((reps, n, n), dtype=np.int64)
+    match_lengths[:, first, second] = lengths
+    match_lengths[:, second, first] = lengths
+    return states, match_lengths
+
+class LookupMatrix(MatchMatrix):
+    """
+    A MatchMatrix whose repetitions are sampled by simulate_lookup.
+
+    The strategy_dict may mix LookupPlayer objects and axelrod memory-one
+    players (e.g. those of settings.CD_strategy_dict), which are converted
+    with LookupPlayer.from_memory_one. The draws differ from axelrod's, so
+    results are reproducible from seed but not identical to an axelrod
+    Tournament with the same seed; deterministic players play the same
+    matches as in axelrod.
+    """
+
+    def play(self):
+        """ Simulates every pairing for all repetitions at once """
+
+        players = [p if isinstance(p, LookupPlayer) else LookupPlayer.from_memory_one(p)
+                   for p in self.players]
+        memory = max(p.memory for p in players)
+        tables = np.array([lift_table(p.table, memory) for p in players]).reshape(-1, 4**memory)
+        initials = np.zeros((len(players), memory))
+        for num, p in enumerate(players):
+            initials[num, :p.memory] = p.initial
+        memories = np.array([p.memory for p in players])
+        self.states, self.match_lengths = simulate_lookup(
+            tables, initials, memories, self.turns, self.prob_end, self.reps, self.seed)
+        self.per_turn_states = self.states / self.match_lengths[..., None]
@@ -0,0 +1,154 @@
+'''
+Markov: Exact Expectations for Memory-One Matches
+=================================================
+
+A match between two memory-one players is a Markov chain on the four game
+states (CC, CD, DC, DD). Together with the geometric stopping rule used by the
+tournaments (prob_end, capped at turns) the expected scores, state counts and
+match lengths can be computed exactly, with no sampling.
+
+Classes:
+
+    MarkovMatrix
+        MatchMatrix whose arrays hold the exact expectation of every pairwise
+        match instead of sampled repetitions.
+
+Functions:
+
+    memory_one_params(object) -> (numpy.ndarray, float)
+        Returns a player's four response probabilities and its probability of
+        cooperating on the first turn
+    expected_outcomes(numpy.ndarray, numpy.ndarray, int, float) -> tuple
+        Returns the expected state counts, state counts per turn and match
+        lengths of every pairing of the given players
+
+'''
+from axelrod import Action, MemoryOnePlayer
+import numpy as np
+from match_matrix import MatchMatrix, STATES
+
+C, D = Action.C, Action.D
+SWAP = [0, 2, 1, 3]  # Maps a state to the same state seen by the co-player
+TAIL_MASS = 1e-15  # Survival probability at which unbounded matches are cut
+
+
+def memory_one_params(player):
+    '''
+    Returns a player's four response probabilities and its probability of
+    cooperating on the first turn
+
+        Parameters:
+            player (object): axelrod.MemoryOnePlayer (e.g. any player of
+                settings.CD_strategy_dict)
+
+        Returns:
+            vector (numpy.ndarray): P(C|CC), P(C|CD), P(C|DC), P(C|DD)
+            initial (float): 1.0 if the first move is C, else 0.0
+    '''
+
+    if not isinstance(player, MemoryOnePlayer):
+        raise ValueError(f'{player} is not a memory-one player')
+    vector = np.array([player._four_vector[state] for state in STATES])
+    return vector, float(player._initial == C)
+
+def expected_outcomes(vectors, initials, turns=30, prob_end=0.1):
+    '''
+    Returns the expected outcome of every pairing of the given players
+
+    All pairs are advanced together one turn at a time. The state distribution
+    at turn k is weighted by the probability that the match lasts at least k
+    turns, and the running totals are weighted by the probability that it
+    lasts exactly k turns to get the expected counts per turn (and hence the
+    expected score per turn under any game).
+
+        Parameters:
+            vectors (numpy.ndarray): (n, 4) response probabilities
+            initials (numpy.ndarray): (n,) probability of cooperating first
+            turns (int): maximum number of turns of a match (None for no cap)
+            prob_end (float): probability that a match ends after any turn
+
+        Returns:
+            states (numpy.ndarray): (n, n, 4) expected CC, CD, DC, DD counts
+            per_turn_states (numpy.ndarray): (n, n, 4) expected counts divided
+                by the match length
+            match_lengths (numpy.ndarray): (n, n) expected number of turns
+    '''
+
+    if turns is None:
+        turns = np.inf
+    prob_end = prob_end or 0
+    if prob_end == 0 and turns == np.inf:
+        raise ValueError('a match needs either turns or prob_end')
+
+    # Probability that the row (own) and column (co-player) players cooperate
+    # from each state, as seen by the row player
+    own = np.broadcast_to(vectors[:, None, :], (len(vectors),) * 2 + (4,))
+    other = np.broadcast_to(vectors[None, :, SWAP], own.shape)
+    step = np.stack([own * other, own * (1 - other),
+                     (1 - own) * other, (1 - own) * (1 - other)], axis=-1)
+
+    first, second = np.meshgrid(initials, initials, indexing='ij')
+    dist = np.stack([first * second, first * (1 - second),
+                     (1 - first) * second, (1 - first) * (1 - second)], axis=-1)
+
+    states = np.zeros(dist.shape)
+    running = np.zeros(dist.shape)
+    per_turn_states = np.zeros(dist.shape)
+    lengths = 0.0
+    survive = 1.0  # Probability that the match reaches turn k
+    k = 1
+    while True:
+        states += survive * dist
+        running += dist
+        lengths += survive
+        last = k >= turns or (prob_end > 0 and survive < TAIL_MASS)
+        end_here = survive if last else survive * prob_end
+        per_turn_states += end_here * running / k
+        if last:
+            break
+        dist = np.einsum('...i,...ij->...j', dist, step)
+        survive *= 1 - prob_end
+        k += 1
+
+    match_lengths = np.full(states.shape[:-1], lengths)
+    return states, per_turn_states, match_lengths
+
+class MarkovMatrix(MatchMatrix):
+    """
+    A MatchMatrix holding the exact expectation of every pairwise match.
+
+    The arrays keep a single leading "repetition" whose entries are expected
+    values, so that tournament_metrics reports the limit of infinitely many
+    repetitions. Match lengths vary only through prob_end, which makes the
+    expectation of any ratio of counts to turns exact as well.
+    """
+
+    def __init__(self, strategy_dict, game=None, turns=30, prob_end=0.1):
+        """
+        Constructs the matrix and computes every pairwise expectation
+
+        Parameters
+        ----------
+        strategy_dict : dict
+            maps strategy names to axelrod.MemoryOnePlayer objects
+        game : axelrod.game (object)
+            container for game matrix and scoring logic (default is None, which
+            will prompt the classic PD setting)
+        turns : int
+            maximum number of turns of a match (default is 30)
+        prob_end : float
+            probability that a match ends after any given turn (default is 0.1)
+        """
+        super().__init__(strategy_dict, game, turns, prob_end, reps=1, seed=None)
+
+    def play(self):
+        """ Fills the arrays with the exact pairwise expectations """
+
+        params = [memory_one_params(p) for p in self.players]
+        vectors = np.array([v for v, _ in params]).reshape(-1, 4)
+        initials = np.array([i for _, i in params])
+        states, per_turn_states, match_lengths = expected_outcomes(
+            vectors, initials, self.turns, self.prob_end)
+        self.states = states[None]
+        self.per_turn_states = per_turn_states[None]
+        self.match_lengths = match_lengths[None]
@@ -0,0 +1,320 @@
+'''
+Match_matrix: Pairwise Match Precomputation
+===========================================
+
+Play every pairing of a strategy population once per game setting and keep the
+outcomes in NumPy arrays, so that the tournament metrics of any team drawn from
+that population can be computed by indexing submatrices instead of replaying
+the team's round robin.
+
+The moves of the strategies do not depend on the payoffs, so the state counts
+are played once and can be scored under any number of games.
+
+Classes:
+
+    MatchMatrix
+        Pairwise scores, state counts and match lengths for a population of
+        strategies under a single game/match-length setting.
+
+Functions:
+
+    payoff_vector(object) -> numpy.ndarray
+        Returns the row player's payoff for the CC, CD, DC and DD states
+    cc_metrics(numpy.ndarray, float, list) -> list
+        Returns the CC distributions and all CC-threshold fractions of a
+        round robin from its state counts
+
+'''
+from axelrod import Action, Match, game as axl_game
+import axelrod.interaction_utils as iu
+import copy
+import numpy as np
+
+C, D = Action.C, Action.D
+STATES = [(C, C), (C, D), (D, C), (D, D)]  # Order of the last axis of states
+
+
+def payoff_vector(game=None):
+    '''
+    Returns the row player's payoff for the CC, CD, DC and DD states
+
+        Parameters:
+            game (object): axelrod.game (default is None, which will prompt
+                the classic PD setting)
+
+        Returns:
+            (numpy.ndarray): R, S, T, P
+    '''
+
+    if game is None:
+        game = axl_game.Game()
+    R, P, S, T = game.RPST()
+    return np.array([R, S, T, P], dtype=float)
+
+def cc_metrics(states, sum_T, thresholds, weights=None):
+    '''
+    Returns the CC distributions and all CC-threshold fractions of a round
+    robin from its state counts, in one pass over the pairs
+
+        Parameters:
+            states (numpy.ndarray): (players, players, 4) CC, CD, DC, DD
+                counts summed over repetitions (the diagonal is ignored)
+            sum_T (float): number of turns that Avg_Norm_CC_Distribution_2
+                is normalised by
+            thresholds (list): CC-fraction thresholds
+            weights (numpy.ndarray): (players, players) number of pairings
+                each entry stands for, when the rows are distinct strategies
+                of a roster with repeats (default is None, every off-diagonal
+                pairing once); entries with weight 0 are ignored
+
+        Returns:
+            (list): Avg_Norm_CC_Distribution, Avg_Norm_CC_Distribution_2 and
+                one CC-threshold fraction per threshold, i.e. the fraction of
+                pairings with some mutual cooperation whose CC fraction is at
+                least the threshold
+    '''
+
+    if weights is None:
+        off_diag = ~np.eye(len(states), dtype=bool)
+        cc_counts = states[..., 0][off_diag]
+        cc_fraction = cc_counts / states.sum(axis=-1)[off_diag]
+        # Cumulative histogram of the CC fractions: the number of pairings at
+        # or above a threshold is read off the sorted fractions, so any number
+        # of thresholds costs one sort
+        ranked = np.sort(cc_fraction[cc_counts > 0])
+        above = len(ranked) - np.searchsorted(ranked, np.asarray(thresholds, dtype=float))
+        return [np.average(cc_fraction), cc_counts.sum() / sum_T] + list(above / cc_fraction.size)
+
+    pairs = weights > 0
+    weight = weights[pairs]
+    cc_counts = states[..., 0][pairs]
+    cc_fraction = cc_counts / states.sum(axis=-1)[pairs]
+    # The same cumulative histogram, counting each entry weight times
+    order = np.argsort(cc_fraction[cc_counts > 0])
+    ranked = cc_fraction[cc_counts > 0][order]
+    tail = np.append(np.cumsum(weight[cc_counts > 0][order][::-1])[::-1], 0)
+    above = tail[np.searchsorted(ranked, np.asarray(thresholds, dtype=float))]
+    return [(weight * cc_fraction).sum() / weight.sum(), (weight * cc_counts).sum() / sum_T
+            ] + list(above / weight.sum())
+
+class MatchMatrix:
+    """
+    A class to represent the outcome of every pairwise match of a population.
+
+    ...
+
+    Attributes
+    ----------
+    names : list
+        strategy names, in the order used to index the arrays
+    players : list
+        strategy (player) objects, in the same order as names
+    game : axelrod.game (object)
+        container for game matrix and scoring logic
+    turns : int
+        maximum number of turns of a match
+    prob_end : float
+        probability that a match ends after any given turn
+    reps : int
+        number of times each match is repeated
+    scores : numpy.ndarray
+        (reps, n, n) total score of the row player against the column player
+    per_turn_scores : numpy.ndarray
+        (reps, n, n) score per turn of the row player against the column player
+    states : numpy.ndarray
+        (reps, n, n, 4) count of the CC, CD, DC and DD states from the row
+        player's point of view
+    per_turn_states : numpy.ndarray
+        (reps, n, n, 4) states divided by the match length
+    match_lengths : numpy.ndarray
+        (reps, n, n) number of turns of each match
+
+    Methods
+    -------
+    score():
+        Computes scores and per_turn_scores from the state counts and game
+    for_games(games):
+        Returns one copy of the matrix per game, sharing the state counts
+    indices(player_list):
+        Returns the array positions of the given players
+    rebind(strategy_dict):
+        Points the matrix at equivalent player objects of another process
+    tournament_metrics(player_list, thresholds):
+        Computes PdTournament metrics for a round robin among player_list
+    """
+
+    def __init__(self, strategy_dict, game=None, turns=30, prob_end=0.1,
+                 reps=1, seed=1):
+        """
+        Constructs the matrix and plays every pairwise match
+
+        Parameters
+        ----------
+        strategy_dict : dict
+            maps strategy names to player objects (e.g.
+            settings.CD_strategy_dict)
+        game : axelrod.game (object)
+            container for game matrix and scoring logic (default is None, which
+            will prompt the classic PD setting)
+        turns : int
+            maximum number of turns of a match (default is 30)
+        prob_end : float
+            probability that a match ends after any given turn (default is 0.1)
+        reps : int
+            number of times to repeat each match (default is 1)
+        seed : int
+            seed used to derive one seed per pairing (default is 1)
+        """
+        self.names = list(strategy_dict)
+        self.players = list(strategy_dict.values())
+        self.game = game
+        self.turns = turns
+        self.prob_end = prob_end
+        self.reps = reps
+        self.seed = seed
+        self._position = {id(p): i for i, p in enumerate(self.players)}
+
+        n = len(self.players)
+        self.states = np.zeros((reps, n, n, 4), dtype=np.int64)
+        self.match_lengths = np.zeros((reps, n, n), dtype=np.int64)
+        self.play()
+        self.score()
+
+    def __repr__(self):
+        return ','.join(self.names)
+
+    def play(self):
+        """
+        Plays each pairing (including every strategy against a copy of itself)
+        once per repetition and fills both ordered entries of the arrays.
+        """
+        n = len(self.players)
+        seeds = np.random.default_rng(self.seed).integers(2**31, size=(n, n))
+        for i in range(n):
+            for j in range(i, n):
+                match = Match((self.players[i].clone(), self.players[j].clone()),
+                              turns=self.turns,
+                              game=self.game,
+                              prob_end=self.prob_end,
+                              seed=int(seeds[i, j]))
+                for rep in range(self.reps):
+                    interactions = match.play()
+                    dist = iu.compute_state_distribution(interactions)
+                    counts = [dist[state] for state in STATES]
+                    self.states[rep, i, j] = counts
+                    self.states[rep, j, i] = counts[0], counts[2], counts[1], counts[3]
+                    self.match_lengths[rep, i, j] = len(interactions)
+                    self.match_lengths[rep, j, i] = len(interactions)
+        self.per_turn_states = self.states / self.match_lengths[..., None]
+
+    def score(self):
+        """ Computes scores and per_turn_scores under the matrix game """
+
+        payoff = payoff_vector(self.game)
+        self.scores = self.states @ payoff
+        self.per_turn_scores = self.per_turn_states @ payoff
+
+    def for_games(self, games):
+        """
+        Returns one copy of the matrix per game, scored in a single pass.
+
+        The copies share the state counts and match lengths, so the matches
+        are played once however many games are scored. This relies on the
+        strategies' moves not depending on the payoffs, which holds for the
+        memory-one players in settings.
+
+        Parameters
+        ----------
+        games : list
+            axelrod.game objects (None for the classic PD setting)
+
+        Returns
+        -------
+        matrices : list
+            one MatchMatrix per game, in the order of games
+        """
+        payoffs = np.array([payoff_vector(g) for g in games])
+        scores = np.einsum('...s,gs->g...', self.states, payoffs)
+        per_turn_scores = np.einsum('...s,gs->g...', self.per_turn_states, payoffs)
+        matrices = []
+        for num, g in enumerate(games):
+            matrix = copy.copy(self)
+            matrix.game = g
+            matrix.scores = scores[num]
+            matrix.per_turn_scores = per_turn_scores[num]
+            matrices.append(matrix)
+        return matrices
+
+    def indices(self, player_list):
+        """ Returns the array positions of the given player objects """
+
+        return np.array([self._position[id(p)] for p in player_list])
+
+    def rebind(self, strategy_dict):
+        """
+        Points the matrix at the player objects of strategy_dict, which must
+        hold the same names (e.g. settings.CD_strategy_dict after the matrix
+        was pickled into a worker process, where players have new ids)
+        """
+        
+        if list(strategy_dict) != self.names:
+            raise ValueError('strategy_dict does not match the matrix names')
+        self.players = list(strategy_dict.values())
+        self._position = {id(p): i for i, p in enumerate(self.players)}
+
+    def tournament_metrics(self, player_list, thresholds):
+        """
+        Computes the metrics of a round robin tournament among player_list by
+        indexing the pairwise arrays.
+
+        Duplicated players occupy separate positions and play each other;
+        only the (position, same position) self-interactions are dropped, as
+        they are in an axelrod ResultSet. Since every copy of a strategy
+        plays the same matches, the arrays are indexed once per distinct
+        strategy and each pairing is weighted by the number of position
+        pairs it stands for, so a roster of 7 Cooperators and 7 Defectors
+        costs a 2x2 grid rather than a 14x14 one.
+
+        Parameters
+        ----------
+        player_list : list
+            player objects taken from the strategy_dict the matrix was built
+            from (duplicates allowed)
+        thresholds : list
+            CC-fraction thresholds
+
+        Returns
+        -------
+        normal_scores : numpy.ndarray
+            (players, reps) per-turn score of each player averaged over its
+            opponents (same layout as ResultSet.normalised_scores)
+        metrics : list
+            Avg_Norm_Score, Avg_Norm_Score_2, Min_Norm_Score,
+            Avg_Norm_CC_Distribution, Avg_Norm_CC_Distribution_2 followed by
+            one CC-threshold fraction per threshold
+        """
+        # Distinct positions in order of appearance, and each player's one
+        distinct = dict()
+        inverse = [distinct.setdefault(i, len(distinct)) for i in self.indices(player_list)]
+        idx, counts = list(distinct), np.bincount(inverse)
+        num_of_players = len(inverse)
+        grid = np.ix_(range(self.reps), idx, idx)
+        # Opponents of one copy of each row strategy that play the column
+        # strategy, and the ordered position pairs behind each entry
+        opponents = counts - np.eye(len(idx))
+        pairs = counts[:, None] * opponents
+
+        scores = self.scores[grid]
+        lengths = self.match_lengths[grid]
+        states = self.states[grid].sum(axis=0)
+
+        per_turn = (self.per_turn_scores[grid] * opponents).sum(axis=2)
+        normal_scores = (per_turn / (num_of_players - 1)).T[inverse]
+        player_scores = (scores * opponents).sum(axis=2)[:, inverse]
+        sum_T = (lengths[-1] * pairs).sum()
+
+        metrics = [np.average(normal_scores),
+                   np.average(player_scores) * num_of_players / (sum_T / 2),
+                   np.amin(normal_scores)]
+        weights = pairs if len(idx) < num_of_players else None
+        return normal_scores, metrics + cc_metrics(states, sum_T, thresholds, weights)
@@ -0,0 +1,317 @@
+'''
+Optimize: Searching for the Best Partitions
+===========================================
+
+Find the partitions of a set of strategies into equal teams that maximize a
+system metric of PdSystem (e.g. 'SYS MIN Score' or 'SYS CC Dist MIN')
+without evaluating every partition. Every SYS metric is the minimum or the
+average over teams of a team metric, and a team's metric only depends on
+its own members, so the value of a partial partition bounds the value of
+every partition that completes it.
+
+Team metrics are read from a precomputed MatchMatrix, as in PdExp with
+precompute=True (or analytic=True), and teams are stored as bitmasks over
+the strategy names.
+
+Classes:
+
+    PartitionSearch
+        Exact branch-and-bound and simulated-annealing searches for the
+        top-k partitions under a system metric
+
+Functions:
+
+    objective_spec(str, list) -> (int, str)
+        Returns the team metric and the aggregation behind a SYS column
+
+'''
+import heapq
+from itertools import combinations
+import numpy as np
+import pandas as pd
+import settings
+from pd_exp import fraction_labels, system_metrics, system_id, population_matrix
+
+
+def objective_spec(name, t):
+    '''
+    Returns the team metric and the aggregation behind a SYS column
+
+        Parameters:
+            name (str): SYS column of PdSystem.data (e.g. 'SYS MIN Score')
+            t (list): CC-fraction thresholds of the experiment
+
+        Returns:
+            index (int): position of the team metric in
+                MatchMatrix.tournament_metrics (0 Avg_Norm_Score, 2
+                Min_Norm_Score, 3 and 4 the CC distributions, 5... the
+                threshold fractions)
+            how (str): 'min' or 'mean' over the teams of a system
+    '''
+
+    specs = {'SYS MIN Score': (2, 'min'), 'SYS AVG Score': (0, 'mean'),
+             'MIN of Team Avgs': (0, 'min'), 'AVG of Team Mins': (2, 'mean')}
+    names = ['SYS CC Dist', 'SYS New CC Dist'] + [
+        f'SYS CC Fraction {label}' for label in fraction_labels(t)]
+    for index, prefix in enumerate(names, 3):
+        specs[f'{prefix} AVG'] = (index, 'mean')
+        specs[f'{prefix} MIN'] = (index, 'min')
+    if name not in specs:
+        raise ValueError(f'unknown system metric {name!r}')
+    return specs[name]
+
+class PartitionSearch:
+    """
+    A class to represent a search for the best partitions of strategies into
+    teams.
+
+    ...
+
+    Attributes
+    ----------
+    names : list
+        strategy names (keys of strategy_dict) to partition
+    strategy_dict : dict
+        players by name
+    team_size : int
+        number of players of every team
+    objective : str
+        SYS column to maximize
+    matrix : match_matrix.MatchMatrix (object)
+        pairwise matches of strategy_dict the team metrics are read from
+    evaluated : int
+        number of distinct teams whose metrics were computed
+    data : pandas.dataframe (object)
+        the top partitions of the last search, best first, with System ID,
+        the teams and every SYS column
+
+    Methods
+    -------
+    team_metrics(mask):
+        Returns the metrics of the team with the given bitmask
+    branch_and_bound(top_k=1):
+        Exact search for the top_k partitions
+    anneal(top_k=1, steps=20000, start_temp=None, end_temp=None, seed=1):
+        Simulated-annealing search for good partitions of large sets
+    """
+
+    def __init__(self, names, team_size, objective='SYS MIN Score', t = [0.5],
+                 game_type=None, matrix=None, analytic=False, strategy_dict=None):
+        """
+        Parameters
+        ----------
+        names : list
+            strategy names (keys of strategy_dict) to partition; their
+            number must be a multiple of team_size
+        team_size : int
+            number of players of every team
+        objective : str
+            SYS column of PdSystem.data to maximize (default is
+            'SYS MIN Score')
+        t : list
+            CC-fraction thresholds (default is [0.5])
+        game_type : axelrod.game (object)
+            game of the tournaments (default is None, the classic PD)
+        matrix : match_matrix.MatchMatrix (object)
+            precomputed matches of strategy_dict (default is None, which
+            plays them, or computes their expectations if analytic)
+        analytic : bool
+            use exact expectations instead of playing (default is False)
+        strategy_dict : dict
+            players by name, e.g. of a registry.Registry or of
+            lookup.random_population; the System ID codes are positions in
+            it (default is None, settings.CD_strategy_dict)
+        """
+        if len(names) % team_size:
+            raise ValueError(f'{len(names)} strategies cannot be split into teams of {team_size}')
+        self.names = list(names)
+        self.strategy_dict = strategy_dict or settings.CD_strategy_dict
+        self.team_size = team_size
+        self.objective = objective
+        self.CCThreshold = t
+        self._index, self._how = objective_spec(objective, t)
+        if matrix is None:
+            matrix = population_matrix(self.strategy_dict, game_type, analytic)
+        self.matrix = matrix
+        self.evaluated = 0
+        self.data = None
+        self._metrics = dict()
+
+    def team_metrics(self, mask):
+        """ Returns the metrics of the team with the given bitmask """
+
+        if mask not in self._metrics:
+            players = [self.strategy_dict[self.names[i]] for i in self._members(mask)]
+            _, metrics = self.matrix.tournament_metrics(players, self.CCThreshold)
+            self._metrics[mask] = np.array(metrics, dtype=float)
+            self.evaluated += 1
+        return self._metrics[mask]
+
+    def _members(self, mask):
+        """ Returns the positions in names of the members of a team bitmask """
+
+        return [i for i in range(len(self.names)) if mask >> i & 1]
+
+    def _value(self, masks):
+        """ Returns the objective of a (complete) list of team bitmasks """
+
+        values = [self.team_metrics(m)[self._index] for m in masks]
+        return min(values) if self._how == 'min' else float(np.mean(values))
+
+    def branch_and_bound(self, top_k=1):
+        """
+        Exact search for the top_k partitions.
+
+        Teams are chosen in the canonical order of helper_funcs.Partitions
+        (each new team holds the first unused strategy), best team first.
+        A branch is cut when even the best remaining team of every unused
+        strategy cannot lift it above the current k-th best partition. The
+        metrics of every possible team are computed once up front.
+
+        Parameters
+        ----------
+        top_k : int
+            number of partitions to return (default is 1)
+
+        Returns
+        -------
+        data : pandas.dataframe (object)
+            the top_k partitions, best first (also stored in data)
+        """
+        n, k = len(self.names), self.team_size
+        num_teams = n // k
+        # Teams by their first member, best first
+        by_first = [[] for _ in range(n)]
+        for combo in combinations(range(n), k):
+            mask = sum(1 << i for i in combo)
+            by_first[combo[0]].append((self.team_metrics(mask)[self._index], mask))
+        containing = [[] for _ in range(n)]
+        for teams in by_first:
+            teams.sort(reverse=True)
+            for value, mask in teams:
+                for i in self._members(mask):
+                    containing[i].append((value, mask))
+        for teams in containing:
+            teams.sort(reverse=True)
+
+        def best_within(i, free):
+            # Value of the best team of strategy i among the unused ones
+            for value, mask in containing[i]:
+                if mask & free == mask:
+                    return value
+            return -np.inf
+
+        def bound(score, free):
+            unused = [i for i in range(n) if free >> i & 1]
+            if self._how == 'min':
+                return min([score] + [best_within(i, free) for i in unused])
+            return score + sum(best_within(i, free) for i in unused) / k
+
+        top = []  # Heap of (value, partition) with the k-th best on top
+        def search(free, chosen, score):
+            if not free:
+                value = score if self._how == 'min' else score / num_teams
+                entry = (value, tuple(chosen))
+                if len(top) < top_k:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+                return
+            first = (free & -free).bit_length() - 1
+            for value, mask in by_first[first]:
+                if mask & free != mask:
+                    continue
+                new_score = min(score, value) if self._how == 'min' else score + value
+                new_free = free & ~mask
+                if len(top) == top_k:
+                    limit = bound(new_score, new_free)
+                    if self._how == 'mean':
+                        limit /= num_teams
+                    if limit <= top[0][0]:
+                        # Later teams of this strategy are no better
+                        if self._how == 'min' and value <= top[0][0]:
+                            break
+                        continue
+                chosen.append(mask)
+                search(new_free, chosen, new_score)
+                chosen.pop()
+
+        search((1 << n) - 1, [], np.inf if self._how == 'min' else 0.0)
+        return self._build_data(sorted(top, reverse=True))
+
+    def anneal(self, top_k=1, steps=20000, start_temp=None, end_temp=None, seed=1):
+        """
+        Simulated-annealing search for good partitions of large sets.
+
+        A move swaps two strategies of different teams; worse partitions are
+        accepted with probability exp(change / temperature) while the
+        temperature falls geometrically from start_temp to end_temp. Team
+        metrics are only computed for the teams visited. The result is not
+        guaranteed to be optimal.
+
+        Parameters
+        ----------
+        top_k : int
+            number of distinct partitions to return (default is 1)
+        steps : int
+            number of proposed moves (default is 20000)
+        start_temp, end_temp : float
+            initial and final temperatures (default is None, which uses the
+            spread of the first 100 team values and 1/1000 of it)
+        seed : int
+            seed of the random moves (default is 1)
+
+        Returns
+        -------
+        data : pandas.dataframe (object)
+            the best top_k partitions found, best first (also stored in
+            data)
+        """
+        rng = np.random.default_rng(seed)
+        n, k = len(self.names), self.team_size
+        order = rng.permutation(n)
+        teams = [sum(1 << int(i) for i in order[j:j+k]) for j in range(0, n, k)]
+        value = self._value(teams)
+
+        if start_temp is None:
+            sample = [self.team_metrics(sum(1 << int(i) for i in rng.choice(n, k, replace=False)))
+                      [self._index] for _ in range(100)]
+            start_temp = float(np.std(sample)) or 1.0
+        if end_temp is None:
+            end_temp = start_temp / 1000
+        cooling = (end_temp / start_temp) ** (1 / max(steps - 1, 1))
+
+        best = {tuple(sorted(teams)): value}
+        temp = start_temp
+        for _ in range(steps):
+            a, b = rng.choice(len(teams), 2, replace=False)
+            i = rng.choice(self._members(teams[a]))
+            j = rng.choice(self._members(teams[b]))
+            new_teams = list(teams)
+            new_teams[a] = teams[a] & ~(1 << i) | (1 << j)
+            new_teams[b] = teams[b] & ~(1 << j) | (1 << i)
+            new_value = self._value(new_teams)
+            if new_value >= value or rng.random() < np.exp((new_value - value) / temp):
+                teams, value = new_teams, new_value
+                key = tuple(sorted(teams))
+                if key not in best and (len(best) < top_k or value > min(best.values())):
+                    best[key] = value
+                    if len(best) > top_k:
+                        del best[min(best, key=best.get)]
+            temp *= cooling
+        ranked = sorted(((v, p) for p, v in best.items()), reverse=True)
+        return self._build_data(ranked)
+
+    def _build_data(self, ranked):
+        """ Builds the data attribute from (value, team bitmasks) pairs """
+
+        systems = [[[self.names[i] for i in self._members(m)] for m in sorted(
+                    masks, key=lambda m: (m & -m))] for _, masks in ranked]
+        metrics = np.array([[self._metrics[m] for m in sorted(masks, key=lambda m: (m & -m))]
+                            for _, masks in ranked])
+        data = {'System ID' : [system_id(sys, list(self.strategy_dict)) for sys in systems],
+                'Teams' : ['_'.join(','.join(team) for team in sys) for sys in systems]}
+        if len(ranked):
+            data.update(system_metrics(metrics, self.CCThreshold))
+        self.data = pd.DataFrame(data, index=range(1, len(ranked) + 1))
+        return self.data
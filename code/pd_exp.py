@@ -21,18 +21,52 @@ Functions:
     avg_normalised_state(object, tuple) -> float
         Returns the tournament average for given state distribution (e.g.
         (C,C), (D,D), (C,D), (D,C))
+    rpst_label(axelrod.game) -> str
+        Returns the payoffs of a game as they appear in file names
+    fraction_labels(list) -> list
+        Returns the labels of the SYS CC Fraction columns of thresholds
+    system_metrics(numpy.ndarray, list) -> dict
+        Computes the SYS columns of many systems at once
+    state_array(object) -> numpy.ndarray
+        Returns the state counts of a tournament as a dense array
+    multi_game_tournaments(list, list) -> list of PdTournament
+        Plays a tournament once and scores it under each of the given games
+    multi_game_experiments(tuple, list) -> list of PdExp
+        Builds one experiment per game that share a single set of matches
+    roster_tournaments(list, int) -> pandas.dataframe
+        Tournament rows of every multiset roster of the given strategies
+    compact_frame(pandas.dataframe, bool) -> pandas.dataframe
+        Replaces the text columns of system rows by team masks
+    expand_frame(pandas.dataframe, dict) -> pandas.dataframe
+        Rebuilds the System ID, team and player columns of compact rows
+    population_matrix(dict, object, bool) -> match_matrix.MatchMatrix
+        Plays (or evaluates) every pairing of a strategy population once
 
 '''
-from axelrod import Action, game, Tournament, plot
-import copy
+from axelrod import Action, game, Tournament
 from itertools import zip_longest
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 from pathlib import Path
 import settings
-import subprocess
-from time import sleep
+from match_matrix import MatchMatrix, STATES, cc_metrics
+from markov import MarkovMatrix
+from cycles import CycleMatrix
+from cache import TournamentCache, tournament_key
+from profiler import DISABLED, Profiler
+from lookup import LookupPlayer, LookupMatrix
+from helper_funcs import rosters
+from encoding import (team_mask, team_members, team_codes, system_codes, masks_exact,
+                      system_masks, system_ids, parse_system_id)
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import re
 
+# Match settings of the axelrod tournaments
+TURNS = 30
+PROB_END = 0.1
+SEED = 1
 
 # Helper Functions
 def grouper(iterable, n, fillvalue=None):
@@ -89,83 +123,241 @@ def avg_normalised_state(results_obj, state_tupl):
         grd_ttl += Ttl
     return grd_ttl/num_of_players  # Averaged across all players
 
-def new_avg_normalised_state(results_obj, state_tupl):
+def state_array(results_obj):
     '''
-    Returns the tournament average for given state distribution (e.g.
-        (C,C), (D,D), (C,D), (D,C))
+    Returns the state counts of a tournament as a dense array, reading the 
+    Counters of results_obj.state_distribution once
     
         Parameters:
             results_obj (object): output generated from Axelrod 
                 tournament.play()
-            state_tupl (tuple): player-opponent action pair that is the game 
-                state of interest (e.g. (Action.C, Action.C) for mutual 
-                cooperation)
-                
+        
         Returns:
-            (float): average distribution of state_tupl for the tournament 
-                that results_obj describes.
+            (numpy.ndarray): (players, players, 4) CC, CD, DC, DD counts of 
+                each player against each opponent, summed over repetitions
     '''
     
-    norm_state_dist = results_obj.normalised_state_distribution
-    num_of_players = len(norm_state_dist)
-    totl = 0
-    grd_ttl = 0
-    for x in norm_state_dist:
-        for bunch in grouper(x,num_of_players):
-            for pl in range(num_of_players):
-                i = bunch[pl]
-                totl += i[state_tupl]  # Each player's CC distribution (one for
-                                       # each opponent) is summed together
-            
-            # Ttl=totl/(num_of_players-1)  # Normalized across opponents by 
-        grd_ttl += totl
-    return grd_ttl/num_of_players  # Averaged across all players
+    # A Counter gives 0 for a missing state (and the empty self-interaction)
+    return np.array([[[state_counter[s] for s in STATES] for state_counter in player]
+                     for player in results_obj.state_distribution], dtype=float)
+
+def team_columns(key, columns):
+    '''
+    Returns the column names of a team's tournament row inside a system row
+    
+        Parameters:
+            key (str): team label (e.g. 'Team1')
+            columns (list): columns of PdTournament.data
+        
+        Returns:
+            (list): e.g. 'Tournament_Members' -> 'Team1' and 
+                'Avg_CC_Threshold_0.5' -> 'Team1 Avg CC Fraction 0.5'
+    '''
+    
+    names = {'Tournament_Members': key,
+             'Avg_Norm_Score': f'{key} Avg Score',
+             'Avg_Norm_Score_2': f'{key} New Avg Score',
+             'Min_Norm_Score': f'{key} Min Score',
+             'Avg_Norm_CC_Distribution': f'{key} Avg CC Dist',
+             'Avg_Norm_CC_Distribution_2': f'{key} New Avg CC Dist'}
+    return [names.get(c, c.replace('Avg_CC_Threshold_', f'{key} Avg CC Fraction '))
+            for c in columns]
+
+def team_metrics(data):
+    '''
+    Returns the metric values of PdTournament.data as an array, ordered as 
+    in PdTournament._data_row (Avg_Norm_Score ... one value per threshold)
+    '''
+    
+    start = list(data.columns).index('Avg_Norm_Score')
+    return data.values[0, start:].astype(float)
+
+def rpst_label(game_type=None):
+    '''
+    Returns the payoffs of a game as they appear in file names, e.g. "3_1_0_5"
+    (plain numbers, whatever the numeric type of the payoffs)
+    '''
+    
+    R, P, S, T = (game_type or game.Game()).RPST()
+    return '_'.join(f'{float(x):g}' for x in (R, P, S, T))
+
+# Thresholds of the original experiments, whose SYS columns are numbered
+LEGACY_THRESHOLDS = [num / 10 for num in range(1, 11)]
+
+def fraction_labels(t):
+    '''
+    Returns the labels of the SYS CC Fraction columns of thresholds
+    
+        Parameters:
+            t (list): CC-fraction thresholds
+        
+        Returns:
+            (list): the threshold values (e.g. '0.25', '1'), or '01' ... '10'
+                for LEGACY_THRESHOLDS as in the original data files
+    '''
+    
+    if np.shape(t) == (len(LEGACY_THRESHOLDS),) and np.allclose(t, LEGACY_THRESHOLDS):
+        return [f'{num:02d}' for num in range(1, len(t) + 1)]
+    return [f'{th:g}' for th in t]
+
+def system_metrics(metrics, t):
+    '''
+    Computes the SYS columns of many systems at once
+    
+        Parameters:
+            metrics (numpy.ndarray): (systems, teams, metrics) team metrics 
+                as returned by team_metrics
+            t (list): CC-fraction thresholds of the metrics
+        
+        Returns:
+            (dict): maps every SYS column of PdSystem.data to a (systems,) 
+                array
+    '''
+    
+    avg_scores, min_scores = metrics[..., 0], metrics[..., 2]
+    data = {'SYS MIN Score' : min_scores.min(axis=1),
+            'SYS AVG Score' : avg_scores.mean(axis=1),
+            'MIN of Team Avgs' : avg_scores.min(axis=1),
+            'AVG of Team Mins' : min_scores.mean(axis=1)}
+    names = ['SYS CC Dist', 'SYS New CC Dist'] + [
+        f'SYS CC Fraction {label}' for label in fraction_labels(t)]
+    for name, values in zip(names, np.moveaxis(metrics[..., 3:], -1, 0)):
+        data[f'{name} AVG'] = values.mean(axis=1)
+        data[f'{name} MIN'] = values.min(axis=1)
+    return data
+
+def system_id(team_list, names=None):
+    '''
+    Returns the System ID of a team list: the decimal codes of each team's 
+    players, in the order of its list, joined by ',' and the teams joined by
+    '_' (names lists the strategies by decimal code - 1, default is None, 
+    settings.player_names)
+    '''
+    
+    return '_'.join(','.join(map(str, team_codes(team, names))) for team in team_list)
+
+def _system_teams(systems, names=None):
+    ''' Returns the decimal codes of every distinct team of the systems '''
+    
+    teams = dict()
+    for sys in systems:
+        for team in sys:
+            if tuple(team) not in teams:
+                teams[tuple(team)] = team_codes(team, names)
+    return list(teams.values())
+
+def _is_text_column(column):
+    ''' True for the System ID, TeamN and PlayerN columns of system rows '''
+    
+    return column == 'System ID' or re.fullmatch(r'(Team|Player)\d+', str(column)) is not None
+
+def _team_labels(codes, strategy_dict):
+    ''' Returns the TeamN value and sorted PlayerN values of a team's codes '''
+    
+    players = list(strategy_dict.values())
+    names = sorted(players[code - 1].name for code in codes)
+    return ','.join(names), names
+
+def compact_frame(df, masks=None):
+    '''
+    Replaces the text columns of system rows by team masks
+    
+        Parameters:
+            df (pandas.dataframe): rows as in PdSystem.data
+            masks (bool): encode the teams as masks; with False the System 
+                ID is kept as it is (default is None, masks if they give 
+                back every System ID, see encoding.masks_exact)
+        
+        Returns:
+            (pandas.dataframe): 'Team1 Mask', 'Team2 Mask', ... uint64 
+                columns (see encoding), or the System ID column, followed by
+                the numeric columns, in their order
+    '''
+    
+    keep = [num for num, c in enumerate(df.columns) if not _is_text_column(c)]
+    if masks is None:
+        masks = masks_exact([codes for s in df['System ID'] for codes in system_codes(s)])
+    if not masks:
+        return pd.concat([df[['System ID']], df.iloc[:, keep]], axis=1)
+    masks = np.array([parse_system_id(s) for s in df['System ID']], 
+                     dtype=np.uint64).reshape(len(df), -1)
+    mask_df = pd.DataFrame(masks, columns=[f'Team{num} Mask' for num in range(1, masks.shape[1]+1)],
+                           index=df.index)
+    return pd.concat([mask_df, df.iloc[:, keep]], axis=1)
+
+def expand_frame(df, strategy_dict=None):
+    '''
+    Rebuilds the System ID (from team masks), team and player columns of 
+    compact rows (see compact_frame); rows that are not compact are 
+    returned unchanged
+    
+        Parameters:
+            df (pandas.dataframe): compact rows
+            strategy_dict (dict): players by name, in the order of the 
+                decimal codes (default is None, settings.CD_strategy_dict)
+        
+        Returns:
+            (pandas.dataframe): rows as in PdSystem.data
+    '''
+    
+    strategy_dict = strategy_dict or settings.CD_strategy_dict
+    mask_columns = [c for c in df.columns if re.fullmatch(r'Team\d+ Mask', str(c))]
+    if mask_columns:
+        teams = df[mask_columns].to_numpy(dtype=np.uint64)
+        ids = np.array(system_ids(teams), dtype=object)
+        labels = lambda mask: _team_labels(team_members(mask, range(1, 65)), strategy_dict)
+    elif 'System ID' in df.columns and 'Team1' not in df.columns:
+        ids = df['System ID'].to_numpy(dtype=object)
+        teams = np.array([s.split('_') for s in ids], dtype=object).reshape(len(df), -1)
+        labels = lambda team: _team_labels([int(code) for code in team.split(',')], 
+                                           strategy_dict)
+    else:
+        return df
+    start = len(mask_columns) or 1
+    columns, values = ['System ID'], [ids]
+    
+    # Each distinct team is labelled once
+    team = -1
+    for num in range(start, df.shape[1]):
+        column = df.columns[num]
+        found = re.fullmatch(r'P(\d+)_Norm_Score', str(column))
+        if found and found[1] == '1':
+            team += 1
+            unique, inverse = np.unique(teams[:, team], return_inverse=True)
+            names = [labels(m) for m in unique]
+            columns.append(f'Team{team+1}')
+            values.append(np.array([n for n, _ in names], dtype=object)[inverse])
+        if found:
+            columns.append(f'Player{found[1]}')
+            values.append(np.array([p[int(found[1]) - 1] for _, p in names],
+                                   dtype=object)[inverse])
+        columns.append(column)
+        values.append(df.iloc[:, num].to_numpy())
+    data = pd.DataFrame(dict(enumerate(values)), index=df.index)
+    data.columns = columns
+    return data
 
-def sum_state(results_obj, state_tupl):
-    state_dist = results_obj.state_distribution
-    state_sum = 0
-    # print('Counting the number of CC states:') # this
-    i = 1
-    for player in state_dist:
-        # print('player ', i, 'states:') # this
-        i += 1
-        for state_counter in player:
-            states = dict(state_counter)
-            # print(states) # this
-            try:
-                state_sum += states[state_tupl]
-            except:
-                continue
-    # print("The total number of CCs: ", state_sum) # this
-    return state_sum
-
-def CC_threshold(results_obj, state_tupl, t):
-    state_dist = results_obj.state_distribution
-    state_sum = 0
-    i = 1
-    AllSuperGames = 0
-    GoodSuperGames = 0
-    for player in state_dist:
-        # print('player ', i, 'states:') # this
-        i += 1
-        for state_counter in player:
-            states = dict(state_counter)
-            if bool(states):
-                AllSuperGames += 1
-            # print("     ", states) # this
-            try:
-                fraction = states[state_tupl] / sum(list(states.values()))
-                # print("     ", fraction)
-                if fraction >= t:
-                    # print("     GOOD")
-                    GoodSuperGames += 1
-
-            except:
-                continue
-        # sleep(10)
-    fraction = GoodSuperGames / AllSuperGames
-    # print("The total number of CCs: ", fraction) # this
-    return fraction
+def population_matrix(strategy_dict, game_type=None, analytic=False):
+    '''
+    Plays (or evaluates) every pairing of a strategy population once
+    
+        Parameters:
+            strategy_dict (dict): players by name
+            game_type (object): axelrod.game (default is None, the classic 
+                PD setting)
+            analytic (bool): exact expectations of memory-one players (see 
+                markov.MarkovMatrix) instead of played matches
+        
+        Returns:
+            (object): a match_matrix.MatchMatrix, or a lookup.LookupMatrix
+                when every player is a lookup.LookupPlayer
+    '''
+    
+    if analytic:
+        return MarkovMatrix(strategy_dict, game_type)
+    if all(isinstance(p, LookupPlayer) for p in strategy_dict.values()):
+        return LookupMatrix(strategy_dict, game_type)
+    return MatchMatrix(strategy_dict, game_type)
 
 class Agent:
     def __init__(self, strategy):
@@ -198,7 +390,9 @@ class PdTournament:
         Saves tournament data as a csv file
     """
     
-    def __init__(self, strategy_list, game=None, t = [0.5], reps=1):
+    def __init__(self, strategy_list, game=None, t = [0.5], reps=1, matrix=None,
+                 analytic=False, cache=None, seed=SEED, processes=0, turns=TURNS,
+                 prob_end=PROB_END, cycles=False, profiler=None):
         """
         Constructs all the necessary attributes for tournament object
         
@@ -206,16 +400,69 @@ class PdTournament:
         ----------
         player_list : list
             list of strategy names that also describe the tournament players
+            (axelrod players, or lookup.LookupPlayer objects, whose matches 
+            are simulated by a lookup.LookupMatrix when no matrix is given)
         game : axelrod.game (object)
             container for game matrix and scoring logic (default is None, which
             will prompt the classic PD setting)
         reps : int
             number of times to repeat tournament (default is 1)
+        matrix : match_matrix.MatchMatrix (object)
+            precomputed pairwise matches of a population containing every
+            player in strategy_list; when given, metrics are read from it
+            instead of playing the tournament and reps is taken from the
+            matrix (default is None)
+        analytic : bool
+            if True, metrics are the exact expectations over match lengths
+            computed from the players' memory-one Markov chains (reps is 
+            ignored, default is False)
+        cache : cache.TournamentCache (object)
+            store of previously played tournaments, keyed by the players' 
+            strategies, game and match settings; only used when no matrix is
+            given (default is None)
+        seed : int
+            seed of the axelrod tournament (default is SEED)
+        processes : int
+            processes used by axelrod to play the tournament: 0 for all 
+            cores, None to play in this process (default is 0)
+        turns : int
+            maximum number of turns of a match (default is TURNS)
+        prob_end : float
+            probability that a match ends after any given turn (default is 
+            PROB_END)
+        cycles : bool
+            if True, the players (deterministic memory-one players such as 
+            those of settings) are matched through the transient and cycle 
+            of each pairing, so the cost does not grow with turns; match 
+            lengths are drawn from seed, but not as axelrod draws them 
+            (default is False)
+        profiler : profiler.Profiler (object)
+            times the 'play', 'metrics' and 'frames' phases and counts 
+            tournaments (default is None, no profiling)
         """
         self.CCThreshold = t
+        self.profiler = profiler or DISABLED
+        self.cache = cache
+        self.seed = seed
+        self.processes = processes
+        self.turns = turns
+        self.prob_end = prob_end
         self.player_list = strategy_list
         self.names = ','.join(sorted([n.name for n in strategy_list]))
         self.game = game
+        if analytic and matrix is None:
+            with self.profiler.phase('play'):
+                matrix = MarkovMatrix(dict(enumerate(strategy_list)), game, turns, prob_end)
+        elif cycles and matrix is None:
+            with self.profiler.phase('play'):
+                matrix = CycleMatrix(dict(enumerate(strategy_list)), game, turns, prob_end,
+                                     reps=reps, seed=seed)
+        elif matrix is None and all(isinstance(p, LookupPlayer) for p in strategy_list):
+            # Lookup-table players are not axelrod players
+            with self.profiler.phase('play'):
+                matrix = LookupMatrix(dict(enumerate(strategy_list)), game, turns, prob_end,
+                                      reps=reps, seed=seed)
+        self.matrix = matrix
         self.data = self.run_tournament(reps)  # If reps=1, then data will be 
                                                # one row. If reps >1, then data
                                                # will be multiple rows
@@ -242,103 +489,108 @@ class PdTournament:
         
         """
         
-        # Instantiate tournament object
         roster = self.player_list
+        self.profiler.count('tournaments')
+        if self.matrix is not None:
+            with self.profiler.phase('metrics'):
+                normal_scores, metrics = self.matrix.tournament_metrics(roster, self.CCThreshold)
+            return self._data_row(normal_scores, metrics)
+
+        if self.cache is not None:
+            # The roster is played in the caller's order (and keyed by it), 
+            # so cached results are those of an uncached run
+            key = tournament_key(roster, self.game, self.turns, self.prob_end, reps,
+                                 self.seed, self.CCThreshold)
+            cached = self.cache.get(key)
+            self.profiler.count('cache misses' if cached is None else 'cache hits')
+            if cached is None:
+                normal_scores, metrics = self._play(roster, reps)
+                cached = {'normal_scores': np.asarray(normal_scores, dtype=float).tolist(),
+                          'metrics': [float(m) for m in metrics]}
+                self.cache.put(key, cached)
+            return self._data_row(np.array(cached['normal_scores']), cached['metrics'])
+
+        normal_scores, metrics = self._play(roster, reps)
+        return self._data_row(normal_scores, metrics)
+
+    def _play(self, roster, reps):
+        """
+        Plays the axelrod tournament of roster and returns the per-player 
+        normalised scores and the tournament metrics (as ordered in 
+        _data_row)
+        """
+        # Instantiate tournament object
         # print('Instantiating tournament object with these players: ', self.names) # this
         tourn = Tournament(players=roster,
                                     game=self.game,
-                                    prob_end=0.1,
-                                    turns=30,
+                                    prob_end=self.prob_end,
+                                    turns=self.turns,
                                     repetitions=reps,
-                                    seed=1)
-
-        results = tourn.play(processes=0)  
-        # print("\nMatch length for each user against other users: ", results.match_lengths) # this
-        sum_T = 0
-        match_len = results.match_lengths
-        for i in range(len(match_len)):
-            srp = []
-            for xi in range(len(match_len[i])):
-                match_len[i][xi].pop(xi)
-                srp.append(sum(match_len[i][xi]))
-            sum_T = sum(srp)
-        # Collect Group Outcome Metrics
-        normal_scores = results.normalised_scores
-        sscores = results.scores
-        avg_norm_score = np.average(normal_scores)
-        new_avg_norm_score = np.average(sscores)
-        avg_norm_score_2 = (new_avg_norm_score * len(results.scores)) / (sum_T / 2)
-
-        min_norm_score = np.amin(normal_scores)
-        avg_norm_cc_distribution = avg_normalised_state(results, (Action.C,Action.C))
-        new_avg_norm_cc_distribution = new_avg_normalised_state(results, (Action.C,Action.C))
-        avg_norm_cc_distribution_2 = sum_state(results, (Action.C,Action.C)) / sum_T
-        avg_CC_threshold = []
-        for th in self.CCThreshold:
-            avg_CC_threshold.append(CC_threshold(results, (Action.C,Action.C), th))
-        data = [self.names, 
-                avg_norm_score,
-                avg_norm_score_2,
-                min_norm_score,
-                avg_norm_cc_distribution,
-                avg_norm_cc_distribution_2,
-                avg_CC_threshold[0],
-                avg_CC_threshold[1],
-                avg_CC_threshold[2],
-                avg_CC_threshold[3],
-                avg_CC_threshold[4],
-                avg_CC_threshold[5],
-                avg_CC_threshold[6],
-                avg_CC_threshold[7],
-                avg_CC_threshold[8],
-                avg_CC_threshold[9]]
-            
+                                    seed=self.seed)
+
+        with self.profiler.phase('play'):
+            results = tourn.play(processes=self.processes)  
+        self.profiler.count('tournaments played')
+        with self.profiler.phase('metrics'):
+            # print("\nMatch length for each user against other users: ", results.match_lengths) # this
+            # sum_T counts the turns of the last repetition (self-interactions 
+            # excluded)
+            last_lengths = np.array(results.match_lengths[-1])
+            sum_T = last_lengths[~np.eye(len(last_lengths), dtype=bool)].sum()
+            # Collect Group Outcome Metrics
+            normal_scores = results.normalised_scores
+            sscores = results.scores
+            avg_norm_score = np.average(normal_scores)
+            new_avg_norm_score = np.average(sscores)
+            avg_norm_score_2 = (new_avg_norm_score * len(results.scores)) / (sum_T / 2)
+
+            min_norm_score = np.amin(normal_scores)
+            metrics = [avg_norm_score,
+                       avg_norm_score_2,
+                       min_norm_score] + cc_metrics(state_array(results), sum_T,
+                                                    self.CCThreshold)
+            return normal_scores, metrics
+
+    def _data_row(self, normal_scores, metrics):
+        """
+        Assembles the tournament data row from the per-player normalised 
+        scores and the tournament metrics (as ordered in run_tournament)
+        """
+        with self.profiler.phase('frames'):
+            roster = self.player_list
+            data = [self.names] + list(metrics)
+            col = ['Tournament_Members', 
+                    'Avg_Norm_Score',
+                    'Avg_Norm_Score_2',
+                    'Min_Norm_Score',
+                    'Avg_Norm_CC_Distribution',
+                    'Avg_Norm_CC_Distribution_2'] + [
+                    f'Avg_CC_Threshold_{th:g}' for th in self.CCThreshold]
         
-        col = ['Tournament_Members', 
-                'Avg_Norm_Score',
-                'Avg_Norm_Score_2',
-                'Min_Norm_Score',
-                'Avg_Norm_CC_Distribution',
-                'Avg_Norm_CC_Distribution_2',
-                'Avg_CC_Threshold_0.1',
-                'Avg_CC_Threshold_0.2',
-                'Avg_CC_Threshold_0.3',
-                'Avg_CC_Threshold_0.4',
-                'Avg_CC_Threshold_0.5',
-                'Avg_CC_Threshold_0.6',
-                'Avg_CC_Threshold_0.7',
-                'Avg_CC_Threshold_0.8',
-                'Avg_CC_Threshold_0.9',
-                'Avg_CC_Threshold_1']
-        
-        # List manipulation to identify individual players in separate columns
-        sorted_list = sorted([n.name for n in roster])
-        pl_list = list()
-        for num, p in enumerate(sorted_list,1):
-            pl_list.append(f'Player{num}')
-            pl_list.append(f'P{num}_Norm_Score')
-
-        pl_data_list = list()
-        for name, score in zip(sorted_list, normal_scores):
-            pl_data_list.append(name)
-            pl_data_list.append(score[0])
-
-        data = [data[0]]+pl_data_list+data[1:]
-        col = [col[0]]+pl_list+col[1:]
-
-        # Store data in pandas dataframe
-        data_row = pd.DataFrame([data], columns=col)
-        #self.data = data_row
-        return data_row
+            # List manipulation to identify individual players in separate columns
+            sorted_list = sorted([n.name for n in roster])
+            pl_list = list()
+            for num, p in enumerate(sorted_list,1):
+                pl_list.append(f'Player{num}')
+                pl_list.append(f'P{num}_Norm_Score')
+
+            pl_data_list = list()
+            for name, score in zip(sorted_list, normal_scores):
+                pl_data_list.append(name)
+                pl_data_list.append(score[0])
+
+            data = [data[0]]+pl_data_list+data[1:]
+            col = [col[0]]+pl_list+col[1:]
+
+            # Store data in pandas dataframe
+            data_row = pd.DataFrame([data], columns=col)
+            #self.data = data_row
+            return data_row
 
     def save_data(self, file_name):
         """ Saves tournament data as a csv file """
         
-        if self.game is None:
-            R,P,S,T = game.Game().RPST()
-        else:
-            R,P,S,T = self.game.RPST()
-        self.data.to_csv(file_name+f'_gameRPST_{R!r}_{P!r}_{S!r}_{T!r}.csv', 
+        self.data.to_csv(file_name+f'_gameRPST_{rpst_label(self.game)}.csv', 
                   index=False)
 
 class PdSystem:
@@ -353,7 +605,12 @@ class PdSystem:
         container for game matrix and scoring logic
     data : pandas.dataframe (object)
         placeholder for system data
-    id : 
+    id : str
+        System ID, the decimal codes of the teams in the order of their 
+        lists (see system_id), set by compute_data
+    masks : list
+        one integer mask per team (see encoding.team_mask), or None when a
+        team repeats a strategy
     team_dict : dictionary
         container to hold team-tournament object pairs
         
@@ -366,7 +623,8 @@ class PdSystem:
         Saves system data as a csv file
     """
     
-    def __init__(self, team_list, game_type=None, t = [0.5]):
+    def __init__(self, team_list, game_type=None, t = [0.5], matrix=None, cache=None,
+                 seed=SEED, processes=0, profiler=None, strategy_dict=None):
         """
         Constructs all the necessary attributes for system object
         
@@ -374,24 +632,54 @@ class PdSystem:
         ----------
         team_list : list
             a two-dimensional list where each item of the first-dimension is a
-            player_list for a single tournament
+            player_list for a single tournament (a team may list a strategy 
+            more than once)
         game_type : axelrod.game (object)
             container for game matrix and scoring logic (default is None, which
             will prompt the classic PD setting)
+        matrix : match_matrix.MatchMatrix (object)
+            precomputed pairwise matches of strategy_dict under game_type;
+            when given, team metrics are read from it instead of playing 
+            each team tournament (default is None)
+        cache : cache.TournamentCache (object)
+            store that is checked before a team tournament is played and 
+            updated after (default is None)
+        seed : int
+            seed of every team tournament (default is SEED)
+        processes : int
+            processes used by axelrod to play each team tournament (default
+            is 0, all cores)
+        profiler : profiler.Profiler (object)
+            shared with the team tournaments; compute_data adds the 
+            'aggregate' and 'frames' phases (default is None, no profiling)
+        strategy_dict : dict
+            maps the names of team_list to players, e.g. the generated 
+            players of lookup.random_population together with a 
+            lookup.LookupMatrix of them as matrix; the System ID codes are
+            positions in it (default is None, settings.CD_strategy_dict)
         
         """
         self.CCThreshold = t
+        self.profiler = profiler or DISABLED
         self.data = None
         self.id = None
         self.game = game_type
         self.team_list = team_list
+        if strategy_dict is None:
+            strategy_dict = settings.CD_strategy_dict
+        self._names = list(strategy_dict)
+        self.masks = None
+        if all(len(set(team)) == len(team) for team in team_list):
+            self.masks = [team_mask(team, self._names) for team in team_list]
         tournament_dict = dict()
         
         # Loop through team list and construct tournament instances
         # for each team. Save each team to the tournament dictionary
         for num, team in enumerate(team_list,1):
-            player_list = [settings.CD_strategy_dict[i] for i in team]
-            new_tour = PdTournament(player_list, game_type, self.CCThreshold)
+            player_list = [strategy_dict[i] for i in team]
+            new_tour = PdTournament(player_list, game_type, self.CCThreshold, matrix=matrix,
+                                    cache=cache, seed=seed, processes=processes,
+                                    profiler=profiler)
             tournament_dict[f'Team{num}'] = new_tour
         
         self.team_dict = tournament_dict                             
@@ -403,110 +691,31 @@ class PdSystem:
         metrics, and then assigns a single dataframe to data attribute
         '''
         
-        first = True
-        for key, value in self.team_dict.items():
-
+        # Compute system metrics
+        with self.profiler.phase('aggregate'):
+            metrics = np.array([[team_metrics(value.data) for value in self.team_dict.values()]])
+            sys_metrics = system_metrics(metrics, self.CCThreshold)
+        
+        with self.profiler.phase('frames'):
             # renaming columns to tournament data frame
-            df = value.data.rename(columns={'Tournament_Members': key,
-                                        'Avg_Norm_Score': f'{key} Avg Score',
-                                        'Avg_Norm_Score_2': f'{key} New Avg Score',
-                                        'Min_Norm_Score': f'{key} Min Score',
-                                        'Avg_Norm_CC_Distribution': f'{key} Avg CC Dist',
-                                        'Avg_Norm_CC_Distribution_2': f'{key} New Avg CC Dist',
-                                        'Avg_CC_Threshold_0.1': f'{key} Avg CC Fraction 0.1',
-                                        'Avg_CC_Threshold_0.2': f'{key} Avg CC Fraction 0.2',
-                                        'Avg_CC_Threshold_0.3': f'{key} Avg CC Fraction 0.3',
-                                        'Avg_CC_Threshold_0.4': f'{key} Avg CC Fraction 0.4',
-                                        'Avg_CC_Threshold_0.5': f'{key} Avg CC Fraction 0.5',
-                                        'Avg_CC_Threshold_0.6': f'{key} Avg CC Fraction 0.6',
-                                        'Avg_CC_Threshold_0.7': f'{key} Avg CC Fraction 0.7',
-                                        'Avg_CC_Threshold_0.8': f'{key} Avg CC Fraction 0.8',
-                                        'Avg_CC_Threshold_0.9': f'{key} Avg CC Fraction 0.9',
-                                        'Avg_CC_Threshold_1': f'{key} Avg CC Fraction 1',})
-            if first:
-                df1 = df
-                first = False
-            else:
-                df1 = pd.concat([df1,df], axis=1)
-        
-        df1.index += 1  # Initialize index from 1 instead of 0
-        # Collect team data
-        min_scores = [df1[f'{i} Min Score'].values for i in list(self.team_dict)]
-        avg_scores = [df1[f'{i} Avg Score'].values for i in list(self.team_dict)]
-        new_avg_scores = [df1[f'{i} New Avg Score'].values for i in list(self.team_dict)]
-        cc_dists = [df1[f'{i} Avg CC Dist'].values for i in list(self.team_dict)]
-        new_cc_dists = [df1[f'{i} New Avg CC Dist'].values for i in list(self.team_dict)]
-        cc_fraction_01 = [df1[f'{i} Avg CC Fraction 0.1'].values for i in list(self.team_dict)]
-        cc_fraction_02 = [df1[f'{i} Avg CC Fraction 0.2'].values for i in list(self.team_dict)]
-        cc_fraction_03 = [df1[f'{i} Avg CC Fraction 0.3'].values for i in list(self.team_dict)]
-        cc_fraction_04 = [df1[f'{i} Avg CC Fraction 0.4'].values for i in list(self.team_dict)]
-        cc_fraction_05 = [df1[f'{i} Avg CC Fraction 0.5'].values for i in list(self.team_dict)]
-        cc_fraction_06 = [df1[f'{i} Avg CC Fraction 0.6'].values for i in list(self.team_dict)]
-        cc_fraction_07 = [df1[f'{i} Avg CC Fraction 0.7'].values for i in list(self.team_dict)]
-        cc_fraction_08 = [df1[f'{i} Avg CC Fraction 0.8'].values for i in list(self.team_dict)]
-        cc_fraction_09 = [df1[f'{i} Avg CC Fraction 0.9'].values for i in list(self.team_dict)]
-        cc_fraction_10 = [df1[f'{i} Avg CC Fraction 1'].values for i in list(self.team_dict)]
-        # Compute system metrics and create new data frame
-        sys_df = pd.DataFrame({'SYS MIN Score' : [np.amin(min_scores)],
-                               'SYS AVG Score' : [np.average(avg_scores)],
-                               'MIN of Team Avgs' : [np.amin(avg_scores)],
-                               'AVG of Team Mins' : [np.average(min_scores)],
-                               'SYS CC Dist AVG' : [np.average(cc_dists)],
-                               'SYS CC Dist MIN' : [np.amin(cc_dists)],
-                               'SYS New CC Dist AVG' : [np.average(new_cc_dists)],
-                               'SYS New CC Dist MIN' : [np.amin(new_cc_dists)],
-                               'SYS CC Fraction 01 AVG' : [np.average(cc_fraction_01)],
-                               'SYS CC Fraction 01 MIN' : [np.amin(cc_fraction_01)],
-                               'SYS CC Fraction 02 AVG' : [np.average(cc_fraction_02)],
-                               'SYS CC Fraction 02 MIN' : [np.amin(cc_fraction_02)],
-                               'SYS CC Fraction 03 AVG' : [np.average(cc_fraction_03)],
-                               'SYS CC Fraction 03 MIN' : [np.amin(cc_fraction_03)],
-                               'SYS CC Fraction 04 AVG' : [np.average(cc_fraction_04)],
-                               'SYS CC Fraction 04 MIN' : [np.amin(cc_fraction_04)],
-                               'SYS CC Fraction 05 AVG' : [np.average(cc_fraction_05)],
-                               'SYS CC Fraction 05 MIN' : [np.amin(cc_fraction_05)],
-                               'SYS CC Fraction 06 AVG' : [np.average(cc_fraction_06)],
-                               'SYS CC Fraction 06 MIN' : [np.amin(cc_fraction_06)],
-                               'SYS CC Fraction 07 AVG' : [np.average(cc_fraction_07)],
-                               'SYS CC Fraction 07 MIN' : [np.amin(cc_fraction_07)],
-                               'SYS CC Fraction 08 AVG' : [np.average(cc_fraction_08)],
-                               'SYS CC Fraction 08 MIN' : [np.amin(cc_fraction_08)],
-                               'SYS CC Fraction 09 AVG' : [np.average(cc_fraction_09)],
-                               'SYS CC Fraction 09 MIN' : [np.amin(cc_fraction_09)],
-                               'SYS CC Fraction 10 AVG' : [np.average(cc_fraction_10)],
-                               'SYS CC Fraction 10 MIN' : [np.amin(cc_fraction_10)],}, index=[1])
-
-        # Concatenate two data frames
-        sys_df = pd.concat([sys_df,df1], axis=1)
-
-        # Reformat team names into decimal code to distinguish system runs
-        teams_ = [df1[f'{i}'].values.tolist()[0] for i in list(self.team_dict)]
-        str_list = [0 for x in range(len(teams_))]
-        for num, tm in enumerate(teams_):
-            str_list[num] = tm.split(',')
-        str_list2 = copy.deepcopy(str_list)
-        str_list = self.team_list
-        # print("str_list", str_list) # this
-        # print("team list:", self.team_list) # this
-        for num, lst in enumerate(str_list):
-            dec_list=[settings.name_dec_dict[n] for n in lst]
-            dec_list = ','.join(dec_list)
-            str_list[num] = dec_list
-        new_str='_'.join(str_list)
-        # print('str str:' , new_str) # this
-        self.id = new_str
-        new_df = pd.DataFrame({'System ID' : [new_str]}, index=[1])
-        self.data = pd.concat([new_df,sys_df], axis=1)
+            df1 = pd.concat([value.data.set_axis(team_columns(key, value.data.columns), axis=1)
+                             for key, value in self.team_dict.items()], axis=1)
+            df1.index += 1  # Initialize index from 1 instead of 0
+            
+            # Create the system data frame and concatenate the two
+            sys_df = pd.DataFrame(sys_metrics, index=[1])
+            sys_df = pd.concat([sys_df,df1], axis=1)
+
+            # Format the teams into decimal codes to distinguish system runs
+            self.id = system_id(self.team_list, self._names)
+            new_df = pd.DataFrame({'System ID' : [self.id]}, index=[1])
+            self.data = pd.concat([new_df,sys_df], axis=1)
+        self.profiler.count('systems')
 
     def save_data(self, path_to_file):
         """ Saves system data as a csv file """
         
-        if self.game is None:
-            R,P,S,T = game.Game().RPST()
-        else:
-            R,P,S,T = self.game.RPST()
-
-        self.data.to_csv(path_to_file+f'sid_{self.id}_RPST_{R!r}_{P!r}_{S!r}_{T!r}.csv')
+        self.data.to_csv(path_to_file+f'sid_{self.id}_RPST_{rpst_label(self.game)}.csv')
 
 class PdExp:
     """
@@ -522,17 +731,28 @@ class PdExp:
         3rd-dimension is the individual players.
     game : axelrod.game (object)
         container for game matrix and scoring logic 
+    matrix : match_matrix.MatchMatrix (object)
+        pairwise matches shared by all systems when precompute is set
+    cache : cache.TournamentCache (object)
+        team tournaments shared by all systems (None when disabled)
+    profiler : profiler.Profiler (object)
+        phase timers and counters of the runs (None when disabled)
+    strategy_dict : dict
+        players of the teams by name
  
     Methods
     -------
-    run_experiments:
+    run_experiments(processes=1, chunk_size=100, shard_dir=None, sink=None):
         Iterates through each system, runs the different tournaments and 
-        then saves the data to the data attribute.
+        then saves the data to the data attribute, optionally in parallel 
+        and resumable from shards.
     save_data(path_to_directory, descrip_name):
         Saves experiment data as a csv file
     """
    
-    def __init__(self, tuple_of_systems, t = [0.5], game_type=None):
+    def __init__(self, tuple_of_systems, t = [0.5], game_type=None, precompute=False,
+                 analytic=False, cache=False, seed=None, first=1, profiler=None,
+                 strategy_dict=None):
         """
         Constructs all the necessary attributes for pd experiment object
         
@@ -545,9 +765,52 @@ class PdExp:
         game_type : axelrod.game (object)
             container for game matrix and scoring logic (default is None, which
             will prompt the classic PD setting)
+        precompute : bool
+            if True, every pairing of strategy_dict is played once into a 
+            MatchMatrix (see population_matrix) and all systems are computed
+            from it (default is False)
+        analytic : bool
+            if True, the precomputed matrix holds the exact expectation of 
+            every pairing (see markov.MarkovMatrix) and precompute is implied
+            (default is False)
+        cache : bool or cache.TournamentCache (object)
+            True to share an in-memory cache of team tournaments across the 
+            systems, a TournamentCache (e.g. with an SQLite path) to use that 
+            one, or False to play every team of every system (default is False)
+        seed : int
+            if given, system number num (counting from 1) plays its 
+            tournaments with seed + num; otherwise every tournament uses SEED 
+            (default is None). Either way the seeds do not depend on how the 
+            systems are split across processes
+        first : int
+            system number of the first system, when tuple_of_systems is a 
+            slice of a larger experiment (e.g. a shard of work_queue), so 
+            that its seeds are those of the full run (default is 1)
+        profiler : profiler.Profiler (object)
+            times the 'play', 'metrics', 'aggregate', 'frames' and 'io' 
+            phases of run_experiments and counts tournaments and systems; 
+            worker processes time their own phases and the totals are 
+            merged into it (default is None, no profiling)
+        strategy_dict : dict
+            maps the names of the teams to players, e.g. the players of a 
+            registry.Registry or of lookup.random_population; the System ID
+            codes are positions in it (default is None, 
+            settings.CD_strategy_dict)
         
         """
         self.CCThreshold = t
+        self.profiler = profiler
+        self.strategy_dict = strategy_dict or settings.CD_strategy_dict
+        self.seed = seed
+        self.first = first
+        if cache is True:
+            cache = TournamentCache()
+        elif cache is False:
+            cache = None
+        self.cache = cache
+        self.precompute = precompute or analytic
+        self.analytic = analytic
+        self.matrix = None
         self.sys_tuple = tuple_of_systems # list of lists with partition sets
         self.game = game_type
         # for system in tuple_of_systems:
@@ -562,37 +825,288 @@ class PdExp:
         #     systems.append(teams)
         # self.systems = systems
 
-    def run_experiments(self):
+    def system_seed(self, num):
+        """ Returns the tournament seed of system number num (from 1) """
+        
+        return SEED if self.seed is None else self.seed + num
+
+    def _build_matrix(self):
+        """ Builds the shared pairwise matrix if precompute is set """
+        
+        if self.precompute and self.matrix is None:
+            with self._profiler.phase('play'):
+                self.matrix = population_matrix(self.strategy_dict, self.game, self.analytic)
+
+    @property
+    def _profiler(self):
+        return self.profiler or DISABLED
+
+    def run_experiments(self, processes=1, chunk_size=100, shard_dir=None, sink=None,
+                        keep_data=True, compact=False, report=None):
         """
         Iterates through each system, runs the different tournaments and 
         then saves the data to the data attribute.
+        
+        If a sink is given, every system's row is appended to it, in order, 
+        and the sink is flushed after every chunk_size systems, so a killed 
+        run leaves all completed rows in a single file.
+        
+        In a single process with the default seed, every distinct team is 
+        played once and the system rows of each chunk are computed together 
+        (see system_metrics); the rows are the same as those of PdSystem.
+        
+        With processes other than 1 or with a shard_dir, the systems are 
+        split into chunks of chunk_size that run in a process pool (each 
+        team tournament is then played serially inside its worker). Every 
+        finished chunk is written to its own shard in shard_dir and chunks 
+        whose shard already exists are not run again, so a killed run 
+        resumes from the last completed shards. A manifest in shard_dir 
+        records chunk_size, the systems, t, the game and the seed, and a 
+        resumed run with other settings raises ValueError instead of 
+        reusing shards. Since tournament seeds only 
+        depend on the system number, the merged data is identical to a 
+        serial run.
+        
+        Axelrod sets the "spawn" start method, so every worker imports 
+        settings again and a calling script needs an 
+        if __name__ == '__main__': guard.
+        
+        Parameters
+        ----------
+        processes : int
+            number of worker processes, 0 for all cores (default is 1, which
+            runs the systems in this process)
+        chunk_size : int
+            number of systems per chunk, shard and flush (default is 100)
+        shard_dir : str
+            directory of the chunk shards (default is None, which keeps the
+            chunks in memory only)
+        sink : result_sink.ResultSink (object)
+            where rows are streamed; it is flushed but left open, so several 
+            experiments can share it (default is None, which writes no file;
+            use save_data afterwards)
+        keep_data : bool
+            also collect the rows in the data attribute; with False memory 
+            stays bounded and data is None, which needs a sink (default is 
+            True)
+        compact : bool
+            keep the rows of the data attribute as team masks (or System 
+            IDs, when a team repeats a strategy or is not listed in code 
+            order) and numeric columns (see compact_frame); the sink and 
+            save_data still get System ID, team and player names (default 
+            is False)
+        report : str
+            JSON file the profiler report is written to at the end (see 
+            profiler.Profiler.report); a profiler is created for the run if
+            there is none (default is None)
+        """
+        
+        if sink is None and not keep_data:
+            raise ValueError('without a sink, keep_data must be True or the rows are lost')
+        if report is not None and self.profiler is None:
+            self.profiler = Profiler()
+        prof = self._profiler
+        self._build_matrix()
+        # One compact form for the whole run, so that all its rows share columns
+        names = list(self.strategy_dict)
+        masks = masks_exact(_system_teams(self.sys_tuple, names))
+        kept = []
+        def emit(df):
+            # Rows come compact from _run_batch and with names otherwise
+            with prof.phase('frames'):
+                full = expand_frame(df, self.strategy_dict)
+                if keep_data and compact:
+                    kept.append(df if full is not df else compact_frame(df, masks))
+                elif keep_data:
+                    kept.append(full)
+            if sink is not None:
+                with prof.phase('io'):
+                    sink.append(full)
+            prof.count('rows', len(df))
+        def flush():
+            if sink is not None:
+                with prof.phase('io'):
+                    sink.flush()
+        
+        if processes == 1 and shard_dir is None and self.seed is None:
+            self._run_batch(emit, flush, chunk_size, masks)
+        elif processes == 1 and shard_dir is None:
+            self._run_serial(emit, flush, chunk_size)
+        else:
+            self._run_chunks(emit, flush, processes, chunk_size, shard_dir)
+        
+        flush()
+        with prof.phase('frames'):
+            self.data = pd.concat(kept) if keep_data else None
+        if report is not None:
+            self.profiler.save(report)
+
+    def _shard_manifest(self, chunk_size):
+        """ Returns the settings the shards of a run depend on, as a dict """
+        
+        systems = json.dumps([[list(team) for team in sys] for sys in self.sys_tuple])
+        return {'chunk_size': chunk_size, 'first': self.first, 
+                'systems': len(self.sys_tuple),
+                'systems_sha256': hashlib.sha256(systems.encode()).hexdigest(),
+                't': [float(th) for th in self.CCThreshold], 
+                'RPST': [float(x) for x in (self.game or game.Game()).RPST()],
+                'seed': self.seed}
+
+    def _check_manifest(self, shard_dir, chunk_size):
+        """
+        Writes the manifest of a new shard_dir, or raises ValueError if the
+        shards in shard_dir were written by a run with other settings
+        """
+        path = shard_dir / 'manifest.json'
+        manifest = self._shard_manifest(chunk_size)
+        if path.exists():
+            with open(path) as f:
+                found = json.load(f)
+            if found != manifest:
+                changed = sorted(key for key in manifest.keys() | found.keys()
+                                 if found.get(key) != manifest.get(key))
+                raise ValueError(f'the shards in {shard_dir} belong to another run '
+                                 f'(different {", ".join(changed)})')
+        elif any(shard_dir.glob('shard_*.pkl')):
+            raise ValueError(f'{shard_dir} holds shards without a manifest')
+        else:
+            with open(path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+    def _run_chunks(self, emit, flush, processes, chunk_size, shard_dir):
+        """ Runs chunks of systems in a process pool and emits them in order """
+        
+        numbered = list(enumerate(self.sys_tuple, self.first))
+        chunks = [numbered[i:i+chunk_size] for i in range(0, len(numbered), chunk_size)]
+        if shard_dir is not None:
+            Path(shard_dir).mkdir(parents=True, exist_ok=True)
+            self._check_manifest(Path(shard_dir), chunk_size)
+        shard = lambda k: Path(shard_dir) / f'shard_{k:06d}.pkl'
+        
+        prof = self._profiler
+        frames = dict()
+        pending = []
+        for k, chunk in enumerate(chunks):
+            if shard_dir is not None and shard(k).exists():
+                with prof.phase('io'):
+                    frames[k] = pd.read_pickle(shard(k))
+            else:
+                pending.append(k)
+        
+        next_k = 0
+        def drain():
+            nonlocal next_k
+            while next_k in frames:  # Chunks may finish out of order
+                emit(frames.pop(next_k))
+                flush()
+                next_k += 1
+        
+        def finish(k, result):
+            df, stats = result
+            if stats is not None:
+                prof.merge(stats)
+            if shard_dir is not None:
+                with prof.phase('io'):
+                    tmp = shard(k).with_suffix('.tmp')
+                    df.to_pickle(tmp)
+                    tmp.replace(shard(k))  # Atomic, so a shard is never partial
+            frames[k] = df
+            drain()
+        
+        drain()
+        
+        args = lambda k: ([(num, sys, self.system_seed(num)) for num, sys in chunks[k]],
+                          self.game, self.CCThreshold, self.matrix, self.cache,
+                          self.profiler is not None, self.strategy_dict)
+        if processes == 1:
+            for k in pending:
+                finish(k, _run_chunk(*args(k)))
+        else:
+            with ProcessPoolExecutor(max_workers=processes or None) as pool:
+                futures = {pool.submit(_run_chunk, *args(k)): k for k in pending}
+                for future in as_completed(futures):
+                    finish(futures[future], future.result())
+
+    def _run_batch(self, emit, flush, chunk_size, masks=True):
+        """
+        Runs the systems chunk_size at a time: every distinct team is played 
+        once (its results do not depend on the system when all tournaments 
+        use SEED) and the rows of a whole chunk are built with array 
+        reductions instead of one PdSystem per system; the teams of the rows
+        are team masks, or System IDs if masks is False
         """
         
-        first = True
+        if len({tuple(map(len, sys)) for sys in self.sys_tuple}) > 1:
+            # Systems with different team sizes have different columns
+            self._run_serial(emit, flush, chunk_size)
+            return
+        
+        prof = self._profiler
+        names = list(self.strategy_dict)
+        team_rows = dict()
+        def team_row(team):
+            key = tuple(team)
+            if key not in team_rows:
+                player_list = [self.strategy_dict[i] for i in team]
+                data = PdTournament(player_list, self.game, self.CCThreshold, 
+                                    matrix=self.matrix, cache=self.cache, 
+                                    profiler=self.profiler).data
+                numeric = [num for num, c in enumerate(data.columns)
+                           if c != 'Tournament_Members' and not _is_text_column(c)]
+                team_rows[key] = (data.columns[numeric], data.iloc[0, numeric].to_numpy(float),
+                                  team_metrics(data))
+            return team_rows[key]
+        
+        # The rows are built compact (team masks or System IDs, no names) 
+        # and only expanded for the sink
+        list_len = len(self.sys_tuple)
+        for start in range(0, list_len, chunk_size):
+            chunk = self.sys_tuple[start:start+chunk_size]
+            index = [1] * len(chunk)  # Same index as the rows of PdSystem.data
+            rows = [[team_row(team) for team in sys] for sys in chunk]
+            
+            with prof.phase('aggregate'):
+                metrics = np.array([[metric for _, _, metric in sys] for sys in rows])
+                sys_metrics = system_metrics(metrics, self.CCThreshold)
+            with prof.phase('frames'):
+                if masks:
+                    teams = system_masks(chunk, names)
+                    frames = [pd.DataFrame(teams, columns=[f'Team{num} Mask' for num in 
+                                                           range(1, teams.shape[1]+1)], 
+                                           index=index)]
+                else:
+                    frames = [pd.DataFrame({'System ID': [system_id(sys, names) for sys in chunk]},
+                                           index=index)]
+                frames.append(pd.DataFrame(sys_metrics, index=index))
+                for num in range(len(rows[0])):
+                    columns = team_columns(f'Team{num+1}', rows[0][num][0])
+                    frames.append(pd.DataFrame(np.array([sys[num][1] for sys in rows]), 
+                                               columns=columns, index=index))
+                df = pd.concat(frames, axis=1)
+            prof.count('systems', len(chunk))
+            emit(df)
+            flush()  # Checkpoint
+            if ((start + len(chunk)) % 1000 == 0):
+                _print_progress(start + len(chunk), list_len)
+
+    def _run_serial(self, emit, flush, chunk_size):
+        """ Runs every system in this process, in order """
+        
         list_len = len(self.sys_tuple)
         #proc_list = []
         for num, sys in enumerate(self.sys_tuple, 1):
             # print('partition list: ', f'{sys!r}') # this
 
-            sys_n = PdSystem(sys, self.game, self.CCThreshold)
+            sys_n = PdSystem(sys, self.game, self.CCThreshold, self.matrix, self.cache,
+                             seed=self.system_seed(self.first + num - 1), 
+                             profiler=self.profiler, strategy_dict=self.strategy_dict)
             sys_n.compute_data()
-
-            if first:
-                exp_df = sys_n.data
-                first = False
-            else:
-                exp_df = pd.concat([exp_df, sys_n.data])
+            emit(sys_n.data)
             # print('***Processing number ', num) # this
-            if (num % 100 == 0):
-                self.data = exp_df
-                ###### Change file_name string below when changing num of 
-                ###### strategies (n) used or the number of players in a team 
-                ###### (k)
-                self.save_data('Data/Desk/',f'Comb_Sys1to{num}_12strat_4plx3partitions')
-                # print(f'System {num} completed and batch saved!') # this
+            if (num % chunk_size == 0):
+                flush()  # Checkpoint
             if (num % 1000 == 0):
-                print(f'***Reached system {num}. Progress: ', num/list_len, '%') # this
-        self.data = exp_df
+                _print_progress(num, list_len)
 
     def return_data(self):
         """ 
@@ -617,9 +1131,140 @@ class PdExp:
         # Make directory if it does not exist
         Path(path_to_directory).mkdir(parents=True, exist_ok=True)
         # print("I am saving the data") # this
-        if self.game is None:
-            R,P,S,T = game.Game().RPST()
-        else:
-            R,P,S,T = self.game.RPST()
-        # print("The file name is: ", path_to_directory+f'{descrip_name}_RPST_{R!r}_{P!r}_{S!r}_{T!r}.csv') # this
-        self.data.to_csv(path_to_directory+f'{descrip_name}_RPST_{R!r}_{P!r}_{S!r}_{T!r}.csv')
+        with self._profiler.phase('io'):
+            expand_frame(self.data, self.strategy_dict).to_csv(self._file_name(path_to_directory, descrip_name))
+
+    def _file_name(self, path_to_directory, descrip_name):
+        """ Returns the csv file name of the experiment data """
+        
+        return path_to_directory+f'{descrip_name}_RPST_{rpst_label(self.game)}.csv'
+
+def _print_progress(num, total):
+    ''' Prints the number of finished systems and their percentage of total '''
+    
+    print(f'***Reached system {num}. Progress: {100 * num / total:.1f}%') # this
+
+def _run_chunk(numbered_systems, game_type, t, matrix, cache, profile=False, 
+               strategy_dict=None):
+    '''
+    Runs a chunk of systems (in a worker process) and returns their data
+    
+        Parameters:
+            numbered_systems (list): (system number, system, seed) triples
+            game_type (object): axelrod.game
+            t (list): CC-fraction thresholds
+            matrix (object): match_matrix.MatchMatrix or None
+            cache (object): cache.TournamentCache or None
+            profile (bool): time the phases of the chunk
+            strategy_dict (dict): players of the teams by name (default is 
+                None, settings.CD_strategy_dict)
+        
+        Returns:
+            (tuple): one row per system, in the given order, as a 
+                pandas.dataframe and the profiler stats (None unless 
+                profile is set)
+    '''
+    
+    strategy_dict = strategy_dict or settings.CD_strategy_dict
+    if matrix is not None:
+        matrix.rebind(strategy_dict)
+    profiler = Profiler() if profile else None
+    frames = []
+    for num, sys, seed in numbered_systems:
+        sys_n = PdSystem(sys, game_type, t, matrix, cache, seed=seed, processes=None,
+                         profiler=profiler, strategy_dict=strategy_dict)
+        sys_n.compute_data()
+        frames.append(sys_n.data)
+    return pd.concat(frames), profiler and profiler.stats()
+
+def multi_game_tournaments(strategy_list, games, t = [0.5], reps=1, analytic=False):
+    '''
+    Plays a tournament once and scores it under each of the given games
+    
+        Parameters:
+            strategy_list (list): players of the tournament
+            games (list): axelrod.game objects (None for the classic PD 
+                setting)
+            t (list): CC-fraction thresholds
+            reps (int): number of times to repeat the tournament
+            analytic (bool): use exact expectations instead of playing 
+                (see markov.MarkovMatrix)
+        
+        Returns:
+            (list): one PdTournament per game, in the order of games
+    '''
+    
+    strategy_dict = dict(enumerate(strategy_list))
+    if analytic:
+        matrix = MarkovMatrix(strategy_dict)
+    else:
+        matrix = MatchMatrix(strategy_dict, reps=reps)
+    return [PdTournament(strategy_list, g, t, matrix=m) 
+            for g, m in zip(games, matrix.for_games(games))]
+
+def multi_game_experiments(tuple_of_systems, games, t = [0.5], analytic=False):
+    '''
+    Builds one experiment per game that share a single set of matches: every
+    pairing of settings.CD_strategy_dict is played once and only the scoring 
+    differs between the experiments. Call run_experiments on each of them.
+    
+        Parameters:
+            tuple_of_systems (tuple): systems, as passed to PdExp
+            games (list): axelrod.game objects (None for the classic PD 
+                setting)
+            t (list): CC-fraction thresholds
+            analytic (bool): use exact expectations instead of playing 
+                (see markov.MarkovMatrix)
+        
+        Returns:
+            (list): one PdExp per game, in the order of games
+    '''
+    
+    if analytic:
+        matrix = MarkovMatrix(settings.CD_strategy_dict)
+    else:
+        matrix = MatchMatrix(settings.CD_strategy_dict)
+    experiments = []
+    for g, m in zip(games, matrix.for_games(games)):
+        exp = PdExp(tuple_of_systems, t, game_type=g, precompute=True)
+        exp.matrix = m
+        experiments.append(exp)
+    return experiments
+
+def roster_tournaments(names, roster_size, game_type=None, t = [0.5], reps=1,
+                       analytic=False, seed=SEED):
+    '''
+    Tournament rows of every multiset roster (e.g. "Alternator,Alternator,
+    Anti Tit For Tat") of roster_size players drawn from names, as in 
+    Data/tournament_data_sample_size_3.csv
+    
+    Each distinct pair of strategies (including a strategy and its copy) is
+    played once, and the rosters' metrics weight every pairing by the 
+    multiplicities of its strategies (see MatchMatrix.tournament_metrics), 
+    so repeated strategies cost nothing extra. Copies of a strategy thus 
+    share their matches, unlike in an axelrod tournament of the roster.
+    
+        Parameters:
+            names (list): distinct keys of settings.CD_strategy_dict
+            roster_size (int): number of players of a roster
+            game_type (object): axelrod.game (None for the classic PD 
+                setting)
+            t (list): CC-fraction thresholds
+            reps (int): number of times to repeat each match
+            analytic (bool): use exact expectations instead of playing 
+                (see markov.MarkovMatrix)
+            seed (int): seed of the pairwise matches
+        
+        Returns:
+            (pandas.dataframe): one PdTournament row per roster, in the 
+                order of helper_funcs.rosters
+    '''
+    
+    strategy_dict = {n: settings.CD_strategy_dict[n] for n in names}
+    if analytic:
+        matrix = MarkovMatrix(strategy_dict, game_type)
+    else:
+        matrix = MatchMatrix(strategy_dict, game_type, reps=reps, seed=seed)
+    frames = [PdTournament([strategy_dict[n] for n in roster], game_type, t, matrix=matrix).data
+              for roster in rosters(names, roster_size)]
+    return pd.concat(frames, ignore_index=True)
@@ -24,7 +24,12 @@ import copy
 from itertools import zip_longest
 import numpy as np
 import pandas as pd
-from code.pd_exp import grouper, avg_normalised_state
+from code.pd_exp import grouper, avg_normalised_state, state_array, rpst_label
+from code.markov import MarkovMatrix
+from code.batch_sim import BatchMatrix
+from code.interactions import convert_interactions, PackedTournament
+from code.accumulators import RunningStats, RatioStats, TournamentStats
+from code.match_matrix import cc_metrics, payoff_vector
 
 class PdTournament:
     """
@@ -47,31 +52,57 @@ class PdTournament:
         placeholder for individual player results
     results : (object)
         output of tournament.play()
+    stats : accumulators.TournamentStats (object)
+        running statistics (including score quantiles) of runs with a batch
         
     Methods
     -------
-    run_tournament(reps, filename=None):
+    run_tournament(reps, filename=None, interactions=None, batch=None, keep_reps=True):
         Executes a round-robin tournament with all listed players. Results are 
         computed and stored in data variable as a pandas dataframe.
+    run_analytic():
+        Computes the exact expectation of the tournament results for 
+        memory-one players, in place of run_tournament
+    run_batched(reps, seed=1, batch=None, keep_reps=True):
+        Samples the tournament results for memory-one players with the 
+        vectorized simulator, in place of run_tournament
+    run_adaptive(max_reps, target=0.01, batch=50, confidence=0.95, seed=1, keep_reps=True):
+        Samples batches of repetitions until the confidence intervals of the
+        tournament averages are narrower than target
     save_data(file_name):
         Saves tournament data as a csv file
     """
-    def __init__(self, strategy_list, game=None, reps=1, filename=None):
+    def __init__(self, strategy_list, game=None, reps=1, filename=None, analytic=False,
+                 batched=False, seed=1, processes=0, interactions=None, adaptive=False,
+                 target=0.01, batch=None, keep_reps=True, confidence=0.95):
         self.player_list = strategy_list
+        self.seed = seed
+        self.processes = processes  # 0 for all cores, None to play in this process
         self.names = ','.join(sorted([n.name for n in strategy_list]))
         self.game = game
         self.results = None
+        self.stats = None  # accumulators.TournamentStats of streamed runs
         # If reps=1, then data will be one row. If reps >1, then data will be multiple rows
-        if filename:
-            self.data, self.agg_data = self.run_tournament(reps, filename)  # df for tournament reps (individual player norm scores) and 
+        if analytic:
+            self.data, self.agg_data = self.run_analytic()
+        elif batched:
+            self.data, self.agg_data = self.run_batched(reps, seed, batch, keep_reps)
+        elif adaptive:  # reps is the cap on repetitions, batch the reps between checks
+            batch = 50 if batch is None else batch
+            self.data, self.agg_data = self.run_adaptive(reps, target, batch, confidence,
+                                                         seed, keep_reps)
+        elif filename or interactions:
+            self.data, self.agg_data = self.run_tournament(reps, filename, interactions)  # df for tournament reps (individual player norm scores) and 
         else:                                                      # df for aggregate data (player averages and tournament min, averages, and cc Dist)
-            self.data, self.agg_data = self.run_tournament(reps)
+            self.data, self.agg_data = self.run_tournament(reps, batch=batch, 
+                                                           keep_reps=keep_reps)
          
 
     def __repr__(self):
         return self.names
 
-    def run_tournament(self, reps, filename=None):
+    def run_tournament(self, reps, filename=None, interactions=None, batch=None,
+                       keep_reps=True):
         """
         Executes a round-robin tournament with all listed players. 
         
@@ -83,6 +114,21 @@ class PdTournament:
             number of times to run the same tournament
         filename : str
             filename to use to save raw tournament data (default is None)
+        interactions : str
+            file to save the match actions to in the packed format of 
+            interactions.InteractionWriter. Without filename, each match is 
+            packed as it is played (interactions.PackedTournament), so 
+            neither axelrod's csv nor a ResultSet is built and results is 
+            None; with filename, the csv is written and then packed 
+            (default is None)
+        batch : int
+            if given, the repetitions are played as tournaments of batch 
+            repetitions (seeds seed, seed + 1, ...) whose results are folded 
+            into running statistics, so memory does not grow with reps; 
+            results then only holds the last batch (default is None)
+        keep_reps : bool
+            with batch, also build the per-repetition player dataframe; with 
+            False, data is None (default is True)
             
         Returns
         -------
@@ -91,28 +137,119 @@ class PdTournament:
         agg_data : pandas.dataframe (object)
             dataframe that depicts aggregate tournament data and metrics
         """
+        if batch is not None:
+            if filename or interactions:
+                raise ValueError('batched repetitions cannot be saved to one file')
+            return self._run_stream(reps, batch, keep_reps)
+        
         # Instantiate tournament object
         roster = self.player_list
         print('Instantiating tournament object with these players: ', self.names)
+        if interactions and not filename:
+            return self._run_packed(reps, interactions)
         tourn = Tournament(players=roster,
                                     game=self.game,
                                     prob_end=0.1,
                                     turns=30,
                                     repetitions=reps,
-                                    seed=1)
+                                    seed=self.seed)
 
         if filename:
-            results = tourn.play(processes=0, filename=filename)
+            results = tourn.play(processes=self.processes, filename=filename)
         else:
-            results = tourn.play(processes=0)
+            results = tourn.play(processes=self.processes)
+        if interactions:
+            convert_interactions(filename, interactions)
         
         self.results = results
         
         # Collect Group Outcome Metrics
         normal_scores = results.normalised_scores
+        tourn_avg_norm_cc_distribution = avg_normalised_state(results, (Action.C,Action.C))
+        return self._build_frames(normal_scores, tourn_avg_norm_cc_distribution)
+
+    def _run_packed(self, reps, interactions):
+        """
+        Plays the tournament straight into the packed interactions file and
+        builds the frames from the state counts of its matches
+        """
+        tourn = PackedTournament(players=self.player_list,
+                                 game=self.game,
+                                 prob_end=0.1,
+                                 turns=30,
+                                 repetitions=reps,
+                                 seed=self.seed)
+        tourn.play_packed(interactions, processes=self.processes)
+        self.results = None
+        
+        # Per-turn scores against every opponent, as in ResultSet
+        n = len(self.player_list)
+        per_turn = tourn.states @ payoff_vector(self.game) / tourn.match_lengths
+        off_diag = ~np.eye(n, dtype=bool)
+        normal_scores = (per_turn * off_diag).sum(axis=2).T / (n - 1)
+        cc_distribution = cc_metrics(tourn.states.sum(axis=0), 1, [])[0]
+        return self._build_frames(normal_scores, cc_distribution)
+
+    def _run_stream(self, reps, batch, keep_reps):
+        """ Plays the repetitions as tournaments of batch repetitions """
+        
+        roster = self.player_list
+        stats = self._new_stats()
+        kept = []
+        for k, start in enumerate(range(0, reps, batch)):
+            tourn = Tournament(players=roster,
+                                        game=self.game,
+                                        prob_end=0.1,
+                                        turns=30,
+                                        repetitions=min(batch, reps - start),
+                                        seed=self.seed + k)
+            self.results = tourn.play(processes=self.processes)
+            normal_scores = np.array(self.results.normalised_scores)
+            stats.update(normal_scores, state_array(self.results))
+            if keep_reps:
+                kept.append(normal_scores)
+        return self._stream_frames(stats, kept)
+
+    def _new_stats(self):
+        """ Returns empty running statistics for the roster and game """
+        
+        payoffs = (self.game or game.Game()).RPST()
+        self.stats = TournamentStats(len(self.player_list), (min(payoffs), max(payoffs)))
+        return self.stats
+
+    def _stream_frames(self, stats, kept):
+        """
+        Builds the dataframes of _build_frames from running statistics (and 
+        the kept (players, batch) score arrays, if any)
+        """
+        reps = stats.scores.count
+        agg_data_dict = {}
+        for num, avg, minimum in zip(range(1,len(self.player_list)+1), stats.scores.mean, 
+                                     stats.scores.minimum):
+            agg_data_dict[f'P{num}_Avg_Norm_Score'] = [avg]
+            agg_data_dict[f'P{num}_Min_Norm_Score'] = [minimum]
+        agg_data_dict['Avg_of_PL_Scores'] = [np.average(stats.scores.mean)]
+        agg_data_dict['Min_of_PL_Scores'] = [np.amin(stats.scores.minimum)]
+        agg_data_dict['Avg_CC_Distribution'] = [cc_metrics(stats.states, 1, [])[0]]
+        agg_data = pd.DataFrame(agg_data_dict, index=[reps])
+        
+        dataf = None
+        if kept:
+            pl_dict = {f'P{num}_Norm_Score' : scores 
+                       for num, scores in enumerate(np.hstack(kept), 1)}
+            dataf = pd.DataFrame(pl_dict, index=range(1, reps+1))
+        return dataf, agg_data
+
+    def _build_frames(self, normal_scores, tourn_avg_norm_cc_distribution):
+        """
+        Builds the per-repetition player dataframe and the aggregate dataframe
+        from the (players, reps) normalised scores and the tournament CC 
+        distribution
+        """
+        roster = self.player_list
+        reps = len(normal_scores[0])
         pl_avg_norm_score = np.average(normal_scores, axis=1)
         pl_min_norm_score = np.amin(normal_scores, axis=1)
-        tourn_avg_norm_cc_distribution = avg_normalised_state(results, (Action.C,Action.C))
         
         # List manipulation to identify individual players in separate columns
         pl_list =[]
@@ -140,13 +277,144 @@ class PdTournament:
         #self.data = data_row
         return dataf, agg_data
 
+    def run_analytic(self):
+        """
+        Computes the exact expectation of the run_tournament results for a
+        roster of axelrod.MemoryOnePlayer objects.
+        
+        The expected tournament is reported as a single repetition, so data
+        has one row and the per-player and tournament minimums are taken over
+        expected scores (the limit of infinitely many repetitions).
+        
+        Returns
+        -------
+        dataf : pandas.dataframe (object)
+            dataframe that depicts expected individual player scores
+        agg_data : pandas.dataframe (object)
+            dataframe that depicts aggregate tournament data and metrics
+        """
+        roster = self.player_list
+        matrix = MarkovMatrix(dict(enumerate(roster)), self.game)
+        normal_scores, metrics = matrix.tournament_metrics(roster, [])
+        return self._build_frames(normal_scores, metrics[3])
+
+    def run_batched(self, reps, seed=1, batch=None, keep_reps=True):
+        """
+        Samples the run_tournament results for a roster of 
+        axelrod.MemoryOnePlayer objects with the vectorized simulator, which
+        plays every match of every repetition at once.
+        
+        Parameters
+        ----------
+        reps : int
+            number of times to run the same tournament
+        seed : int
+            seed of the simulator's random draws (default is 1)
+        batch : int
+            if given, repetitions are simulated batch at a time (batch k 
+            drawn from (seed, k)) into running statistics, so memory does 
+            not grow with reps (default is None, all at once)
+        keep_reps : bool
+            with batch, also build the per-repetition player dataframe; with 
+            False, data is None (default is True)
+            
+        Returns
+        -------
+        dataf : pandas.dataframe (object)
+            dataframe that depicts individual player data and metrics
+        agg_data : pandas.dataframe (object)
+            dataframe that depicts aggregate tournament data and metrics
+        """
+        roster = self.player_list
+        if batch is None:
+            matrix = BatchMatrix(dict(enumerate(roster)), self.game, reps=reps, seed=seed)
+            normal_scores, metrics = matrix.tournament_metrics(roster, [])
+            return self._build_frames(normal_scores, metrics[3])
+        
+        stats = self._new_stats()
+        kept = []
+        for k, start in enumerate(range(0, reps, batch)):
+            matrix = BatchMatrix(dict(enumerate(roster)), self.game, 
+                                 reps=min(batch, reps - start), seed=[seed, k])
+            normal_scores, _ = matrix.tournament_metrics(roster, [])
+            stats.update(normal_scores, matrix.states.sum(axis=0))
+            if keep_reps:
+                kept.append(normal_scores)
+        return self._stream_frames(stats, kept)
+
+    def run_adaptive(self, max_reps, target=0.01, batch=50, confidence=0.95, seed=1,
+                     keep_reps=True):
+        """
+        Samples the run_tournament results for a roster of 
+        axelrod.MemoryOnePlayer objects in batches of repetitions (with the 
+        vectorized simulator) until the confidence intervals of 
+        Avg_of_PL_Scores and Avg_CC_Distribution are narrow enough.
+        
+        The score interval comes from the running mean and variance of each 
+        repetition's average player score. Avg_CC_Distribution is a mean of 
+        ratios of sums (each pairing's CC turns over its turns, summed over 
+        repetitions), so its interval uses the delta-method variance of that 
+        same statistic (accumulators.RatioStats). agg_data also reports the 
+        half-widths reached, and its index is the number of repetitions 
+        used.
+        
+        Parameters
+        ----------
+        max_reps : int
+            cap on the number of repetitions
+        target : float
+            half-width below which both intervals must fall (default is 0.01)
+        batch : int
+            repetitions simulated between checks (default is 50)
+        confidence : float
+            confidence level of the intervals (default is 0.95)
+        seed : int
+            seed of the simulator; batch k is drawn from (seed, k) (default 
+            is 1)
+        keep_reps : bool
+            also build the per-repetition player dataframe; with False, data
+            is None (default is True)
+            
+        Returns
+        -------
+        dataf : pandas.dataframe (object)
+            dataframe that depicts individual player data and metrics
+        agg_data : pandas.dataframe (object)
+            dataframe that depicts aggregate tournament data and metrics
+        """
+        roster = self.player_list
+        # CC counts and match lengths are symmetric, so each pairing once
+        first, second = np.triu_indices(len(roster), 1)
+        stats = self._new_stats()
+        score_stats, cc_stats = RunningStats(), RatioStats(len(first))
+        kept = []
+        k = 0
+        while score_stats.count < max_reps:
+            size = min(batch, max_reps - score_stats.count)
+            matrix = BatchMatrix(dict(enumerate(roster)), self.game, reps=size, 
+                                 seed=[seed, k])
+            normal_scores, _ = matrix.tournament_metrics(roster, [])
+            stats.update(normal_scores, matrix.states.sum(axis=0))
+            if keep_reps:
+                kept.append(normal_scores)
+            score_stats.update(normal_scores.mean(axis=0))
+            pairs = matrix.states[:, first, second]
+            cc_stats.update(pairs[..., 0], pairs.sum(axis=-1))
+            k += 1
+            if max(score_stats.half_width(confidence), 
+                   cc_stats.half_width(confidence)) <= target:
+                break
+        
+        dataf, agg_data = self._stream_frames(stats, kept)
+        agg_data['Avg_of_PL_Scores_Half_Width'] = score_stats.half_width(confidence)
+        agg_data['Avg_CC_Distribution_Half_Width'] = cc_stats.half_width(confidence)
+        return dataf, agg_data
+
     def save_data(self, file_name):
         """ Method to save tournament data as a csv file """
         
-        if self.game is None:
-            R,P,S,T = game.Game().RPST()
-        else:
-            R,P,S,T = self.game.RPST()
-        
-        self.data.to_csv(file_name+f'_gameRPST_{R!r}_{P!r}_{S!r}_{T!r}.csv', index=False)
+        if self.data is None:
+            raise ValueError('no per-repetition data to save (the tournament ran with '
+                             'keep_reps=False); agg_data holds its summary')
+        self.data.to_csv(file_name+f'_gameRPST_{rpst_label(self.game)}.csv', index=False)
 
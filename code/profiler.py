@@ -0,0 +1,342 @@
+'''
+Profiler: Phase Timers, Counters and Hooks
+==========================================
+
+Measure where an experiment spends its time. Code is split into named
+phases (in pd_exp: 'play' for axelrod tournaments and match matrices,
+'metrics' for state counts and tournament metrics, 'aggregate' for system
+metrics, 'frames' for building pandas rows and 'io' for sinks and files),
+each timed with a wall clock and counted, and events such as played or
+cached tournaments are counted. Hooks attach cProfile or tracemalloc to
+some or all phases. report returns everything as a dict and save writes
+it as JSON.
+
+Phase times include the phases nested inside them; unattributed_seconds
+in the report is the wall time spent outside every outermost phase.
+
+Classes:
+
+    Profiler
+        Accumulates the time and calls of named phases and counters
+    NullProfiler
+        A profiler that records nothing, used when profiling is off
+    CProfileHook
+        Runs cProfile during phases and reports their top functions
+    TracemallocHook
+        Traces allocations during phases and reports their peak memory
+
+'''
+import cProfile
+import json
+import platform
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+
+class Profiler:
+    """
+    A class to represent the phase timers and counters of a run.
+
+    ...
+
+    Attributes
+    ----------
+    seconds : dict
+        maps phase names to their total wall time
+    calls : dict
+        maps phase names to their number of calls
+    counters : dict
+        maps counter names to their totals
+    hooks : list
+        objects with start(phase), stop(phase) and report() methods (e.g.
+        CProfileHook, TracemallocHook)
+
+    Methods
+    -------
+    phase(name):
+        Context manager that times (and hooks) one call of a phase
+    count(name, n=1):
+        Adds n to a counter
+    merge(stats):
+        Adds the seconds, calls and counters of another profiler's stats
+    stats():
+        Returns the seconds, calls and counters (e.g. to send from a worker)
+    report():
+        Returns the report as a dict
+    save(path):
+        Writes the report as a JSON file
+    """
+
+    def __init__(self, hooks=None):
+        """
+        Parameters
+        ----------
+        hooks : list
+            hooks run at the start and stop of every phase (default is None)
+        """
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.hooks = list(hooks or [])
+        self._start = time.perf_counter()
+        self._depth = 0
+        self._outer = 0.0
+
+    @contextmanager
+    def phase(self, name):
+        """ Times one call of the phase name, running the hooks around it """
+
+        for hook in self.hooks:
+            hook.start(name)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._depth -= 1
+            self.seconds[name] += elapsed
+            self.calls[name] += 1
+            if not self._depth:
+                self._outer += elapsed
+            for hook in reversed(self.hooks):
+                hook.stop(name)
+
+    def count(self, name, n=1):
+        """ Adds n to the counter name """
+
+        self.counters[name] += n
+
+    def stats(self):
+        """ Returns the seconds, calls and counters as plain dicts """
+
+        return {'seconds': dict(self.seconds), 'calls': dict(self.calls),
+                'counters': dict(self.counters), 'outer': self._outer}
+
+    def merge(self, stats):
+        """
+        Adds the stats of another profiler (e.g. of a worker process); its
+        phases ran in parallel, so they do not count towards the wall time
+        """
+        for name, seconds in stats['seconds'].items():
+            self.seconds[name] += seconds
+        for name, calls in stats['calls'].items():
+            self.calls[name] += calls
+        for name, n in stats['counters'].items():
+            self.counters[name] += n
+
+    def report(self):
+        '''
+        Returns the report of the run so far
+
+            Returns:
+                (dict): 'meta' (python, platform, time), 'wall_seconds',
+                    'unattributed_seconds', 'phases' (seconds, calls and
+                    mean_ms of each phase, slowest first), 'counters' and
+                    the report of each hook under its name
+        '''
+
+        wall = time.perf_counter() - self._start
+        phases = {name: {'seconds': seconds, 'calls': self.calls[name],
+                         'mean_ms': 1000 * seconds / self.calls[name]}
+                  for name, seconds in sorted(self.seconds.items(), key=lambda x: -x[1])}
+        data = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                         'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+                'wall_seconds': wall,
+                'unattributed_seconds': max(wall - self._outer, 0.0),
+                'phases': phases,
+                'counters': dict(self.counters)}
+        for hook in self.hooks:
+            data[hook.name] = hook.report()
+        return data
+
+    def save(self, path):
+        """ Writes the report as a JSON file """
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+class NullProfiler:
+    """
+    A class to represent a profiler that records nothing.
+
+    ...
+
+    It has the phase and count methods of Profiler, so instrumented code
+    runs unchanged (at the cost of an empty context manager per phase) when
+    profiling is off.
+    """
+
+    _context = nullcontext()
+
+    def phase(self, name):
+        return self._context
+
+    def count(self, name, n=1):
+        pass
+
+# Shared by everything that is not given a profiler
+DISABLED = NullProfiler()
+
+class CProfileHook:
+    """
+    A class to represent cProfile runs of some or all phases.
+
+    ...
+
+    Each phase has its own cProfile.Profile. Only one profile can run at a
+    time, so while a nested phase runs, the profile of its outer phase is
+    paused: functions are attributed to the innermost profiled phase.
+
+    Attributes
+    ----------
+    phases : set
+        names of the profiled phases (None for all)
+    limit : int
+        number of functions reported per phase
+    profiles : dict
+        maps phase names to their cProfile.Profile
+
+    Methods
+    -------
+    start(phase):
+        Starts (or resumes) the profile of a phase
+    stop(phase):
+        Pauses the profile of a phase
+    report():
+        Returns the top functions of each phase by cumulative time
+    """
+
+    name = 'cprofile'
+
+    def __init__(self, phases=None, limit=20):
+        """
+        Parameters
+        ----------
+        phases : list
+            names of the profiled phases (default is None, all phases)
+        limit : int
+            number of functions reported per phase (default is 20)
+        """
+        self.phases = None if phases is None else set(phases)
+        self.limit = limit
+        self.profiles = dict()
+        self._stack = []
+
+    def _profiled(self, phase):
+        return self.phases is None or phase in self.phases
+
+    def start(self, phase):
+        if not self._profiled(phase):
+            return
+        if self._stack:
+            self.profiles[self._stack[-1]].disable()
+        self._stack.append(phase)
+        self.profiles.setdefault(phase, cProfile.Profile()).enable()
+
+    def stop(self, phase):
+        if not self._profiled(phase):
+            return
+        self.profiles[self._stack.pop()].disable()
+        if self._stack:
+            self.profiles[self._stack[-1]].enable()
+
+    def report(self):
+        '''
+        Returns the top functions of each profiled phase
+
+            Returns:
+                (dict): maps phase names to lists of dicts with function,
+                    calls, tottime and cumtime, by decreasing cumtime
+        '''
+
+        data = dict()
+        for phase, profile in self.profiles.items():
+            stats = pstats.Stats(profile).stats
+            rows = sorted(stats.items(), key=lambda x: -x[1][3])[:self.limit]
+            data[phase] = [{'function': f'{file}:{line}({func})', 'calls': calls,
+                            'tottime': tottime, 'cumtime': cumtime}
+                           for (file, line, func), (_, calls, tottime, cumtime, _) in rows]
+        return data
+
+class TracemallocHook:
+    """
+    A class to represent the allocation peaks of some or all phases.
+
+    ...
+
+    tracemalloc is started with the first traced phase (if it is not
+    already running) and slows every allocation down while it runs. The
+    peak of a phase includes the peaks of the phases nested inside it.
+
+    Attributes
+    ----------
+    phases : set
+        names of the traced phases (None for all)
+    peak : dict
+        maps phase names to the largest growth of traced memory above its
+        start, in bytes
+    net : dict
+        maps phase names to the total memory still allocated at its stops,
+        in bytes
+
+    Methods
+    -------
+    start(phase):
+        Records the traced memory at the start of a phase
+    stop(phase):
+        Records the peak and net memory of a phase
+    report():
+        Returns the peak and net memory of each phase in MB
+    """
+
+    name = 'tracemalloc'
+
+    def __init__(self, phases=None):
+        """
+        Parameters
+        ----------
+        phases : list
+            names of the traced phases (default is None, all phases)
+        """
+        self.phases = None if phases is None else set(phases)
+        self.peak = defaultdict(int)
+        self.net = defaultdict(int)
+        self._stack = []
+
+    def _traced(self, phase):
+        return self.phases is None or phase in self.phases
+
+    def start(self, phase):
+        if not self._traced(phase):
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # Keep the outer phase's peak so far before resetting it
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._stack.append([current, current])
+
+    def stop(self, phase):
+        if not self._traced(phase):
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        start, outer_peak = self._stack.pop()
+        peak = max(peak, outer_peak)
+        self.peak[phase] = max(self.peak[phase], peak - start)
+        self.net[phase] += current - start
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def report(self):
+        ''' Returns a dict of phase names to their peak_mb and net_mb '''
+
+        return {phase: {'peak_mb': self.peak[phase] / 2**20, 'net_mb': self.net[phase] / 2**20}
+                for phase in self.peak}
@@ -0,0 +1,112 @@
+'''
+Registry: Lazily Created Strategies
+===================================
+
+Map strategy names to players that are only created when they are looked up,
+so that importing settings does not import axelrod or build any player.
+
+A strategy is given by a compact spec: a memory-one tuple
+(P(C|CC), P(C|CD), P(C|DC), P(C|DD)) with an initial move ('C', 'D', 1, 0 or
+an axelrod Action), or a callable (e.g. an axelrod strategy class) that
+returns a player.
+
+Classes:
+
+    StrategyRegistry
+        Read-only mapping of names to players created on first lookup
+
+Functions:
+
+    make_player(object) -> axelrod.Player
+        Creates the player described by a spec
+
+'''
+from collections.abc import Mapping
+
+
+def make_player(spec):
+    '''
+    Creates the player described by a spec
+
+        Parameters:
+            spec (object): (memory-one tuple, initial move) or a callable
+                that returns a player
+
+        Returns:
+            (axelrod.Player): a new player
+    '''
+
+    if callable(spec):
+        return spec()
+    import axelrod as axl
+    vector, initial = spec
+    if not isinstance(initial, axl.Action):
+        initial = axl.Action.C if initial in ('C', 1, True) else axl.Action.D
+    return axl.MemoryOnePlayer(tuple(vector), initial)
+
+class StrategyRegistry(Mapping):
+    """
+    A class to represent a mapping of strategy names to lazily created
+    players.
+
+    ...
+
+    Each player is created on its first lookup and the same object is
+    returned afterwards, since MatchMatrix finds players by identity.
+    Iterating, len and membership only read the names. Registries made by
+    subset share their parent's players.
+
+    Attributes
+    ----------
+    specs : dict
+        maps strategy names to specs, in registration order
+
+    Methods
+    -------
+    register(name, spec):
+        Adds a strategy (or replaces one not yet created)
+    subset(names):
+        Returns a registry of some of the names sharing the same players
+    """
+
+    def __init__(self, specs=None):
+        """
+        Parameters
+        ----------
+        specs : dict
+            maps strategy names to specs (default is None, an empty
+            registry)
+        """
+        self.specs = dict(specs or {})
+        self._players = dict()
+
+    def __getitem__(self, name):
+        if name not in self._players:
+            self._players[name] = make_player(self.specs[name])
+        return self._players[name]
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def __repr__(self):
+        return f'StrategyRegistry({list(self.specs)})'
+
+    def register(self, name, spec):
+        """ Adds a strategy (or replaces one that has not been created yet) """
+
+        if name in self._players:
+            raise ValueError(f'{name!r} has already been created')
+        self.specs[name] = spec
+
+    def subset(self, names):
+        """ Returns a registry of the given names that shares these players """
+
+        registry = StrategyRegistry({n: self.specs[n] for n in names})
+        registry._players = self._players
+        return registry
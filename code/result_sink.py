@@ -0,0 +1,158 @@
+'''
+Result_sink: Append-Only Experiment Output
+==========================================
+
+Stream the rows of an experiment to a single file as they are produced.
+Rows are buffered and written in batches, so memory stays bounded by the
+batch size and a checkpoint is a flush of the buffer rather than a rewrite
+of everything computed so far.
+
+Classes:
+
+    ResultSink
+        Appends fixed-schema pandas rows to a csv or parquet file
+
+'''
+import pandas as pd
+from pathlib import Path
+
+
+def _unique_names(columns):
+    '''
+    Returns the column names with repeats suffixed as read_csv does
+    (Player1, Player1.1, ...), since parquet needs unique names
+    '''
+    
+    seen = dict()
+    names = []
+    for name in columns:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(name if count == 0 else f'{name}.{count}')
+    return names
+
+class ResultSink:
+    """
+    A class to represent an append-only file of experiment rows.
+
+    ...
+
+    The first rows written fix the columns; later rows must have the same
+    columns. A csv file is readable after every flush, while a parquet file
+    (one row group per batch, needs pyarrow) is only complete after close.
+    Either way, repeated column names (e.g. Player1 of every team) come back
+    suffixed as Player1.1, Player1.2, ...
+
+    Attributes
+    ----------
+    path : str
+        output file
+    fmt : str
+        'csv' or 'parquet'
+    batch_size : int
+        number of buffered rows that triggers a write
+    columns : list
+        column names fixed by the first rows
+    rows_written : int
+        number of rows already in the file
+
+    Methods
+    -------
+    append(df):
+        Buffers the rows of df and writes them once batch_size is reached
+    flush():
+        Writes the buffered rows to the file
+    close():
+        Flushes and closes the file
+    read():
+        Returns the rows of the file as one dataframe
+    """
+
+    def __init__(self, path, fmt='csv', batch_size=1000, overwrite=True):
+        """
+        Parameters
+        ----------
+        path : str
+            output file (its directory is created if needed)
+        fmt : str
+            'csv' or 'parquet' (default is 'csv')
+        batch_size : int
+            number of buffered rows that triggers a write (default is 1000)
+        overwrite : bool
+            replace an existing file; with False, rows are appended to an
+            existing csv file and its columns are kept (default is True)
+        """
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError(f'unknown format {fmt!r}')
+        self.path = str(path)
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.columns = None
+        self.rows_written = 0
+        self._buffer = []
+        self._buffered = 0
+        self._writer = None
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        if overwrite:
+            Path(self.path).unlink(missing_ok=True)
+        elif Path(self.path).exists():
+            if fmt == 'parquet':
+                raise ValueError('parquet files cannot be appended to once closed')
+            self.columns = list(pd.read_csv(self.path, index_col=0, nrows=0).columns)
+            self.rows_written = len(pd.read_csv(self.path, usecols=[0]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, df):
+        """ Buffers the rows of df and writes them once batch_size is reached """
+
+        if self.columns is None:
+            self.columns = list(df.columns)
+        elif _unique_names(df.columns) != _unique_names(self.columns):
+            raise ValueError(f'columns {list(df.columns)} do not match {self.columns}')
+        self._buffer.append(df)
+        self._buffered += len(df)
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Writes the buffered rows to the file """
+
+        if not self._buffer:
+            return
+        batch = pd.concat(self._buffer)
+        if self.fmt == 'csv':
+            batch.to_csv(self.path, mode='a', header=self.rows_written == 0)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            batch.columns = _unique_names(self.columns)
+            table = pa.Table.from_pandas(batch)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        self.rows_written += len(batch)
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self):
+        """ Flushes the buffered rows and closes the file """
+
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def read(self):
+        """ Returns the rows of the file (after flushing) as one dataframe """
+
+        if self.fmt == 'csv':
+            self.flush()
+            return pd.read_csv(self.path, index_col=0)
+        self.close()
+        return pd.read_parquet(self.path)
@@ -0,0 +1,394 @@
+'''
+Result_store: Indexed, Memory-Mapped Experiment Results
+=======================================================
+
+Keep the rows of many PdExp runs (e.g. the csv files of Data/Experiment2/)
+in one columnar store on disk and answer queries such as "all systems where
+Grim Trigger shares a team with Defector, sorted by SYS MIN Score" without
+parsing any csv.
+
+Every numeric column is a flat binary file read through a memory map. A
+system is stored as one 64-bit mask per team (see encoding), with bit k - 1
+set for the strategy of decimal code k (settings.name_dec_dict), and the
+game of each row as an index into a table of RPST payoffs. Secondary
+indexes (rows by strategy, by team and by game, in CSR form) are rebuilt
+by build_indexes.
+Text columns (Team1, Player1, ...) are not kept; System ID is rebuilt from
+the masks, with the codes of each team in ascending order, so the store
+answers set queries and does not keep the order of team lists. Systems
+whose teams repeat a strategy cannot be stored as masks and are rejected.
+
+Directory layout:
+
+    meta.json                  columns, dtypes, strategy names, games, rows
+    col_NNN.bin                one numeric column
+    teams.bin                  (rows, teams) uint64 team masks
+    game.bin                   (rows,) uint16 game index
+    index_*.npy                secondary indexes
+
+Classes:
+
+    ResultStore
+        Append-only columnar store of PdExp rows with secondary indexes
+
+Functions:
+
+    rpst_from_name(str) -> tuple
+        Returns the RPST payoffs encoded in a PdExp file name
+
+'''
+import json
+import re
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import settings
+from encoding import parse_system_id, format_system_id
+
+
+def rpst_from_name(file_name):
+    '''
+    Returns the RPST payoffs encoded in a PdExp file name (e.g.
+    "ClassicPD_7C1D_RPST_3_1_0_5.csv"), or None if there are none; payoffs
+    written as numpy reprs (e.g. "RPST_np.int64(3)_np.int64(1)_...") by
+    older versions are read as well
+    '''
+
+    number = r'(?:np\.\w+\()?([\d.]+?)\)?'
+    found = re.findall(rf'RPST_{number}_{number}_{number}_{number}(?=_|\.csv|$)',
+                       Path(file_name).name)
+    return tuple(float(x) for x in found[-1]) if found else None
+
+def _sorted_unique(rows):
+    ''' Returns the distinct values of an int array in ascending order '''
+
+    rows = np.sort(rows)
+    return rows[np.concatenate(([True], rows[1:] != rows[:-1]))] if len(rows) else rows
+
+class ResultStore:
+    """
+    A class to represent an append-only columnar store of experiment rows.
+
+    ...
+
+    The numeric columns, the team masks and the game of each row are memory
+    mapped, so opening a store costs nothing and a query only touches the
+    rows it returns. The first rows appended fix the numeric columns and the
+    number of teams; later rows must match them. Appending invalidates the
+    indexes until build_indexes is called again (queries then fall back to
+    scans).
+
+    Attributes
+    ----------
+    path : pathlib.Path (object)
+        directory of the store
+    names : list
+        strategy names by decimal code - 1 (settings.player_names)
+    columns : list
+        names of the numeric columns
+    games : list
+        RPST payoffs of the games, indexed by the game column
+    rows : int
+        number of rows
+
+    Methods
+    -------
+    append(df, rpst):
+        Adds PdExp rows played under the game with payoffs rpst
+    add_csv(csv_path, rpst=None, chunksize=100000):
+        Adds the rows of a PdExp csv file, reading it in chunks
+    build_indexes():
+        Rebuilds the strategy, team and game indexes
+    column(name):
+        Returns a numeric column as a memory-mapped array
+    teams():
+        Returns the (rows, teams) team masks
+    rows_where(strategies=(), together=(), team=None, rpst=None):
+        Returns the indexes of the matching rows
+    query(strategies=(), together=(), team=None, rpst=None, sort_by=None,
+          ascending=False, limit=None, columns=None):
+        Returns the matching rows as a dataframe
+    """
+
+    def __init__(self, path, names=None):
+        """
+        Parameters
+        ----------
+        path : str
+            directory of the store (created if it does not exist)
+        names : list
+            strategy names by decimal code - 1, for a new store (default is
+            None, settings.player_names)
+        """
+        self.path = Path(path)
+        meta = self.path / 'meta.json'
+        if meta.exists():
+            with open(meta) as f:
+                self._meta = json.load(f)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            names = list(names or settings.player_names)
+            if len(names) > 64:
+                raise ValueError('team masks hold at most 64 strategies')
+            self._meta = {'names': names, 'columns': None, 'num_teams': None,
+                          'games': [], 'rows': 0, 'indexed_rows': None}
+            self._save_meta()
+        self._index = dict()
+
+    @property
+    def names(self):
+        return self._meta['names']
+
+    @property
+    def columns(self):
+        return self._meta['columns'] or []
+
+    @property
+    def games(self):
+        return [tuple(g) for g in self._meta['games']]
+
+    @property
+    def rows(self):
+        return self._meta['rows']
+
+    def __len__(self):
+        return self.rows
+
+    def _save_meta(self):
+        tmp = self.path / 'meta.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._meta, f, indent=1)
+        tmp.replace(self.path / 'meta.json')
+
+    def append(self, df, rpst):
+        """
+        Adds PdExp rows (a System ID column, or the team masks of
+        pd_exp.compact_frame, and numeric columns; other columns are
+        dropped) played under the game with payoffs rpst
+        """
+        mask_columns = [c for c in df.columns if re.fullmatch(r'Team\d+ Mask', str(c))]
+        numeric = [c for c in df.columns if c != 'System ID' and c not in mask_columns
+                   and pd.api.types.is_numeric_dtype(df[c]) and not str(c).startswith('Unnamed')]
+        if mask_columns:
+            masks = df[mask_columns].to_numpy(dtype=np.uint64)
+        else:
+            masks = np.array([parse_system_id(s) for s in df['System ID']], dtype=np.uint64)
+        if self._meta['columns'] is None:
+            self._meta['columns'] = numeric
+            self._meta['num_teams'] = masks.shape[1]
+        elif numeric != self._meta['columns'] or masks.shape[1] != self._meta['num_teams']:
+            raise ValueError('rows do not match the columns and teams of the store')
+
+        rpst = tuple(float(x) for x in rpst)
+        if list(rpst) not in self._meta['games']:
+            self._meta['games'].append(list(rpst))
+        game = self._meta['games'].index(list(rpst))
+
+        for num, name in enumerate(numeric):
+            with open(self.path / f'col_{num:03d}.bin', 'ab') as f:
+                f.write(df[name].to_numpy(dtype=np.float64).tobytes())
+        with open(self.path / 'teams.bin', 'ab') as f:
+            f.write(masks.tobytes())
+        with open(self.path / 'game.bin', 'ab') as f:
+            f.write(np.full(len(df), game, dtype=np.uint16).tobytes())
+        self._meta['rows'] += len(df)
+        self._save_meta()
+        self._index = dict()
+
+    def add_csv(self, csv_path, rpst=None, chunksize=100000):
+        """
+        Adds the rows of a PdExp csv file, reading it in chunks; rpst
+        defaults to the payoffs in the file name (see rpst_from_name)
+        """
+        rpst = rpst or rpst_from_name(csv_path)
+        if rpst is None:
+            raise ValueError(f'no RPST in {csv_path}; pass rpst')
+        for chunk in pd.read_csv(csv_path, index_col=0, chunksize=chunksize):
+            self.append(chunk, rpst)
+
+    def _map(self, file_name, dtype, shape):
+        """ Returns a read-only memory map of a store file (empty if no rows) """
+
+        if not self.rows:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path / file_name, dtype=dtype, mode='r', shape=shape)
+
+    def column(self, name):
+        """ Returns a numeric column as a memory-mapped float64 array """
+
+        num = self.columns.index(name)
+        return self._map(f'col_{num:03d}.bin', np.float64, (self.rows,))
+
+    def teams(self):
+        """ Returns the (rows, teams) uint64 team masks """
+
+        return self._map('teams.bin', np.uint64, (self.rows, self._meta['num_teams'] or 0))
+
+    def game_column(self):
+        """ Returns the (rows,) game index of every row """
+
+        return self._map('game.bin', np.uint16, (self.rows,))
+
+    def build_indexes(self):
+        """
+        Rebuilds the secondary indexes: the rows of every strategy, of every
+        distinct team and of every game, each in ascending row order
+        """
+        teams = self.teams()
+        rows = np.arange(self.rows)
+
+        members = np.bitwise_or.reduce(teams, axis=1) if self.rows else np.zeros(0, np.uint64)
+        strategy_rows = [rows[(members >> np.uint64(k)) & np.uint64(1) == 1]
+                         for k in range(len(self.names))]
+        self._save_csr('strategy', np.arange(len(self.names)), strategy_rows)
+
+        flat = teams.ravel()
+        order = np.argsort(flat, kind='stable')
+        keys, starts = np.unique(flat[order], return_index=True)
+        team_rows = np.split((order // teams.shape[1]) if teams.size else order, starts[1:])
+        self._save_csr('team', keys, [_sorted_unique(r) for r in team_rows])
+
+        game = self.game_column()
+        self._save_csr('game', np.arange(len(self.games)),
+                       [rows[game == g] for g in range(len(self.games))])
+        self._meta['indexed_rows'] = self.rows
+        self._save_meta()
+        self._index = dict()
+
+    def _save_csr(self, name, keys, groups):
+        """ Saves an index as keys, offsets and concatenated row lists """
+
+        offsets = np.concatenate([[0], np.cumsum([len(g) for g in groups])]).astype(np.int64)
+        rows = np.concatenate(groups).astype(np.int64) if len(groups) else np.zeros(0, np.int64)
+        np.save(self.path / f'index_{name}_keys.npy', np.asarray(keys))
+        np.save(self.path / f'index_{name}_offsets.npy', offsets)
+        np.save(self.path / f'index_{name}_rows.npy', rows)
+
+    def _load_csr(self, name):
+        """ Returns (keys, offsets, rows) of an index, or None if it is stale """
+
+        if self._meta['indexed_rows'] != self.rows:
+            return None
+        if name not in self._index:
+            self._index[name] = tuple(np.load(self.path / f'index_{name}_{part}.npy',
+                                              mmap_mode='r')
+                                      for part in ('keys', 'offsets', 'rows'))
+        return self._index[name]
+
+    def _mask(self, names):
+        """ Returns the mask of the given strategy names """
+
+        return sum(1 << self.names.index(n) for n in names)
+
+    def rows_where(self, strategies=(), together=(), team=None, rpst=None):
+        """
+        Returns the ascending indexes of the rows that match every filter
+
+        Parameters
+        ----------
+        strategies : list
+            names of strategies that must all be in the system
+        together : list
+            names of strategies that must all be in the same team
+        team : list
+            names of the exact members of one of the teams
+        rpst : tuple
+            payoffs of the game
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            int64 row indexes
+        """
+        candidates = []
+        if rpst is not None:
+            rpst = [float(x) for x in rpst]
+            if rpst not in self._meta['games']:
+                return np.zeros(0, np.int64)
+            game = self._meta['games'].index(rpst)
+            index = self._load_csr('game')
+            candidates.append(index[2][index[1][game]:index[1][game + 1]] if index
+                              else np.flatnonzero(self.game_column() == game))
+        if team is not None or together:
+            mask = np.uint64(self._mask(team or together))
+            index = self._load_csr('team')
+            if index is not None:
+                keys, offsets, rows = index
+                hits = np.flatnonzero(keys == mask) if team is not None \
+                    else np.flatnonzero(keys & mask == mask)
+                candidates.append(_sorted_unique(np.concatenate(
+                    [rows[offsets[k]:offsets[k + 1]] for k in hits] + [np.zeros(0, np.int64)])))
+            else:
+                teams = self.teams()
+                match = (teams == mask) if team is not None else (teams & mask == mask)
+                candidates.append(np.flatnonzero(match.any(axis=1)))
+        for name in strategies:
+            k = self.names.index(name)
+            index = self._load_csr('strategy')
+            if index is not None:
+                candidates.append(index[2][index[1][k]:index[1][k + 1]])
+            else:
+                bit = np.uint64(1 << k)
+                candidates.append(np.flatnonzero((self.teams() & bit).any(axis=1)))
+
+        if not candidates:
+            return np.arange(self.rows)
+        rows = candidates[0]
+        for other in candidates[1:]:
+            keep = np.zeros(self.rows, dtype=bool)
+            keep[other] = True
+            rows = rows[keep[rows]]
+        if team is not None and together:
+            # Both filters used the team index; together must hold within a team
+            mask = np.uint64(self._mask(together))
+            rows = rows[(self.teams()[rows] & mask == mask).any(axis=1)]
+        return np.asarray(rows, dtype=np.int64)
+
+    def query(self, strategies=(), together=(), team=None, rpst=None, sort_by=None,
+              ascending=False, limit=None, columns=None):
+        """
+        Returns the matching rows as a dataframe
+
+        Parameters
+        ----------
+        strategies, together, team, rpst :
+            filters, as in rows_where
+        sort_by : str
+            numeric column to sort by (default is None, row order)
+        ascending : bool
+            sort order (default is False, largest first)
+        limit : int
+            most rows to return (default is None, all)
+        columns : list
+            numeric columns to return (default is None, all)
+
+        Returns
+        -------
+        data : pandas.dataframe (object)
+            System ID, RPST and the requested columns, indexed by row number
+        """
+        rows = self.rows_where(strategies, together, team, rpst)
+        if sort_by is not None:
+            values = np.asarray(self.column(sort_by)[rows])
+            if not ascending:
+                values = -values
+            if limit is not None and limit < len(rows):
+                # Only the rows up to the limit-th value (and its ties, which
+                # are ordered by row) need to be sorted
+                kth = np.partition(values, limit - 1)[limit - 1]
+                top = np.flatnonzero(values <= kth)
+                rows = rows[top[np.lexsort((rows[top], values[top]))]]
+            else:
+                rows = rows[np.lexsort((rows, values))]
+        rows = rows[:limit]
+
+        # Each distinct team and game is formatted once
+        masks, inverse = np.unique(self.teams()[rows], return_inverse=True)
+        team_ids = np.array([format_system_id([m]) for m in masks] + [''], dtype=object)
+        inverse = inverse.reshape(len(rows), -1)
+        games = np.array(['_'.join(f'{x:g}' for x in g) for g in self.games] + [''], dtype=object)
+        data = {'System ID': ['_'.join(team_ids[t]) for t in inverse],
+                'RPST': games[self.game_column()[rows]] if len(rows) else []}
+        for name in (self.columns if columns is None else columns):
+            data[name] = np.asarray(self.column(name)[rows])
+        return pd.DataFrame(data, index=rows)
@@ -0,0 +1,231 @@
+'''
+Sweep: RPST Parameter Sweeps
+============================
+
+Run systems of tournaments across many game matrices. The matches of
+settings.CD_strategy_dict are played (or evaluated exactly) once; since a
+player's score per turn is linear in the payoffs, every team is scored under
+all games with a single matrix product.
+
+Classes:
+
+    PdSweep
+        Generate system metrics for a set of systems under many games and
+        organize them into one table keyed by R, P, S and T
+
+Functions:
+
+    grid_games(R, P, S, T, condition=None) -> list of axelrod.game
+        Returns the games of the Cartesian product of the given values
+    latin_hypercube_games(dict, int, int, condition=None) -> list of axelrod.game
+        Returns games sampled with a Latin hypercube over R, P, S and T
+    is_prisoners_dilemma(float, float, float, float) -> bool
+        Returns True if T > R > P > S and 2R > T + S
+
+'''
+from axelrod import game
+from itertools import product
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import settings
+from match_matrix import MatchMatrix, payoff_vector
+from markov import MarkovMatrix
+from pd_exp import fraction_labels, system_id
+
+
+def is_prisoners_dilemma(R, P, S, T):
+    ''' Returns True if T > R > P > S and 2R > T + S '''
+
+    return T > R > P > S and 2 * R > T + S
+
+def grid_games(R, P, S, T, condition=None):
+    '''
+    Returns the games of the Cartesian product of the given values
+
+        Parameters:
+            R, P, S, T (list or float): values of each payoff (a single value
+                keeps that payoff fixed)
+            condition (function): optional filter called as
+                condition(R, P, S, T), e.g. is_prisoners_dilemma
+
+        Returns:
+            (list): axelrod.game objects
+    '''
+
+    values = [np.atleast_1d(v).tolist() for v in (R, P, S, T)]
+    return [game.Game(r=r, s=s, t=t, p=p) for r, p, s, t in product(*values)
+            if condition is None or condition(r, p, s, t)]
+
+def latin_hypercube_games(bounds, n, seed=1, condition=None):
+    '''
+    Returns games sampled with a Latin hypercube over R, P, S and T
+
+    Each payoff's unit interval is cut into n strata and every stratum is
+    sampled exactly once, with the strata of the four payoffs paired at
+    random.
+
+        Parameters:
+            bounds (dict): maps 'R', 'P', 'S' and 'T' to a (low, high) range,
+                a function from [0, 1) to values (e.g. the ppf of a
+                scipy.stats distribution) or a single fixed value
+            n (int): number of samples
+            seed (int): seed of the sampler
+            condition (function): optional filter called as
+                condition(R, P, S, T); rejected samples are dropped, so fewer
+                than n games may be returned
+
+        Returns:
+            (list): axelrod.game objects
+    '''
+
+    rng = np.random.default_rng(seed)
+    columns = []
+    for key in 'RPST':
+        u = (rng.permutation(n) + rng.random(n)) / n
+        spec = bounds[key]
+        if callable(spec):
+            columns.append(np.asarray(spec(u), dtype=float))
+        elif np.ndim(spec) == 0:
+            columns.append(np.full(n, float(spec)))
+        else:
+            low, high = spec
+            columns.append(low + u * (high - low))
+    return [game.Game(r=r, s=s, t=t, p=p) for r, p, s, t in zip(*columns)
+            if condition is None or condition(r, p, s, t)]
+
+class PdSweep:
+    """
+    A class to represent a set of systems evaluated under many games.
+
+    ...
+
+    Attributes
+    ----------
+    sys_tuple : tuple
+        systems, as passed to PdExp
+    games : list
+        axelrod.game objects
+    matrix : match_matrix.MatchMatrix (object)
+        pairwise matches of settings.CD_strategy_dict shared by all games
+    data : pandas.dataframe (object)
+        one row per (game, system) with R, P, S, T, System ID and the SYS
+        metrics of PdSystem
+
+    Methods
+    -------
+    run_sweep:
+        Computes the system metrics of every system under every game
+    save_data(path_to_directory, descrip_name, fmt='csv'):
+        Saves sweep data as a csv (or parquet) file
+    """
+
+    def __init__(self, tuple_of_systems, games, t = [0.5], analytic=False,
+                 matrix=None):
+        """
+        Constructs all the necessary attributes for the sweep object
+
+        Parameters
+        ----------
+        tuple_of_systems : tuple
+            systems, as passed to PdExp
+        games : list
+            axelrod.game objects (see grid_games and latin_hypercube_games)
+        t : list
+            CC-fraction thresholds
+        analytic : bool
+            use exact expectations instead of playing (default is False)
+        matrix : match_matrix.MatchMatrix (object)
+            precomputed matches to reuse (default is None, which plays
+            settings.CD_strategy_dict once)
+        """
+        self.CCThreshold = t
+        self.sys_tuple = tuple_of_systems
+        self.games = list(games)
+        if matrix is None:
+            if analytic:
+                matrix = MarkovMatrix(settings.CD_strategy_dict)
+            else:
+                matrix = MatchMatrix(settings.CD_strategy_dict)
+        self.matrix = matrix
+        self.data = None
+
+    def _team_metrics(self, team, payoffs):
+        """
+        Returns the (games,) average and minimum team scores and the
+        game-independent CC metrics of one team
+        """
+        matrix = self.matrix
+        players = [settings.CD_strategy_dict[n] for n in team]
+        idx = matrix.indices(players)
+        num_of_players = len(idx)
+        grid = np.ix_(range(matrix.reps), idx, idx)
+        off_diag = ~np.eye(num_of_players, dtype=bool)[..., None]
+
+        per_turn = np.where(off_diag, matrix.per_turn_states[grid], 0)
+        player_states = per_turn.sum(axis=2) / (num_of_players - 1)
+        normal_scores = player_states @ payoffs.T  # (reps, players, games)
+        _, metrics = matrix.tournament_metrics(players, self.CCThreshold)
+        return (normal_scores.mean(axis=(0, 1)), normal_scores.min(axis=(0, 1)),
+                metrics[3:])
+
+    def run_sweep(self):
+        """
+        Computes the system metrics of every system under every game and
+        stores them in the data attribute.
+        """
+        payoffs = np.array([payoff_vector(g) for g in self.games])
+        cache = dict()
+        avg_scores, min_scores, cc_metrics = [], [], []
+        for sys in self.sys_tuple:
+            team_avgs, team_mins, team_cc = [], [], []
+            for team in sys:
+                key = tuple(sorted(team))
+                if key not in cache:
+                    cache[key] = self._team_metrics(team, payoffs)
+                avg, minimum, cc = cache[key]
+                team_avgs.append(avg)
+                team_mins.append(minimum)
+                team_cc.append(cc)
+            avg_scores.append(team_avgs)
+            min_scores.append(team_mins)
+            cc_metrics.append(team_cc)
+
+        avg_scores = np.array(avg_scores)  # (systems, teams, games)
+        min_scores = np.array(min_scores)
+        cc_metrics = np.array(cc_metrics)  # (systems, teams, metrics)
+        num_games, num_sys = len(self.games), len(self.sys_tuple)
+
+        RPST = np.repeat([g.RPST() for g in self.games], num_sys, axis=0)
+        data = {'R' : RPST[:, 0], 'P' : RPST[:, 1],
+                'S' : RPST[:, 2], 'T' : RPST[:, 3],
+                'System ID' : np.tile([system_id(sys) for sys in self.sys_tuple], num_games)}
+        by_game = lambda a: a.T.reshape(-1)  # (systems, games) -> rows
+        data['SYS MIN Score'] = by_game(min_scores.min(axis=1))
+        data['SYS AVG Score'] = by_game(avg_scores.mean(axis=1))
+        data['MIN of Team Avgs'] = by_game(avg_scores.min(axis=1))
+        data['AVG of Team Mins'] = by_game(min_scores.mean(axis=1))
+
+        cc_names = ['SYS CC Dist', 'SYS New CC Dist'] + [
+            f'SYS CC Fraction {label}' for label in fraction_labels(self.CCThreshold)]
+        for num, name in enumerate(cc_names):
+            data[f'{name} AVG'] = np.tile(cc_metrics[:, :, num].mean(axis=1), num_games)
+            data[f'{name} MIN'] = np.tile(cc_metrics[:, :, num].min(axis=1), num_games)
+        self.data = pd.DataFrame(data)
+
+    def save_data(self, path_to_directory, descrip_name, fmt='csv'):
+        """
+        Saves sweep data as a csv file
+
+        Parameters
+        ----------
+        path_to_directory (str) :  relative path to folder where data is to be stored
+        descrip_name (str) : file name prefix for the output data to be saved
+        fmt (str) : 'csv' or 'parquet' (parquet needs pyarrow or fastparquet)
+        """
+        Path(path_to_directory).mkdir(parents=True, exist_ok=True)
+        file_name = path_to_directory + f'{descrip_name}_RPST_sweep.{fmt}'
+        if fmt == 'parquet':
+            self.data.to_parquet(file_name, index=False)
+        else:
+            self.data.to_csv(file_name, index=False)
@@ -0,0 +1,418 @@
+'''
+Work_queue: Sharded Experiments Across Machines
+===============================================
+
+Split the partition index space of an experiment (helper_funcs.Partitions)
+into shards of consecutive indexes and hand them out through a work queue
+kept in an SQLite file, so that workers on several machines sharing a
+filesystem can claim, run and complete shards until none are left. Every
+finished shard is a csv file of PdExp rows; merging the shards in index
+order gives the same table a single PdExp run writes.
+
+A claimed shard that is not completed within the lease (e.g. its worker was
+killed) is handed out again. Each worker writes its own temporary file and
+only the worker that holds the shard when it finishes (see
+WorkQueue.complete) moves it into place, so a stale worker whose lease ran
+out never overwrites or mixes with the current owner's rows. SQLite locking
+needs a filesystem with working POSIX locks (most NFS setups have them,
+some network filesystems do not).
+
+Usage (from the code directory, on every machine):
+
+    python work_queue.py work Data/Shards --strategies 12 --team-size 4
+    python work_queue.py progress Data/Shards --strategies 12 --team-size 4
+    python work_queue.py merge Data/Shards --strategies 12 --team-size 4 --out all.csv
+
+Classes:
+
+    WorkQueue
+        SQLite table of shards with claim, complete and release
+    ShardRunner
+        Runs claimed shards of an experiment and merges the results
+
+'''
+import argparse
+from contextlib import contextmanager
+import os
+import socket
+import sqlite3
+import time
+from datetime import timedelta
+from pathlib import Path
+import re
+import pandas as pd
+import settings
+from cache import TournamentCache
+from helper_funcs import Partitions
+from match_matrix import MatchMatrix
+from markov import MarkovMatrix
+from pd_exp import PdExp
+from result_sink import ResultSink
+
+
+class WorkQueue:
+    """
+    A class to represent a queue of shards in an SQLite file.
+
+    ...
+
+    Each shard is a range [start, stop) of partition indexes with a status
+    (pending, running or done), the worker that claimed it and the times it
+    was claimed and finished. Claims run in an immediate transaction, so two
+    workers never get the same pending shard.
+
+    Attributes
+    ----------
+    path : str
+        SQLite file of the queue
+    lease : float
+        seconds after which a running shard may be claimed again
+
+    Methods
+    -------
+    create(total, shard_size):
+        Adds the shards of total indexes (once; later calls check them)
+    claim(worker):
+        Returns the next (shard, start, stop) for worker, or None
+    complete(shard, worker):
+        Marks a shard running for worker as done
+    release(shard):
+        Puts a running shard back in the queue
+    progress():
+        Returns shard and index counts, the rate and the ETA
+    """
+
+    def __init__(self, path, lease=3600):
+        """
+        Parameters
+        ----------
+        path : str
+            SQLite file of the queue (created if needed)
+        lease : float
+            seconds after which a running shard may be claimed again
+            (default is 3600)
+        """
+        self.path = str(path)
+        self.lease = lease
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._transaction() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS shards (shard INTEGER PRIMARY KEY, '
+                       'start INTEGER, stop INTEGER, status TEXT, worker TEXT, '
+                       'claimed REAL, finished REAL)')
+
+    @contextmanager
+    def _transaction(self):
+        """ Yields a connection inside an immediate transaction, then closes it """
+
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
+
+    def create(self, total, shard_size):
+        """
+        Adds the shards of total indexes; if the queue already has shards,
+        checks that they cover the same indexes with the same size instead
+
+        Returns
+        -------
+        count : int
+            number of shards
+        """
+        shards = [(k, start, min(start + shard_size, total))
+                  for k, start in enumerate(range(0, total, shard_size))]
+        with self._transaction() as db:
+            existing = db.execute('SELECT shard, start, stop FROM shards ORDER BY shard').fetchall()
+            if not existing:
+                db.executemany("INSERT INTO shards VALUES (?, ?, ?, 'pending', NULL, NULL, NULL)",
+                               shards)
+            elif existing != shards:
+                raise ValueError(f'{self.path} holds different shards')
+        return len(shards)
+
+    def claim(self, worker):
+        """
+        Returns the next pending (or expired running) shard as (shard, start,
+        stop) and marks it as running for worker, or None if there is none
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT shard, start, stop FROM shards WHERE status = 'pending' "
+                             "OR (status = 'running' AND claimed < ?) ORDER BY shard LIMIT 1",
+                             (now - self.lease,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE shards SET status = 'running', worker = ?, claimed = ? "
+                           "WHERE shard = ?", (worker, now, row[0]))
+        return row
+
+    def complete(self, shard, worker):
+        """
+        Marks a shard as done if it is still running for worker, and returns
+        whether it was (False once its lease ran out and another worker
+        claimed it)
+        """
+        with self._transaction() as db:
+            changed = db.execute("UPDATE shards SET status = 'done', finished = ? WHERE "
+                                 "shard = ? AND worker = ? AND status = 'running'",
+                                 (time.time(), shard, worker)).rowcount
+        return bool(changed)
+
+    def release(self, shard):
+        """ Puts a running shard back in the queue (e.g. after an error) """
+
+        with self._transaction() as db:
+            db.execute("UPDATE shards SET status = 'pending', worker = NULL, claimed = NULL "
+                       "WHERE shard = ? AND status = 'running'", (shard,))
+
+    def progress(self):
+        """
+        Returns the shard and index counts, the rate and the ETA
+
+        Returns
+        -------
+        progress : dict
+            shards, pending, running and done shard counts, total and
+            completed indexes, rate (completed indexes per second from the
+            first claim to now, or to the last completion) and eta (seconds,
+            None before the first shard is done)
+        """
+        with self._transaction() as db:
+            rows = db.execute('SELECT status, stop - start, claimed, finished FROM shards'
+                              ).fetchall()
+        counts = {status: sum(1 for r in rows if r[0] == status)
+                  for status in ('pending', 'running', 'done')}
+        total = sum(r[1] for r in rows)
+        completed = sum(r[1] for r in rows if r[0] == 'done')
+        claims = [r[2] for r in rows if r[2] is not None]
+        # Until the last shard is done, idle time counts against the rate
+        end = max(r[3] for r in rows) if rows and counts['done'] == len(rows) else time.time()
+        elapsed = end - min(claims) if claims else 0
+        rate = completed / elapsed if completed and elapsed else 0.0
+        eta = (total - completed) / rate if rate else None
+        return {'shards': len(rows), **counts, 'total': total, 'completed': completed,
+                'rate': rate, 'eta': eta}
+
+class ShardRunner:
+    """
+    A class to represent an experiment over all partitions of a strategy
+    list, run shard by shard from a WorkQueue.
+
+    ...
+
+    Shard k holds the rows of partitions start to stop - 1 in the canonical
+    order and is written atomically to out_dir/shard_{k:06d}.csv once
+    complete, from a temporary file of the worker. The systems of a shard are numbered from start + 1, so with a
+    seed they play the same tournaments as in one PdExp of all partitions.
+
+    Attributes
+    ----------
+    partitions : helper_funcs.Partitions (object)
+        the partitions of the experiment
+    out_dir : pathlib.Path (object)
+        directory of the queue and the shards
+    queue : WorkQueue (object)
+        queue of the shards (out_dir/queue.sqlite)
+    matrix : match_matrix.MatchMatrix (object)
+        pairwise matches shared by the shards run by this worker when
+        precompute is set
+    cache : cache.TournamentCache (object)
+        team tournaments shared by the shards run by this worker (None for
+        no cache)
+
+    Methods
+    -------
+    work(worker=None, max_shards=None):
+        Claims and runs shards until the queue is empty
+    run_shard(shard, start, stop, worker):
+        Runs one shard and writes its file if worker still holds it
+    merge(path):
+        Writes the rows of all shards, in order, to one csv file
+    read():
+        Returns the rows of all shards as one dataframe
+    report():
+        Returns a one-line progress and ETA report
+    """
+
+    def __init__(self, names, subset_size, out_dir, shard_size=1000, t = [0.5],
+                 game_type=None, precompute=True, analytic=False, seed=None, lease=3600,
+                 cache=False):
+        """
+        Parameters
+        ----------
+        names : list
+            strategy names (keys of settings.CD_strategy_dict) to partition
+        subset_size : int
+            number of players of every team
+        out_dir : str
+            directory shared by the workers
+        shard_size : int
+            number of partitions per shard (default is 1000)
+        t : list
+            CC-fraction thresholds (default is [0.5])
+        game_type : axelrod.game (object)
+            game of the tournaments (default is None, the classic PD)
+        precompute, analytic, seed :
+            as in PdExp (defaults are True, False and None)
+        lease : float
+            seconds after which an unfinished shard is handed out again
+            (default is 3600)
+        cache : bool or cache.TournamentCache (object)
+            True for an in-memory cache of team tournaments shared by the 
+            shards of this worker, or a cache (e.g. on an SQLite file) 
+            (default is False, no cache; with precompute the tournaments 
+            are read from the matrix anyway)
+        """
+        self.partitions = Partitions(names, subset_size)
+        self.out_dir = Path(out_dir)
+        self.CCThreshold = t
+        self.game = game_type
+        self.precompute = precompute or analytic
+        self.analytic = analytic
+        self.seed = seed
+        self.matrix = None
+        if cache is True:
+            cache = TournamentCache()
+        elif cache is False:
+            cache = None
+        self.cache = cache
+        self.queue = WorkQueue(self.out_dir / 'queue.sqlite', lease)
+        self.num_shards = self.queue.create(len(self.partitions), shard_size)
+
+    def shard_path(self, shard):
+        """ Returns the file of a shard """
+
+        return self.out_dir / f'shard_{shard:06d}.csv'
+
+    def _tmp_path(self, shard, worker):
+        """ Returns the temporary file of a shard run by worker """
+
+        name = re.sub(r'[^\w.-]', '_', worker)
+        return self.out_dir / f'shard_{shard:06d}.{name}.tmp'
+
+    def work(self, worker=None, max_shards=None):
+        """
+        Claims and runs shards until the queue is empty (or max_shards have
+        run) and returns the number of shards completed; a shard that fails
+        is released before the error is raised
+
+        Parameters
+        ----------
+        worker : str
+            name recorded in the queue (default is None, host:pid)
+        max_shards : int
+            most shards to run (default is None, no limit)
+        """
+        worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+        count = 0
+        while max_shards is None or count < max_shards:
+            claimed = self.queue.claim(worker)
+            if claimed is None:
+                break
+            shard, start, stop = claimed
+            try:
+                completed = self.run_shard(shard, start, stop, worker)
+            except BaseException:
+                self.queue.release(shard)
+                raise
+            if completed:
+                count += 1
+                print(f'{worker} finished shard {shard}. {self.report()}')
+            else:
+                print(f'{worker} lost shard {shard} to another worker. {self.report()}')
+        return count
+
+    def run_shard(self, shard, start, stop, worker):
+        """
+        Runs the partitions start to stop - 1 into a temporary file of
+        worker, completes the shard in the queue and, if worker still held
+        it, moves the file into place; returns whether it did
+        """
+        if self.precompute and self.matrix is None:
+            if self.analytic:
+                self.matrix = MarkovMatrix(settings.CD_strategy_dict, self.game)
+            else:
+                self.matrix = MatchMatrix(settings.CD_strategy_dict, self.game)
+        systems = [[list(team) for team in sys] for sys in self.partitions.iter_range(start, stop)]
+        exp = PdExp(systems, self.CCThreshold, self.game, cache=self.cache,
+                    seed=self.seed, first=start + 1)
+        exp.matrix = self.matrix
+        tmp = self._tmp_path(shard, worker)
+        with ResultSink(tmp, batch_size=len(systems)) as sink:
+            exp.run_experiments(chunk_size=len(systems), sink=sink, keep_data=False)
+        if not self.queue.complete(shard, worker):
+            tmp.unlink()
+            return False
+        tmp.replace(self.shard_path(shard))  # Atomic, so a shard is never partial
+        return True
+
+    def _check_done(self):
+        """ Raises ValueError unless every shard is done """
+
+        progress = self.queue.progress()
+        if progress['done'] < progress['shards']:
+            raise ValueError(f"{progress['shards'] - progress['done']} shards are not done")
+
+    def merge(self, path):
+        """
+        Writes the rows of all shards, in shard order, to one csv file (the
+        file a single PdExp run would write)
+        """
+        self._check_done()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as out:
+            for shard in range(self.num_shards):
+                with open(self.shard_path(shard)) as f:
+                    header = f.readline()
+                    if shard == 0:
+                        out.write(header)
+                    for line in f:
+                        out.write(line)
+
+    def read(self):
+        """ Returns the rows of all shards, in shard order, as one dataframe """
+
+        self._check_done()
+        return pd.concat([pd.read_csv(self.shard_path(shard), index_col=0)
+                          for shard in range(self.num_shards)])
+
+    def report(self):
+        """ Returns a one-line progress and ETA report """
+
+        p = self.queue.progress()
+        eta = 'unknown' if p['eta'] is None else str(timedelta(seconds=round(p['eta'])))
+        return (f"Shards {p['done']}/{p['shards']} done ({p['running']} running), "
+                f"systems {p['completed']}/{p['total']}, {p['rate']:.1f} systems/s, "
+                f"ETA {eta}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sharded PdExp runs over a shared directory')
+    parser.add_argument('command', choices=['work', 'progress', 'merge'])
+    parser.add_argument('out_dir', help='directory shared by the workers')
+    parser.add_argument('--strategies', type=int, default=12,
+                        help='number of strategies of settings.CD_strategy_dict')
+    parser.add_argument('--team-size', type=int, default=4)
+    parser.add_argument('--shard-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--analytic', action='store_true')
+    parser.add_argument('--max-shards', type=int, default=None)
+    parser.add_argument('--cache', nargs='?', const=True, default=False,
+                        help='cache team tournaments in memory, or in the given SQLite file')
+    parser.add_argument('--out', help='merged csv file (merge only)')
+    args = parser.parse_args()
+
+    names = list(settings.CD_strategy_dict)[:args.strategies]
+    cache = TournamentCache(path=args.cache) if isinstance(args.cache, str) else args.cache
+    runner = ShardRunner(names, args.team_size, args.out_dir, args.shard_size,
+                         analytic=args.analytic, seed=args.seed, cache=cache)
+    if args.command == 'work':
+        runner.work(max_shards=args.max_shards)
+    elif args.command == 'progress':
+        print(runner.report())
+    else:
+        runner.merge(args.out or str(Path(args.out_dir) / 'merged.csv'))
@@ -1,26 +1,23 @@
 #!/usr/bin/env python
 
-import code.pd_exp
-from code.helper_funcs import partitions
+import sys
 from pathlib import Path
-from code.settings import player_names, stag, high_t
+# The modules in code/ import each other by bare name (import settings), so
+# code/ itself has to be on the path rather than imported as a package
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'code'))
+
+from pd_exp import multi_game_experiments
+from helper_funcs import partitions
+from settings import player_names, stag, high_t
 import time, json
 
 ### For experiment 1
 part_list = tuple([tuple([player_names])])
 
 ### For experiment 2
-# Checking for txt file with list of systems
-#p = Path('partition_list_12_strategies_3teams_of4.txt')
-#if p.exists():
-#    with open(p, "r") as f:
-#        part_list = json.load(f)
-#else:
-#    print('creating partitions and saving to file')
-#    part_list = list(partitions(player_names,4))
-#    p.touch()
-#    with open(p, "w") as f:
-#        json.dump(part_list, f)
+# Partitions are generated lazily in a fixed order, so a run can also be split
+# into index ranges with Partitions(player_names[:12], 4).iter_range(start, stop)
+#part_list = list(partitions(player_names[:12],4))
 
 
 print('Total count of systems: ',len(part_list))  # Should be 5775 for n=12 and k=4
@@ -28,9 +25,8 @@ print('Total count of systems: ',len(part_list))  # Should be 5775 for n=12 and
 start_time = time.time()
 
 print('running PD Exp')
-classic_pdExp = pd_exp.PdExp(part_list)
-stag_pdExp = pd_exp.PdExp(part_list,game_type=stag)
-unconv_pdExp = pd_exp.PdExp(part_list,game_type=high_t)
+# Matches are played once and scored under each game
+classic_pdExp, stag_pdExp, unconv_pdExp = multi_game_experiments(part_list, [None, stag, high_t])
 
 print('Running experiments and computing data')
 classic_pdExp.run_experiments()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from accumulators import HistogramSketch, RatioStats, TournamentStats
+
+
+def sample(seed=0, reps=50, size=6):
+    rng = np.random.default_rng(seed)
+    turns = rng.integers(1, 40, size=(reps, size))
+    return rng.binomial(turns, 0.3), turns
+
+
+def test_ratio_stats_match_the_direct_computation():
+    numerators, denominators = sample()
+    stats = RatioStats(numerators.shape[1])
+    stats.update(numerators, denominators)
+
+    ratios = numerators.sum(axis=0) / denominators.sum(axis=0)
+    assert np.isclose(stats.value(), ratios.mean())
+    influence = ((numerators - ratios * denominators) / denominators.mean(axis=0)).mean(axis=1)
+    assert np.isclose(stats.variance(), influence.var(ddof=1) / len(influence))
+    assert np.isclose(stats.half_width(), 1.959964 * np.sqrt(stats.variance()))
+
+
+def test_ratio_stats_do_not_depend_on_the_batches():
+    numerators, denominators = sample(seed=1)
+    whole = RatioStats(numerators.shape[1])
+    whole.update(numerators, denominators)
+    batched = RatioStats(numerators.shape[1])
+    for start, stop in [(0, 1), (1, 2), (2, 17), (17, 17), (17, 50)]:
+        batched.update(numerators[start:stop], denominators[start:stop])
+    assert batched.count == whole.count
+    assert np.isclose(batched.value(), whole.value())
+    assert np.isclose(batched.variance(), whole.variance())
+
+
+def test_ratio_stats_need_two_repetitions():
+    numerators, denominators = sample(reps=1)
+    stats = RatioStats(numerators.shape[1])
+    assert np.isnan(stats.value())
+    stats.update(numerators, denominators)
+    assert np.isnan(stats.variance())
+    assert stats.half_width() == np.inf
+
+
+def test_sketch_quantiles_are_within_a_bin_of_the_exact_ones():
+    rng = np.random.default_rng(2)
+    values = rng.uniform(0, 5, size=(4000, 3)) ** np.array([1, 2, 0.5]) / np.array([1, 5, 1])
+    sketch = HistogramSketch(0, 5, bins=500, shape=(3,))
+    for batch in np.array_split(values, 7):
+        sketch.update(batch)
+    for q in (0.01, 0.25, 0.5, 0.9, 1.0):
+        assert np.all(np.abs(sketch.quantile(q) - np.quantile(values, q, axis=0)) <= 5 / 500)
+    scalar = HistogramSketch(0, 1, bins=10)
+    scalar.update([-3, 0.55, 7])
+    assert scalar.quantile(0) == 0.05 and scalar.quantile(1) == 0.95
+
+
+def test_tournament_stats_do_not_depend_on_the_batches():
+    rng = np.random.default_rng(3)
+    scores = rng.uniform(0, 5, size=(3, 60))
+    states = rng.integers(0, 30, size=(60, 3, 3, 4))
+    whole = TournamentStats(3, (0, 5))
+    whole.update(scores, states.sum(axis=0))
+    batched = TournamentStats(3, (0, 5))
+    for part in np.array_split(np.arange(60), 4):
+        batched.update(scores[:, part], states[part].sum(axis=0))
+    np.testing.assert_allclose(batched.scores.mean, scores.mean(axis=1))
+    np.testing.assert_allclose(batched.scores.minimum, scores.min(axis=1))
+    np.testing.assert_allclose(batched.scores.variance(), whole.scores.variance())
+    np.testing.assert_array_equal(batched.sketch.counts, whole.sketch.counts)
+    np.testing.assert_array_equal(batched.states, states.sum(axis=0))
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from benchmark import compare, load_results, save_results
+
+BASELINE = Path(__file__).resolve().parents[1] / 'Data' / 'Benchmarks' / 'baseline_quick.json'
+
+
+def _results(*cases):
+    return {'meta': {'quick': True},
+            'results': [{'name': name, 'size': size, 'reps': 1, 'per_sec': per_sec}
+                        for name, size, per_sec in cases]}
+
+
+def test_compare_flags_only_drops_beyond_the_tolerance():
+    baseline = _results(('a', 4, 100.0), ('b', 4, 100.0), ('c', 4, 100.0))
+    results = _results(('a', 4, 75.0), ('b', 4, 74.9), ('c', 4, 150.0))
+
+    regressions = compare(results, baseline, tolerance=0.25)
+
+    assert [r['name'] for r in regressions] == ['b']
+    assert regressions[0]['baseline'] == 100.0
+    assert regressions[0]['ratio'] == 74.9 / 100.0
+
+
+def test_compare_skips_cases_missing_from_either_side():
+    baseline = _results(('a', 4, 100.0), ('only_baseline', 4, 100.0))
+    results = _results(('a', 8, 1.0), ('only_results', 4, 1.0))
+
+    assert compare(results, baseline) == []
+    assert compare(results, _results()) == []
+    assert compare(_results(), baseline) == []
+
+
+def test_save_and_load_results_round_trip(tmp_path):
+    results = _results(('a', 4, 12.5), ('b', 12, 0.25))
+    path = tmp_path / 'nested' / 'bench.json'
+
+    save_results(results, path)
+
+    assert load_results(path) == results
+
+
+def test_committed_baseline_covers_the_quick_cases():
+    baseline = load_results(BASELINE)
+
+    assert baseline['meta']['quick']
+    assert baseline['results']
+    assert compare(baseline, baseline) == []
@@ -0,0 +1,64 @@
+import axelrod as axl
+import pandas as pd
+import pytest
+
+import settings
+from cache import TournamentCache, tournament_key
+from pd_exp import PdTournament
+from profiler import Profiler
+
+ROSTER = [settings.CD_strategy_dict[name] for name in ('Tit For Tat', 'Defector', 'Grim Trigger')]
+
+
+def test_memory_layer_evicts_the_least_recently_used():
+    cache = TournamentCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c'), len(cache)) == (1, 3, 2)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_disk_layer_persists_across_caches(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    first = TournamentCache(maxsize=1, path=path)
+    first.put('a', {'metrics': [1.5]})
+    first.put('b', [2])
+    assert first.get('a') == {'metrics': [1.5]}  # Evicted from memory, read from disk
+    first.close()
+
+    second = TournamentCache(path=path)
+    assert len(second) == 0
+    assert (second.get('a'), second.get('b'), second.get('c')) == ({'metrics': [1.5]}, [2], None)
+    assert len(second) == 2
+    second.close()
+
+
+def test_keys_depend_on_every_setting():
+    key = tournament_key(ROSTER)
+    others = [tournament_key(ROSTER[::-1]), tournament_key(ROSTER[:2]),
+              tournament_key(ROSTER, game=axl.game.Game(r=4, s=0, t=6, p=1)),
+              tournament_key(ROSTER, turns=40), tournament_key(ROSTER, prob_end=0.2),
+              tournament_key(ROSTER, reps=2), tournament_key(ROSTER, seed=2),
+              tournament_key(ROSTER, thresholds=[0.5])]
+    assert key == tournament_key(list(ROSTER), game=axl.game.Game())
+    assert len({key, *others}) == len(others) + 1
+
+
+def test_cached_tournament_is_not_played_again(monkeypatch):
+    cache = TournamentCache()
+    played = PdTournament(ROSTER, t=[0.5], cache=cache, processes=None)
+    uncached = PdTournament(ROSTER, t=[0.5], processes=None)
+    pd.testing.assert_frame_equal(played.data, uncached.data)
+
+    def replay(*args):
+        raise AssertionError('a cached tournament was played')
+    monkeypatch.setattr(PdTournament, '_play', replay)
+    profiler = Profiler()
+    hit = PdTournament(ROSTER, t=[0.5], cache=cache, processes=None, profiler=profiler)
+    pd.testing.assert_frame_equal(hit.data, played.data)
+    assert profiler.counters['cache hits'] == 1
+    with pytest.raises(AssertionError):
+        PdTournament(ROSTER, t=[0.5], cache=cache, seed=2, processes=None)
@@ -0,0 +1,36 @@
+import axelrod as axl
+import numpy as np
+
+import settings
+from cycles import CycleMatrix, cycle_counts, find_cycle
+
+C, D = axl.Action.C, axl.Action.D
+STATES = [(C, C), (C, D), (D, C), (D, D)]
+
+
+def played_counts(first, second, turns):
+    match = axl.Match((first.clone(), second.clone()), turns=turns)
+    return np.array([match.play().count(state) for state in STATES])
+
+
+def test_counts_match_played_matches():
+    matrix = CycleMatrix(settings.CD_strategy_dict, turns=50, prob_end=0.1, reps=3)
+    players = list(settings.CD_strategy_dict.values())
+    for rep in range(matrix.reps):
+        for i, first in enumerate(players):
+            for j, second in enumerate(players):
+                length = int(matrix.match_lengths[rep, i, j])
+                np.testing.assert_array_equal(matrix.states[rep, i, j],
+                                              played_counts(first, second, length))
+
+
+def test_cycle_counts_match_the_unrolled_match():
+    # Tit For Tat against Suspicious Tit For Tat alternates CD and DC
+    transient, cycle = find_cycle(np.array([1, 0, 1, 0]), np.array([1, 0, 1, 0]), 1)
+    assert (transient, cycle) == ([], [1, 2])
+    # Grim Trigger against Tit For Tat after a defection
+    transient, cycle = find_cycle(np.array([1, 0, 0, 0]), np.array([1, 0, 1, 0]), 1)
+    lengths = np.arange(40)
+    unrolled = transient + cycle * 40
+    expected = [np.bincount(unrolled[:k], minlength=4) for k in lengths]
+    np.testing.assert_array_equal(cycle_counts(transient, cycle, lengths), expected)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import settings
+from encoding import (format_system_id, masks_exact, parse_system_id, system_codes,
+                      system_ids, system_masks, team_codes)
+from match_matrix import MatchMatrix
+from pd_exp import PdSystem, system_id
+
+NAMES = list(settings.CD_strategy_dict)
+
+
+def test_system_ids_keep_the_order_of_team_lists():
+    order = [3, 8, 0, 5, 4, 1, 9, 6, 7, 2]
+    teams = [[NAMES[num] for num in order[:5]], [NAMES[num] for num in order[5:]]]
+    assert system_id(teams) == '4,9,1,6,5_2,10,7,8,3'
+    assert system_codes(system_id(teams)) == [team_codes(team) for team in teams]
+    assert not masks_exact([team_codes(team) for team in teams])
+    # Sorted teams round trip through their masks
+    teams = [sorted(team, key=NAMES.index) for team in teams]
+    masks = system_masks([teams])
+    assert masks_exact([team_codes(team) for team in teams])
+    assert system_ids(masks) == [system_id(teams)]
+    assert format_system_id(parse_system_id(system_id(teams))) == system_id(teams)
+
+
+def test_repeated_strategies_have_no_masks():
+    teams = [['Cooperator', 'Cooperator', 'Defector'], ['Tit For Tat', 'Defector', 'Grim Trigger']]
+    matrix = MatchMatrix(settings.CD_strategy_dict, turns=20, prob_end=None)
+    system = PdSystem(teams, t=[0.5], matrix=matrix)
+    system.compute_data()
+    assert system.id == '2,2,8_6,8,4'
+    assert system.masks is None
+    assert not masks_exact(system_codes(system.id))
+    with pytest.raises(ValueError):
+        parse_system_id(system.id)
+    with pytest.raises(ValueError):
+        system_masks([teams])
+
+
+def test_masks_hold_at_most_64_strategies():
+    assert masks_exact([(1, 64)])
+    assert not masks_exact([(1, 65)])
+    assert system_masks([[['Cooperator'], ['Defector']]]).dtype == np.uint64
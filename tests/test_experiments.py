@@ -0,0 +1,159 @@
+import pandas as pd
+import pytest
+
+import settings
+from helper_funcs import Partitions
+from match_matrix import MatchMatrix
+from optimize import objective_spec
+from pd_exp import PdExp, compact_frame, expand_frame, fraction_labels, system_id
+from result_sink import ResultSink
+
+T = [i / 10 for i in range(1, 11)]
+NAMES = settings.player_names[:8]
+SYSTEMS = [[list(team) for team in p] for p in Partitions(NAMES, 4)]
+# A team may repeat a strategy and list it in any order
+REPEATED = [[['Cooperator', 'Cooperator', 'Defector'], ['Tit For Tat', 'Defector', 'Grim Trigger']],
+            [['Defector', 'Cooperator', 'Cooperator'], ['Grim Trigger', 'Defector', 'Tit For Tat']]]
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    return MatchMatrix(settings.CD_strategy_dict)
+
+
+def experiment(matrix, systems=SYSTEMS, **kwargs):
+    exp = PdExp(systems, t=T, precompute=True, **kwargs)
+    exp.matrix = matrix
+    return exp
+
+
+def test_no_sink_writes_no_file(matrix, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    exp = experiment(matrix)
+    exp.run_experiments()
+    assert len(exp.data) == len(SYSTEMS)
+    assert not list(tmp_path.iterdir())
+    with pytest.raises(ValueError):
+        exp.run_experiments(keep_data=False)
+
+
+def test_sink_streams_the_saved_rows(matrix, tmp_path):
+    exp = experiment(matrix)
+    with ResultSink(tmp_path / 'rows.csv', batch_size=7) as sink:
+        exp.run_experiments(sink=sink, chunk_size=10, keep_data=False)
+    assert exp.data is None
+
+    saved = experiment(matrix)
+    saved.run_experiments()
+    saved.save_data(f'{tmp_path}/', 'saved')
+    [saved_file] = tmp_path.glob('saved_RPST_*.csv')
+    assert (tmp_path / 'rows.csv').read_text() == saved_file.read_text()
+
+
+def test_chunked_runs_give_the_serial_rows(matrix, tmp_path):
+    # A seed selects the serial path; the matrix makes it irrelevant
+    serial = experiment(matrix, seed=0)
+    serial.run_experiments()
+    chunked = experiment(matrix, seed=0)
+    chunked.run_experiments(chunk_size=8, shard_dir=tmp_path)
+    pd.testing.assert_frame_equal(chunked.data, serial.data)
+    # A resumed run reads the finished shards and replays the missing one
+    (tmp_path / 'shard_000002.pkl').unlink()
+    resumed = experiment(matrix, seed=0)
+    resumed.run_experiments(chunk_size=8, shard_dir=tmp_path)
+    pd.testing.assert_frame_equal(resumed.data, serial.data)
+
+
+def test_resumed_runs_with_other_settings_raise(matrix, tmp_path):
+    experiment(matrix, seed=0).run_experiments(chunk_size=8, shard_dir=tmp_path)
+    for systems, kwargs, chunk_size in [(SYSTEMS, {'seed': 0}, 10),
+                                        (SYSTEMS[::-1], {'seed': 0}, 8),
+                                        (SYSTEMS, {'seed': 1}, 8)]:
+        with pytest.raises(ValueError):
+            experiment(matrix, systems, **kwargs).run_experiments(chunk_size=chunk_size,
+                                                                  shard_dir=tmp_path)
+    other_t = PdExp(SYSTEMS, t=[0.5], precompute=True, seed=0)
+    other_t.matrix = matrix
+    with pytest.raises(ValueError):
+        other_t.run_experiments(chunk_size=8, shard_dir=tmp_path)
+    (tmp_path / 'manifest.json').unlink()
+    with pytest.raises(ValueError):
+        experiment(matrix, seed=0).run_experiments(chunk_size=8, shard_dir=tmp_path)
+
+
+def test_worker_processes_give_the_serial_rows(matrix):
+    serial = experiment(matrix, systems=SYSTEMS[:6], seed=0)
+    serial.run_experiments()
+    parallel = experiment(matrix, systems=SYSTEMS[:6], seed=0)
+    parallel.run_experiments(processes=2, chunk_size=3)
+    pd.testing.assert_frame_equal(parallel.data, serial.data)
+
+
+def test_batch_run_gives_the_serial_rows(matrix):
+    batch = experiment(matrix)
+    batch.run_experiments(chunk_size=16)
+    serial = experiment(matrix, seed=0)
+    serial.run_experiments()
+    pd.testing.assert_frame_equal(batch.data, serial.data)
+
+
+def test_system_columns_aggregate_the_team_columns(matrix):
+    exp = experiment(matrix)
+    exp.run_experiments()
+    data = exp.data
+    team = lambda column: data[[f'Team{num} {column}' for num in (1, 2)]]
+    pd.testing.assert_series_equal(data['SYS MIN Score'], team('Min Score').min(axis=1),
+                                   check_names=False)
+    pd.testing.assert_series_equal(data['SYS AVG Score'], team('Avg Score').mean(axis=1),
+                                   check_names=False)
+    pd.testing.assert_series_equal(data['SYS CC Fraction 05 MIN'],
+                                   team('Avg CC Fraction 0.5').min(axis=1), check_names=False)
+
+
+def test_compact_rows_expand_to_the_full_rows(matrix):
+    full = experiment(matrix)
+    full.run_experiments()
+    compact = experiment(matrix)
+    compact.run_experiments(compact=True)
+    assert list(compact.data.columns[:2]) == ['Team1 Mask', 'Team2 Mask']
+    pd.testing.assert_frame_equal(expand_frame(compact.data), full.data)
+    pd.testing.assert_frame_equal(compact_frame(full.data), compact.data)
+
+
+def test_repeated_strategies_keep_their_system_ids(matrix):
+    batch = experiment(matrix, systems=REPEATED)
+    batch.run_experiments()
+    serial = experiment(matrix, systems=REPEATED, seed=0)
+    serial.run_experiments()
+    pd.testing.assert_frame_equal(batch.data, serial.data)
+    assert batch.data['System ID'].tolist() == [system_id(sys) for sys in REPEATED]
+    assert batch.data['System ID'].tolist() == ['2,2,8_6,8,4', '8,2,2_4,8,6']
+
+    compact = experiment(matrix, systems=REPEATED)
+    compact.run_experiments(compact=True)
+    assert compact.data.columns[0] == 'System ID'
+    pd.testing.assert_frame_equal(expand_frame(compact.data), batch.data)
+    pd.testing.assert_frame_equal(compact_frame(batch.data), compact.data)
+
+
+def test_fraction_columns_are_named_by_threshold():
+    assert fraction_labels(T) == ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10']
+    assert fraction_labels([0.25, 1.0]) == ['0.25', '1']
+    assert fraction_labels([0.1, 0.2]) == ['0.1', '0.2']
+    assert objective_spec('SYS CC Fraction 05 MIN', T) == (9, 'min')
+    assert objective_spec('SYS CC Fraction 0.25 MIN', [0.25, 1.0]) == (5, 'min')
+    assert objective_spec('SYS CC Fraction 1 AVG', [0.25, 1.0]) == (6, 'mean')
+    with pytest.raises(ValueError):
+        objective_spec('SYS CC Fraction 05 MIN', [0.25, 1.0])
+
+
+def test_run_experiments_names_fraction_columns_by_threshold(matrix):
+    exp = PdExp(SYSTEMS[:3], t=[0.25, 1.0], precompute=True)
+    exp.matrix = matrix
+    exp.run_experiments()
+    columns = [c for c in exp.data.columns if c.startswith('SYS CC Fraction')]
+    assert columns == ['SYS CC Fraction 0.25 AVG', 'SYS CC Fraction 0.25 MIN',
+                       'SYS CC Fraction 1 AVG', 'SYS CC Fraction 1 MIN']
+    team = exp.data[['Team1 Avg CC Fraction 0.25', 'Team2 Avg CC Fraction 0.25']]
+    pd.testing.assert_series_equal(exp.data['SYS CC Fraction 0.25 MIN'], team.min(axis=1),
+                                   check_names=False)
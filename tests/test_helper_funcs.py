@@ -0,0 +1,54 @@
+from itertools import combinations
+
+import pytest
+
+from helper_funcs import Partitions, count_partitions, partitions
+
+
+def brute_force(elements, k):
+    ''' Every partition of elements into k-subsets, as sets of frozensets '''
+    if not elements:
+        return [frozenset()]
+    first, rest = elements[0], elements[1:]
+    found = []
+    for others in combinations(rest, k - 1):
+        team = frozenset((first,) + others)
+        remaining = [e for e in rest if e not in team]
+        found += [p | {team} for p in brute_force(remaining, k)]
+    return found
+
+
+@pytest.mark.parametrize('n, k', [(4, 2), (6, 3), (8, 2), (9, 3), (12, 4)])
+def test_enumerates_every_partition_once(n, k):
+    listed = [frozenset(frozenset(team) for team in p) for p in Partitions(range(n), k)]
+    assert len(listed) == len(set(listed)) == count_partitions(n, k)
+    assert set(listed) == set(brute_force(list(range(n)), k))
+
+
+@pytest.mark.parametrize('n, k', [(6, 2), (9, 3), (12, 4)])
+def test_rank_and_unrank_invert_each_other(n, k):
+    parts = Partitions([f's{i}' for i in range(n)], k)
+    for i, partition in enumerate(parts):
+        assert parts.unrank(i) == partition
+        assert parts.rank(partition) == i
+        # Neither the order of the teams nor of their members matters
+        shuffled = [tuple(reversed(team)) for team in reversed(partition)]
+        assert parts.rank(shuffled) == i
+
+
+def test_iter_range_slices_the_canonical_order():
+    parts = Partitions(range(12), 4)
+    everything = list(partitions(range(12), 4))
+    assert count_partitions(12, 4) == 5775
+    for start, stop in [(0, 10), (1234, 1300), (5770, None), (20, 20)]:
+        assert list(parts.iter_range(start, stop)) == everything[start:stop]
+
+
+def test_rank_rejects_non_partitions():
+    parts = Partitions(range(6), 3)
+    with pytest.raises(ValueError):
+        parts.rank([(0, 1, 2), (3, 4)])
+    with pytest.raises(ValueError):
+        parts.rank([(0, 1, 2), (2, 3, 4)])
+    with pytest.raises(IndexError):
+        parts.unrank(len(parts))
@@ -0,0 +1,70 @@
+import axelrod as axl
+import numpy as np
+import pandas as pd
+
+from interactions import (InteractionReader, InteractionWriter, convert_interactions,
+                          to_actions)
+from pd_exp2 import PdTournament
+
+
+def test_written_records_read_back(tmp_path):
+    rng = np.random.default_rng(0)
+    records = [(i, j, rep, rng.random((turns, 2)) < 0.5)
+               for i, j, rep, turns in [(0, 1, 0, 1), (0, 2, 1, 8), (1, 1, 0, 9),
+                                        (2, 0, 3, 30), (1, 2, 2, 64)]]
+    path = tmp_path / 'matches.bin'
+    with InteractionWriter(path) as writer:
+        for i, j, rep, pairs in records:
+            writer.write(i, j, rep, ''.join('C' if a else 'D' for a in pairs[:, 0]),
+                         [b for _, b in to_actions(pairs)])
+
+    reader = InteractionReader(path)
+    assert len(reader) == len(records)
+    for read, (i, j, rep, pairs) in zip(reader, records):
+        assert read[:3] == (i, j, rep)
+        np.testing.assert_array_equal(read[3], pairs)
+    headers = reader.headers()
+    assert headers['turns'].tolist() == [len(r[3]) for r in records]
+    i, j, rep, pairs = reader.match(3)
+    assert (i, j, rep) == records[3][:3]
+    np.testing.assert_array_equal(pairs, records[3][3])
+
+
+def test_converted_tournament_keeps_every_match(tmp_path):
+    players = [axl.TitForTat(), axl.Random(0.4), axl.Defector(), axl.Alternator()]
+    tournament = axl.Tournament(players, turns=12, prob_end=None, repetitions=2, seed=5)
+    csv_path = tmp_path / 'interactions.csv'
+    tournament.play(filename=str(csv_path), processes=None, progress_bar=False,
+                    build_results=False)
+    count = convert_interactions(csv_path, tmp_path / 'matches.bin', chunksize=7)
+
+    rows = pd.read_csv(csv_path).groupby('Interaction index')
+    first, last = rows.first(), rows.last()
+    records = list(InteractionReader(tmp_path / 'matches.bin'))
+    assert count == len(records) == len(first)
+    for (i, j, rep, pairs), own, other in zip(records, first.to_dict('records'),
+                                              last.to_dict('records')):
+        assert (i, j, rep) == (own['Player index'], own['Opponent index'], own['Repetition'])
+        assert ''.join('C' if a else 'D' for a in pairs[:, 0]) == own['Actions']
+        assert ''.join('C' if b else 'D' for b in pairs[:, 1]) == other['Actions']
+
+
+def test_packed_tournament_gives_the_csv_tournament(tmp_path):
+    players = [axl.TitForTat(), axl.Random(0.4), axl.GTFT(), axl.Defector()]
+    packed = PdTournament(players, reps=4, interactions=str(tmp_path / 'packed.bin'),
+                          processes=None)
+    assert packed.results is None
+    played = PdTournament(players, reps=4, filename=str(tmp_path / 'played.csv'),
+                          interactions=str(tmp_path / 'converted.bin'), processes=None)
+    pd.testing.assert_frame_equal(packed.data, played.data)
+    pd.testing.assert_frame_equal(packed.agg_data, played.agg_data)
+    for (a, b) in zip(InteractionReader(tmp_path / 'packed.bin'),
+                      InteractionReader(tmp_path / 'converted.bin')):
+        assert a[:3] == b[:3]
+        np.testing.assert_array_equal(a[3], b[3])
+
+    parallel = PdTournament(players, reps=4, interactions=str(tmp_path / 'parallel.bin'),
+                            processes=2)
+    pd.testing.assert_frame_equal(parallel.agg_data, packed.agg_data)
+    records = lambda name: sorted((r[:3], r[3].tobytes()) for r in InteractionReader(tmp_path / name))
+    assert records('parallel.bin') == records('packed.bin')
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import settings
+from helper_funcs import Partitions
+from lookup import LookupMatrix, LookupPlayer, random_population
+from match_matrix import MatchMatrix
+from optimize import PartitionSearch
+from pd_exp import PdExp
+
+POPULATION = random_population(8, memory=2, seed=3)
+SWAP = [0, 2, 1, 3]
+
+
+def play(first, second, turns):
+    ''' Plays a match of deterministic lookup players one turn at a time '''
+
+    counts = np.zeros(4, dtype=int)
+    h1 = h2 = 0
+    for turn in range(turns):
+        a = first.initial[turn] if turn < first.memory else first.table[h1]
+        b = second.initial[turn] if turn < second.memory else second.table[h2]
+        state = 2 * (a < 0.5) + (b < 0.5)
+        counts[state] += 1
+        h1 = h1 * 4 % 4**first.memory + state
+        h2 = h2 * 4 % 4**second.memory + SWAP[state]
+    return counts
+
+
+def test_memory_one_players_play_as_in_axelrod():
+    lookup = LookupMatrix(settings.CD_strategy_dict, turns=25, prob_end=None)
+    played = MatchMatrix(settings.CD_strategy_dict, turns=25, prob_end=None)
+    np.testing.assert_array_equal(lookup.states, played.states)
+    np.testing.assert_array_equal(lookup.match_lengths, played.match_lengths)
+
+
+def test_mixed_memories_match_the_turn_by_turn_match():
+    players = {name: LookupPlayer.from_memory_one(p)
+               for name, p in list(settings.CD_strategy_dict.items())[:6]}
+    players.update(random_population(6, memory=2, seed=1))
+    players.update(random_population(4, memory=3, seed=2, prefix='Long'))
+    matrix = LookupMatrix(players, turns=30, prob_end=None)
+    for i, first in enumerate(players.values()):
+        for j, second in enumerate(players.values()):
+            np.testing.assert_array_equal(matrix.states[0, i, j], play(first, second, 30))
+
+
+def test_generated_population_runs_experiments_and_searches():
+    names = list(POPULATION)
+    systems = [[list(team) for team in p] for p in Partitions(names, 4)]
+    exp = PdExp(systems, t=[0.5], precompute=True, strategy_dict=POPULATION)
+    exp.run_experiments()
+    assert isinstance(exp.matrix, LookupMatrix)
+    assert exp.data['System ID'].iloc[0] == '1,2,3,4_5,6,7,8'
+    serial = PdExp(systems, t=[0.5], precompute=True, strategy_dict=POPULATION, seed=0)
+    serial.matrix = exp.matrix
+    serial.run_experiments()
+    pd.testing.assert_frame_equal(exp.data, serial.data)
+
+    search = PartitionSearch(names, 4, strategy_dict=POPULATION, matrix=exp.matrix)
+    top = search.branch_and_bound()
+    assert top['SYS MIN Score'].iloc[0] == pytest.approx(exp.data['SYS MIN Score'].max())
+    assert isinstance(PartitionSearch(names, 4, strategy_dict=POPULATION).matrix, LookupMatrix)
@@ -0,0 +1,28 @@
+import axelrod as axl
+import numpy as np
+
+import settings
+from batch_sim import BatchMatrix
+from markov import MarkovMatrix
+from match_matrix import MatchMatrix
+
+STOCHASTIC = {'GTFT': axl.GTFT(),
+              'Random': axl.MemoryOnePlayer((0.5, 0.5, 0.5, 0.5), 0.5),
+              'Mostly TFT': axl.MemoryOnePlayer((0.9, 0.2, 0.8, 0.1), 0.7),
+              'Defector': settings.CD_strategy_dict['Defector']}
+
+
+def test_expectations_match_sampled_averages():
+    exact = MarkovMatrix(STOCHASTIC, turns=30, prob_end=0.1)
+    sampled = BatchMatrix(STOCHASTIC, turns=30, prob_end=0.1, reps=20000, seed=3)
+    for name in ('per_turn_states', 'match_lengths'):
+        values = getattr(sampled, name)
+        error = values.std(axis=0) / np.sqrt(len(values))
+        assert np.all(np.abs(values.mean(axis=0) - getattr(exact, name)[0]) <= 5 * error + 1e-12)
+
+
+def test_deterministic_players_match_played_matches():
+    exact = MarkovMatrix(settings.CD_strategy_dict, turns=25, prob_end=None)
+    played = MatchMatrix(settings.CD_strategy_dict, turns=25, prob_end=None)
+    np.testing.assert_allclose(exact.states[0], played.states[0])
+    np.testing.assert_allclose(exact.match_lengths[0], played.match_lengths[0])
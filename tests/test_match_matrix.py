@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+from axelrod import game
+
+import settings
+from match_matrix import MatchMatrix
+from pd_exp import PdTournament
+
+T = [0.25, 0.5, 1.0]
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    # Matches of exactly 20 turns, so deterministic players play the same
+    # matches in a MatchMatrix and in an axelrod Tournament
+    return MatchMatrix(settings.CD_strategy_dict, turns=20, prob_end=None)
+
+
+@pytest.mark.parametrize('team', [
+    ['Cooperator', 'Defector', 'Tit For Tat', 'Grim Trigger'],
+    ['Suspicious Tit For Tat', 'Win-Stay Lose-Shift', 'Bitter Cooperator'],
+    # Repeated strategies are weighted instead of replayed
+    ['Cooperator', 'Cooperator', 'Defector', 'Tit For Tat', 'Tit For Tat'],
+])
+def test_tournament_metrics_match_axelrod(matrix, team):
+    players = [settings.CD_strategy_dict[name] for name in team]
+    played = PdTournament(players, t=T, turns=20, prob_end=None, processes=None).data
+    indexed = PdTournament(players, t=T, matrix=matrix).data
+    pd.testing.assert_frame_equal(indexed, played)
+
+
+def test_for_games_rescores_the_same_matches(matrix):
+    games = [game.Game(), game.Game(r=4, s=0, t=7, p=1)]
+    for g, copy in zip(games, matrix.for_games(games)):
+        replayed = MatchMatrix(settings.CD_strategy_dict, g, turns=20, prob_end=None)
+        assert copy.states is matrix.states
+        np.testing.assert_array_equal(copy.scores, replayed.scores)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import settings
+from helper_funcs import Partitions
+from match_matrix import MatchMatrix
+from optimize import PartitionSearch
+from pd_exp import PdExp
+
+T = [0.5]
+
+
+@pytest.fixture(scope='module')
+def matrix():
+    return MatchMatrix(settings.CD_strategy_dict)
+
+
+@pytest.mark.parametrize('size, team_size', [(8, 4), (9, 3)])
+@pytest.mark.parametrize('objective', ['SYS MIN Score', 'SYS AVG Score',
+                                       'SYS CC Fraction 0.5 AVG', 'MIN of Team Avgs'])
+def test_branch_and_bound_finds_the_exhaustive_top(matrix, size, team_size, objective):
+    names = settings.player_names[:size]
+    exp = PdExp([[list(team) for team in p] for p in Partitions(names, team_size)], t=T,
+                precompute=True)
+    exp.matrix = matrix
+    exp.run_experiments()
+    ranked = exp.data[objective].sort_values(ascending=False)
+
+    search = PartitionSearch(names, team_size, objective, t=T, matrix=matrix)
+    top = search.branch_and_bound(top_k=5)
+    np.testing.assert_allclose(top[objective], ranked.iloc[:5])
+    # The returned partitions have the values of their rows in the experiment
+    values = exp.data.set_index('System ID')[objective]
+    np.testing.assert_allclose(top[objective], values[top['System ID']])
+
+
+@pytest.mark.parametrize('objective', ['SYS MIN Score', 'SYS AVG Score'])
+def test_anneal_finds_the_exhaustive_optimum(matrix, objective):
+    names = settings.player_names[:8]
+    exhaustive = PartitionSearch(names, 4, objective, t=T, matrix=matrix).branch_and_bound()
+    search = PartitionSearch(names, 4, objective, t=T, matrix=matrix)
+    top = search.anneal(top_k=3, steps=2000, seed=4)
+
+    for teams in top['Teams']:
+        members = [team.split(',') for team in teams.split('_')]
+        assert [len(team) for team in members] == [4, 4]
+        assert sorted(sum(members, [])) == sorted(names)
+    assert list(top[objective]) == sorted(top[objective], reverse=True)
+    assert len(set(top['System ID'])) == 3
+    # The first partition visited is a seeded shuffle of names
+    order = np.random.default_rng(4).permutation(8)
+    start = search._value([sum(1 << int(i) for i in order[j:j + 4]) for j in (0, 4)])
+    assert top[objective].iloc[0] >= start
+    assert top[objective].iloc[0] == pytest.approx(exhaustive[objective].iloc[0])
@@ -0,0 +1,65 @@
+import axelrod as axl
+import numpy as np
+import pandas as pd
+import pytest
+
+from pd_exp2 import PdTournament
+
+PLAYERS = [axl.GTFT(), axl.MemoryOnePlayer((0.5, 0.5, 0.5, 0.5), axl.Action.C),
+           axl.MemoryOnePlayer((0.9, 0.2, 0.8, 0.1), axl.Action.D),
+           axl.MemoryOnePlayer((1, 0, 1, 0), axl.Action.C)]
+AVERAGES = ['P1_Avg_Norm_Score', 'P2_Avg_Norm_Score', 'P3_Avg_Norm_Score', 'P4_Avg_Norm_Score',
+            'Avg_of_PL_Scores', 'Avg_CC_Distribution']
+
+
+def test_streamed_runs_summarize_their_repetitions(tmp_path):
+    streamed = PdTournament(PLAYERS, reps=400, batched=True, batch=60)
+    data = streamed.data
+    assert len(data) == 400
+    for num in range(1, 5):
+        column = data[f'P{num}_Norm_Score']
+        assert streamed.agg_data[f'P{num}_Avg_Norm_Score'].iloc[0] == pytest.approx(column.mean())
+        assert streamed.agg_data[f'P{num}_Min_Norm_Score'].iloc[0] == column.min()
+        for q in (0.1, 0.5, 0.9):
+            exact = np.quantile(column, q, method='inverted_cdf')
+            assert abs(streamed.stats.sketch.quantile(q)[num - 1] - exact) <= 5 / 1000
+    assert streamed.agg_data['Min_of_PL_Scores'].iloc[0] == data.to_numpy().min()
+
+    # The means agree with a run held in memory, within sampling error
+    full = PdTournament(PLAYERS, reps=400, batched=True)
+    error = 4 * full.data.std().max() / np.sqrt(400)
+    difference = streamed.agg_data[AVERAGES].iloc[0] - full.agg_data[AVERAGES].iloc[0]
+    assert np.all(np.abs(difference) <= error)
+
+    summary = PdTournament(PLAYERS, reps=400, batched=True, batch=60, keep_reps=False)
+    assert summary.data is None
+    pd.testing.assert_frame_equal(summary.agg_data, streamed.agg_data)
+    with pytest.raises(ValueError):
+        summary.save_data(str(tmp_path / 'summary'))
+
+
+def test_streamed_tournaments_are_the_batch_tournaments():
+    players = [axl.TitForTat(), axl.Random(0.4), axl.Defector()]
+    streamed = PdTournament(players, reps=5, batch=2, processes=None)
+    assert len(streamed.data) == 5
+    batches = [PdTournament(players, reps=size, seed=1 + k, processes=None).data
+               for k, size in enumerate((2, 2, 1))]
+    np.testing.assert_allclose(streamed.data, pd.concat(batches))
+    assert streamed.agg_data['Avg_of_PL_Scores'].iloc[0] == pytest.approx(
+        streamed.data.to_numpy().mean())
+
+
+@pytest.mark.parametrize('batch', [10, 40])
+def test_adaptive_runs_stop_after_whole_batches(batch):
+    # A wide target is met at the first check, a narrow one never
+    wide = PdTournament(PLAYERS, reps=1000, adaptive=True, target=1.0, batch=batch)
+    assert wide.agg_data.index[0] == len(wide.data) == batch
+    narrow = PdTournament(PLAYERS, reps=3 * batch + 5, adaptive=True, target=1e-6, batch=batch)
+    assert narrow.agg_data.index[0] == 3 * batch + 5
+
+
+def test_adaptive_confidence_sets_the_interval_width():
+    widths = [PdTournament(PLAYERS, reps=100, adaptive=True, target=1e-6, batch=25,
+                           confidence=confidence).agg_data['Avg_of_PL_Scores_Half_Width'].iloc[0]
+              for confidence in (0.5, 0.95)]
+    assert widths[1] / widths[0] == pytest.approx(1.959964 / 0.674490, rel=1e-5)
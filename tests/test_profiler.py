@@ -0,0 +1,152 @@
+import tracemalloc
+
+import pytest
+
+import profiler
+from profiler import CProfileHook, NullProfiler, Profiler, TracemallocHook
+
+
+class Clock:
+    ''' A perf_counter that only moves when advanced '''
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(profiler.time, 'perf_counter', clock)
+    return clock
+
+
+def test_nested_phases_include_their_inner_phases(clock):
+    prof = Profiler()
+    with prof.phase('outer'):
+        clock.advance(1)
+        with prof.phase('inner'):
+            clock.advance(2)
+        with prof.phase('inner'):
+            clock.advance(3)
+    with prof.phase('inner'):
+        clock.advance(4)
+
+    assert prof.seconds == {'outer': 6, 'inner': 9}
+    assert prof.calls == {'outer': 1, 'inner': 3}
+    phases = prof.report()['phases']
+    assert list(phases) == ['inner', 'outer']
+    assert phases['inner']['mean_ms'] == 3000
+
+
+def test_unattributed_seconds_is_wall_time_outside_outermost_phases(clock):
+    prof = Profiler()
+    clock.advance(1)
+    with prof.phase('outer'):
+        with prof.phase('inner'):
+            clock.advance(2)
+    clock.advance(3)
+    with prof.phase('other'):
+        clock.advance(4)
+    clock.advance(5)
+
+    report = prof.report()
+    assert report['wall_seconds'] == 15
+    assert report['unattributed_seconds'] == 15 - 2 - 4
+
+
+def test_phase_is_timed_when_it_raises(clock):
+    prof = Profiler()
+    with pytest.raises(KeyError):
+        with prof.phase('outer'):
+            clock.advance(2)
+            raise KeyError
+    with prof.phase('outer'):
+        clock.advance(1)
+
+    assert prof.seconds == {'outer': 3}
+    assert prof.calls == {'outer': 2}
+    assert prof.report()['unattributed_seconds'] == 0
+
+
+def test_merge_adds_worker_stats_but_not_their_wall_time(clock):
+    prof, worker = Profiler(), Profiler()
+    with prof.phase('play'):
+        clock.advance(1)
+    prof.count('played', 2)
+    with worker.phase('play'):
+        clock.advance(5)
+    with worker.phase('io'):
+        clock.advance(1)
+    worker.count('played', 3)
+    worker.count('cached')
+
+    prof.merge(worker.stats())
+
+    assert prof.seconds == {'play': 6, 'io': 1}
+    assert prof.calls == {'play': 2, 'io': 1}
+    assert prof.counters == {'played': 5, 'cached': 1}
+    report = prof.report()
+    assert report['counters'] == {'played': 5, 'cached': 1}
+    assert report['unattributed_seconds'] == report['wall_seconds'] - 1
+
+
+def test_null_profiler_records_nothing():
+    prof = NullProfiler()
+    with prof.phase('play'):
+        with prof.phase('metrics'):
+            prof.count('played', 5)
+
+    assert vars(prof) == {}
+    assert not hasattr(prof, 'report')
+
+
+def test_cprofile_hook_attributes_functions_to_the_innermost_phase():
+    def inner_work():
+        return sum(range(1000))
+
+    def outer_work():
+        return sorted(range(1000), reverse=True)
+
+    hook = CProfileHook(phases=['outer', 'inner'])
+    prof = Profiler(hooks=[hook])
+    with prof.phase('outer'):
+        outer_work()
+        with prof.phase('inner'):
+            inner_work()
+        with prof.phase('ignored'):
+            inner_work()
+
+    report = prof.report()['cprofile']
+    assert set(report) == {'outer', 'inner'}
+    functions = {phase: {row['function'].rsplit('(', 1)[1] for row in rows}
+                 for phase, rows in report.items()}
+    assert 'outer_work)' in functions['outer'] and 'outer_work)' not in functions['inner']
+    assert 'inner_work)' in functions['inner'] and 'inner_work)' in functions['outer']
+
+
+def test_tracemalloc_hook_reports_nested_peaks():
+    hook = TracemallocHook()
+    prof = Profiler(hooks=[hook])
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        with prof.phase('outer'):
+            with prof.phase('inner'):
+                block = bytearray(4 * 2**20)
+                del block
+            kept = bytearray(2**20)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    report = prof.report()['tracemalloc']
+    assert report['inner']['peak_mb'] >= 4
+    assert report['outer']['peak_mb'] >= report['inner']['peak_mb']
+    assert report['inner']['net_mb'] < 1
+    assert report['outer']['net_mb'] >= 1
+    del kept
@@ -0,0 +1,131 @@
+import axelrod as axl
+import numpy as np
+import pandas as pd
+import pytest
+
+import settings
+from encoding import system_codes
+from helper_funcs import Partitions
+from pd_exp import PdExp, rpst_label, system_id
+from result_store import ResultStore, rpst_from_name
+
+
+def test_rpst_label_writes_plain_numbers():
+    assert rpst_label() == '3_1_0_5'
+    assert rpst_label(axl.game.Game(r=np.int64(4), p=np.int64(2), s=np.int64(0), t=np.int64(6))) == '4_2_0_6'
+    assert rpst_label(axl.game.Game(r=3.5, p=1, s=np.float64(0.25), t=5)) == '3.5_1_0.25_5'
+
+
+def test_rpst_from_name_reads_plain_and_numpy_payoffs():
+    assert rpst_from_name('ClassicPD_7C1D_RPST_3_1_0_5.csv') == (3, 1, 0, 5)
+    assert rpst_from_name('dir/sweep_RPST_3.5_1_0.25_5.csv') == (3.5, 1, 0.25, 5)
+    assert rpst_from_name('old_RPST_np.int64(3)_np.int64(1)_np.int64(0)_np.int64(5).csv') == (3, 1, 0, 5)
+    assert rpst_from_name('old_RPST_np.float64(3.5)_np.float64(1.0)_0_5.csv') == (3.5, 1, 0, 5)
+    # The last payoffs of a name are the game's
+    assert rpst_from_name('from_RPST_3_1_0_5_to_RPST_4_2_0_6.csv') == (4, 2, 0, 6)
+    assert rpst_from_name('ClassicPD_7C1D.csv') is None
+
+
+def test_saved_file_names_give_back_the_game():
+    game = axl.game.Game(r=np.int64(4), p=np.int64(2), s=np.int64(0), t=np.int64(6))
+    exp = PdExp([[['Cooperator'], ['Defector']]], game_type=game)
+    assert rpst_from_name(exp._file_name('results/', 'run')) == (4, 2, 0, 6)
+
+
+NAMES = settings.player_names[:12]
+GAMES = [(3, 1, 0, 5), (4, 2, 0, 6)]
+
+
+def rows(seed, size=600):
+    ''' PdExp-like rows of random partitions of NAMES into teams of 4 '''
+
+    rng = np.random.default_rng(seed)
+    partitions = Partitions(NAMES, 4)
+    systems = [partitions.unrank(int(k)) for k in rng.choice(len(partitions), size, replace=False)]
+    return pd.DataFrame({'System ID': [system_id(sys) for sys in systems],
+                         'Team1': ['x'] * size,
+                         'SYS MIN Score': rng.integers(0, 20, size) / 10,
+                         'SYS AVG Score': rng.random(size)})
+
+
+def scan(data, strategies=(), together=(), team=None, rpst=None):
+    ''' Returns the row numbers of data matching the filters, one row at a time '''
+
+    found = []
+    for num, (sid, game) in enumerate(zip(data['System ID'], data['RPST'])):
+        teams = [{NAMES[code - 1] for code in codes} for codes in system_codes(sid)]
+        if (set(strategies) <= set().union(*teams)
+                and (not together or any(set(together) <= t for t in teams))
+                and (team is None or set(team) in teams)
+                and (rpst is None or game == rpst)):
+            found.append(num)
+    return np.array(found, dtype=np.int64)
+
+
+FILTERS = [{}, {'strategies': NAMES[:2]}, {'together': NAMES[3:5]},
+           {'team': NAMES[:4]}, {'rpst': GAMES[1]},
+           {'strategies': [NAMES[7]], 'together': [NAMES[0], NAMES[11]], 'rpst': GAMES[0]},
+           {'team': [NAMES[1], NAMES[4], NAMES[6], NAMES[9]], 'together': NAMES[2:4]},
+           {'rpst': (1, 1, 1, 1)}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(tmp_path / 'store', names=NAMES)
+    data = []
+    for game, seed in zip(GAMES, (0, 1)):
+        df = rows(seed)
+        store.append(df, game)
+        data.append(df.assign(RPST=[game] * len(df)))
+    return store, pd.concat(data, ignore_index=True)
+
+
+def test_indexed_and_scanned_rows_match_a_row_scan(store):
+    store, data = store
+    assert len(store) == len(data)
+    expected = [scan(data, **f) for f in FILTERS]
+    for found, f in zip(expected, FILTERS):
+        np.testing.assert_array_equal(store.rows_where(**f), found)
+    store.build_indexes()
+    for found, f in zip(expected, FILTERS):
+        np.testing.assert_array_equal(store.rows_where(**f), found)
+    # Rows appended after build_indexes are found by scans until it runs again
+    extra = rows(2, size=100)
+    store.append(extra, GAMES[0])
+    data = pd.concat([data, extra.assign(RPST=[GAMES[0]] * len(extra))], ignore_index=True)
+    for f in FILTERS:
+        np.testing.assert_array_equal(store.rows_where(**f), scan(data, **f))
+
+
+@pytest.mark.parametrize('ascending', [False, True])
+@pytest.mark.parametrize('limit', [None, 1, 25, 5000])
+def test_query_sorts_and_limits_like_pandas(store, ascending, limit):
+    store, data = store
+    store.build_indexes()
+    f = {'strategies': [NAMES[5]], 'rpst': GAMES[0]}
+    result = store.query(**f, sort_by='SYS MIN Score', ascending=ascending, limit=limit,
+                         columns=['SYS MIN Score'])
+    found = scan(data, **f)
+    values = data['SYS MIN Score'].to_numpy()[found]
+    expected = found[np.lexsort((found, values if ascending else -values))][:limit]
+    np.testing.assert_array_equal(result.index, expected)
+    assert list(result.columns) == ['System ID', 'RPST', 'SYS MIN Score']
+    assert result['System ID'].tolist() == data['System ID'][expected].tolist()
+    assert set(result['RPST']) <= {'3_1_0_5'}
+    np.testing.assert_array_equal(result['SYS MIN Score'], values[np.searchsorted(found, expected)])
+
+
+def test_csv_files_add_the_same_rows(tmp_path):
+    df = rows(3)
+    df.index += 1
+    path = tmp_path / 'exp_RPST_4_2_0_6.csv'
+    df.to_csv(path)
+    store = ResultStore(tmp_path / 'store', names=NAMES)
+    store.add_csv(path, chunksize=70)
+    assert store.games == [GAMES[1]]
+    assert store.columns == ['SYS MIN Score', 'SYS AVG Score']
+    result = store.query()
+    assert result['System ID'].tolist() == df['System ID'].tolist()
+    np.testing.assert_allclose(result['SYS AVG Score'], df['SYS AVG Score'])
+    with pytest.raises(ValueError):
+        store.add_csv(tmp_path / 'exp.csv')
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import axelrod as axl
+import pytest
+
+import settings
+from registry import StrategyRegistry
+
+C, D = axl.Action.C, axl.Action.D
+# settings.CD_strategy_dict as it was built eagerly, in order
+EAGER = {'Bitter Cooperator': ((1, 0, 1, 1), C), 'Cooperator': ((1, 1, 1, 1), C),
+         'Fourteen Coop': ((1, 1, 1, 0), C), 'Grim Trigger': ((1, 0, 0, 0), C),
+         'Thirteen Coop': ((1, 1, 0, 1), C), 'Tit For Tat': ((1, 0, 1, 0), C),
+         'Win-Stay Lose-Shift': ((1, 0, 0, 1), C), 'Defector': ((0, 0, 0, 0), D),
+         'Fourteen Defect': ((1, 1, 1, 0), D), 'Stubborn Defect': ((1, 0, 0, 0), D),
+         'Suspicious Tit For Tat': ((1, 0, 1, 0), D), 'Sucker Defect': ((0, 1, 0, 0), D),
+         'Two Defect': ((0, 0, 1, 0), D), 'Win-Shift Lose-Stay': ((0, 1, 1, 0), D)}
+
+
+def test_importing_settings_creates_no_player():
+    code = Path(__file__).resolve().parents[1] / 'code'
+    script = ('import sys; import settings; '
+              "assert 'axelrod' not in sys.modules; "
+              'assert not settings.CD_strategy_dict._players; '
+              'assert len(settings.player_names) == 14; '
+              "settings.tit_for_tat; assert list(settings.CD_strategy_dict._players) == ['Tit For Tat']")
+    subprocess.run([sys.executable, '-c', script], cwd=code, check=True)
+
+
+def test_strategies_match_the_eager_settings():
+    assert list(settings.CD_strategy_dict) == settings.player_names == list(EAGER)
+    assert settings.name_dec_dict == {name: str(num) for num, name in enumerate(EAGER, 1)}
+    assert list(settings.Coop_strategy_dict) == list(EAGER)[:7]
+    assert list(settings.def_strategy_dict) == list(EAGER)[7:]
+    for name, (vector, initial) in EAGER.items():
+        player = settings.CD_strategy_dict[name]
+        assert repr(player) == repr(axl.MemoryOnePlayer(vector, initial))
+        assert player is settings.CD_strategy_dict[name]
+    assert settings.tit_for_tat is settings.Coop_strategy_dict['Tit For Tat']
+    assert settings.defector is settings.def_strategy_dict['Defector']
+
+
+def test_axelrod_attributes_are_created_on_access():
+    assert (settings.C, settings.D, settings.action_map) == (C, D, {0: D, 1: C})
+    assert settings.stag.RPST() == (5, 1, 0, 3)
+    assert settings.high_t.RPST() == (3, 1, 0, 7)
+    assert settings.strategies == axl.filtered_strategies(settings.filterset)
+    assert list(settings.name_strategy_dict) == [s.name for s in settings.one_mem_players]
+    with pytest.raises(AttributeError):
+        settings.no_such_setting
+
+
+def test_registry_creates_each_player_once():
+    registry = StrategyRegistry({'TFT': ((1, 0, 1, 0), 'C'), 'Alternator': axl.Alternator})
+    assert 'TFT' in registry and len(registry) == 2 and not registry._players
+    assert isinstance(registry['Alternator'], axl.Alternator)
+    subset = registry.subset(['TFT'])
+    assert subset['TFT'] is registry['TFT']
+    registry.register('Defector', ((0, 0, 0, 0), 0))
+    assert repr(registry['Defector']) == repr(axl.MemoryOnePlayer((0, 0, 0, 0), D))
+    with pytest.raises(ValueError):
+        registry.register('TFT', ((1, 1, 1, 1), 'C'))
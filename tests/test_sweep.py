@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import settings
+from helper_funcs import Partitions
+from match_matrix import MatchMatrix
+from pd_exp import PdExp
+from sweep import PdSweep, grid_games, is_prisoners_dilemma, latin_hypercube_games
+
+T = [0.3, 0.7]
+SYSTEMS = [[list(team) for team in p] for p in Partitions(settings.player_names[:8], 4)]
+
+
+@pytest.fixture(scope='module')
+def sweep():
+    games = grid_games(R=[3, 4], P=1, S=[0, 0.5], T=5)
+    sweep = PdSweep(SYSTEMS, games, t=T, matrix=MatchMatrix(settings.CD_strategy_dict))
+    sweep.run_sweep()
+    return sweep
+
+
+def test_rows_of_each_game_are_the_experiment_rows(sweep):
+    assert len(sweep.data) == len(SYSTEMS) * len(sweep.games)
+    for num, (g, matrix) in enumerate(zip(sweep.games, sweep.matrix.for_games(sweep.games))):
+        exp = PdExp(SYSTEMS, t=T, game_type=g, precompute=True)
+        exp.matrix = matrix
+        exp.run_experiments()
+        rows = sweep.data.iloc[num * len(SYSTEMS):(num + 1) * len(SYSTEMS)]
+        assert rows[['R', 'P', 'S', 'T']].drop_duplicates().to_numpy().tolist() == [list(g.RPST())]
+        columns = [c for c in rows.columns if c not in ('R', 'P', 'S', 'T')]
+        assert columns == [c for c in exp.data.columns
+                           if c == 'System ID' or c.startswith(('SYS', 'MIN', 'AVG'))]
+        pd.testing.assert_frame_equal(rows[columns].reset_index(drop=True),
+                                      exp.data[columns].reset_index(drop=True),
+                                      check_dtype=False)
+
+
+def test_grid_games_filter_the_product():
+    games = grid_games(R=[2, 3, 4], P=1, S=0, T=[3, 5], condition=is_prisoners_dilemma)
+    assert [g.RPST() for g in games] == [(2, 1, 0, 3), (3, 1, 0, 5), (4, 1, 0, 5)]
+
+
+def test_latin_hypercube_samples_every_stratum_once():
+    n = 25
+    games = latin_hypercube_games({'R': (2, 4), 'P': lambda u: u, 'S': 0, 'T': (4, 9)}, n, seed=3)
+    payoffs = np.array([g.RPST() for g in games], dtype=float)
+    for column, (low, high) in zip(payoffs.T[[0, 1, 3]], [(2, 4), (0, 1), (4, 9)]):
+        strata = np.floor((column - low) / (high - low) * n).astype(int)
+        assert sorted(strata) == list(range(n))
+    assert np.all(payoffs[:, 2] == 0)
+    kept = latin_hypercube_games({'R': (2, 4), 'P': (0, 2), 'S': 0, 'T': (4, 9)}, n, seed=3,
+                                 condition=is_prisoners_dilemma)
+    assert 0 < len(kept) < n and all(is_prisoners_dilemma(*g.RPST()) for g in kept)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_saved_sweeps_read_back(sweep, tmp_path, fmt):
+    sweep.save_data(f'{tmp_path}/', 'sweep', fmt=fmt)
+    path = tmp_path / f'sweep_RPST_sweep.{fmt}'
+    read = pd.read_parquet(path) if fmt == 'parquet' else pd.read_csv(path)
+    pd.testing.assert_frame_equal(read, sweep.data, check_dtype=False)
@@ -0,0 +1,68 @@
+import pandas as pd
+
+import settings
+from helper_funcs import Partitions
+from pd_exp import PdExp
+from work_queue import ShardRunner, WorkQueue
+
+NAMES = settings.player_names[:8]
+
+
+def test_claims_hand_out_each_pending_shard_once(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite')
+    assert queue.create(25, 10) == 3
+    assert queue.create(25, 10) == 3
+    assert [queue.claim('a'), queue.claim('b'), queue.claim('a')] == [
+        (0, 0, 10), (1, 10, 20), (2, 20, 25)]
+    assert queue.claim('c') is None
+    assert queue.progress()['running'] == 3
+
+
+def test_release_and_expired_leases_hand_shards_out_again(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite', lease=3600)
+    queue.create(20, 10)
+    assert queue.claim('a') == (0, 0, 10)
+    queue.release(0)
+    assert queue.claim('b') == (0, 0, 10)
+
+    expired = WorkQueue(tmp_path / 'queue.sqlite', lease=0)
+    assert expired.claim('c') == (0, 0, 10)
+
+
+def test_only_the_owner_completes_a_shard(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite', lease=0)
+    queue.create(10, 10)
+    queue.claim('stale')
+    queue.claim('owner')
+    assert not queue.complete(0, 'stale')
+    assert queue.complete(0, 'owner')
+    assert not queue.complete(0, 'owner')
+    progress = queue.progress()
+    assert (progress['done'], progress['completed']) == (1, 10)
+
+
+def test_stale_worker_leaves_the_owners_shard(tmp_path):
+    runner = ShardRunner(NAMES, 4, tmp_path, shard_size=20, lease=0)
+    stale = runner.queue.claim('stale:1')
+    owner = runner.queue.claim('owner:2')
+    assert stale == owner == (0, 0, 20)
+    assert runner.run_shard(*owner, 'owner:2')
+    expected = runner.shard_path(0).read_text()
+    assert not runner.run_shard(*stale, 'stale:1')
+    assert runner.shard_path(0).read_text() == expected
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_merged_shards_give_the_single_run_file(tmp_path):
+    runner = ShardRunner(NAMES, 4, tmp_path / 'shards', shard_size=8, t=[0.5])
+    assert runner.work('worker') == 5
+    runner.merge(tmp_path / 'merged.csv')
+
+    exp = PdExp([[list(team) for team in p] for p in Partitions(NAMES, 4)], t=[0.5],
+                precompute=True)
+    exp.matrix = runner.matrix
+    exp.run_experiments()
+    exp.save_data(f'{tmp_path}/', 'single')
+    [single] = tmp_path.glob('single_RPST_*.csv')
+    assert (tmp_path / 'merged.csv').read_text() == single.read_text()
+    pd.testing.assert_frame_equal(runner.read(), pd.read_csv(single, index_col=0))